@@ -1,19 +1,42 @@
-import aiohttp
-import pygsheets
+import asyncio
 
 from app.logger import logger
 from app.config import settings
+from app.src.utils import json_hash
 from app.src.images import del_folder
+from app.src.gsheets import (
+    IMAGES_LINKS_SEPARATOR,
+    SheetDiff,
+    clear_tail,
+    delete_rows,
+    open_worksheet,
+    reset_spreadsheet,
+    run_in_sheets_thread,
+    sheet_values,
+    write_block,
+    write_rows,
+)
+from app.src.http_clients import http_clients
+from app.src.response_cache import response_cache
 
 from app.database import models as db_models
 from app.database.session import get_db_session
 from app.database.handlers.tenders import (
     db_delete_expired_tenders, 
-    db_get_all_tenders_of_type_as_pandas_df,
     db_get_table_columns_descriptions,
+    db_get_tenders_by_ids,
+    db_stream_tenders_of_type,
+)
+from app.database.handlers.gsheets import (
+    db_get_gsheet_state,
+    db_invalidate_gsheet_state,
+    db_save_gsheet_state,
 )
 
 
+_worksheet_locks: dict[str, asyncio.Lock] = {}
+
+
 async def handler_delete_expired_tenders():
     logger.info('Started deleting expired tenders')
     async with get_db_session() as session:
@@ -26,54 +49,124 @@ async def handler_delete_expired_tenders():
             db_models.ParkingSpacesTenders
         )
 
-    DISK_AUTH_HEADERS = {'accept': 'application/json', 'Authorization': 'OAuth %s' % settings.YADISK_OAUTH_TOKEN}
-    async with aiohttp.ClientSession(headers=DISK_AUTH_HEADERS) as session:
-        await del_folder(
-            session=session,
-            basefolder=settings.NONRESIDENTIAL_FOLDERNAME,
-            tenders_ids=nonresidential_tenders_ids
-        )
-        await del_folder(
-            session=session,
-            basefolder=settings.PARKING_SPACES_FOLDERNAME,
-            tenders_ids=parking_spaces_tenders_ids
-        )
+    session = http_clients.yadisk
+    await del_folder(
+        session=session,
+        basefolder=settings.NONRESIDENTIAL_FOLDERNAME,
+        tenders_ids=nonresidential_tenders_ids
+    )
+    await del_folder(
+        session=session,
+        basefolder=settings.PARKING_SPACES_FOLDERNAME,
+        tenders_ids=parking_spaces_tenders_ids
+    )
     logger.info(f'Deleted expired tenders:\nnonresidential: {nonresidential_tenders_ids}\nparking_spaces: {parking_spaces_tenders_ids}')
 
 
-async def update_google_sheet_data(db_model, worksheet):
-    try:
-        logger.info('connecting to GSheets...')
-        sa = pygsheets.authorize(service_file=settings.GSHEETS_CREDS_PATH)
-        logger.info('Opening gsheet by url...')
-        sh = sa.open_by_url(settings.GSHEETURL)
-        worksheet = sh.worksheet_by_title(worksheet)
+async def handler_get_tenders_json(tenders_ids: list[str]) -> dict[str, bytes]:
+    """
+    Возвращает JSON тендеров нежилых помещений {tender_id: тело} в порядке `tenders_ids`,
+    b'null' для тех, которых нет в БД. Тендеры, которых нет в кэше ответов,
+    читаются из БД одним запросом и кэшируются.
+    """
+    table = db_models.NonresidentialTenders.__tablename__
+    tenders_ids = list(dict.fromkeys(tenders_ids))
+    bodies = {}
+    missed = []
+    for tender_id in tenders_ids:
+        body = response_cache.get(table, tender_id)
+        if body is None:
+            missed.append(tender_id)
+        else:
+            bodies[tender_id] = body
 
+    if missed:
+        generation = response_cache.generation
         async with get_db_session() as session:
-            table_headers_for_rename = await db_get_table_columns_descriptions(session, db_model)
-            table_pandas_df = await db_get_all_tenders_of_type_as_pandas_df(session, db_model)
-
-        for index, row in table_pandas_df.iterrows():
-            # Для автоматической выгрузки на авито, ссылки на фото для каждого объявления
-            # должны быть записаны в одной ячейке через разделитель " | ".
-            links = row['images_links']
-            table_pandas_df.loc[index, 'images_links'] = ' | '.join(links) if bool(links) else ''
-
-        table_pandas_df = table_pandas_df.rename(columns=table_headers_for_rename)
-
-        worksheet.clear()
-        logger.info(f'Cleared worksheet "{worksheet}"')
-
-        worksheet.set_dataframe(
-            table_pandas_df,
-            start='A1', 
-            nan='',
-            copy_head=True,
-            escape_formulae=True
-        )
-        logger.info(f'Updated worksheet "{worksheet}"')
-        return True
-    except Exception as e:
-        logger.exception(f'Exception while updating worksheet "{worksheet}"')
-        return False
+            tenders = await db_get_tenders_by_ids(session, missed) or []
+        loaded = dict.fromkeys(missed, b'null')
+        loaded.update({tender.tender_id: tender.model_dump_json(by_alias=True).encode() for tender in tenders})
+        response_cache.put(table, loaded, generation)
+        bodies.update(loaded)
+    return {tender_id: bodies[tender_id] for tender_id in tenders_ids}
+
+
+async def update_google_sheet_data(db_model, worksheet, full: bool = False):
+    """
+    Синхронизирует лист с таблицей тендеров: записывает только измененные, новые
+    и удаленные строки по хэшам, сохраненным при прошлой синхронизации.
+    Лист перезаписывается целиком, если изменились столбцы, состояние листа
+    еще не сохранено или передан `full`.
+
+    Тендеры читаются из БД серверным курсором пачками по GSHEETS_BATCH_ROWS строк,
+    запросы к Google Sheets выполняются в отдельном потоке и не блокируют цикл событий.
+    """
+    worksheet_title = worksheet
+    # планировщик и ручной запуск через API не должны выгружать один лист одновременно
+    async with _worksheet_locks.setdefault(worksheet_title, asyncio.Lock()):
+        try:
+            worksheet = await run_in_sheets_thread(open_worksheet, worksheet_title)
+
+            async with get_db_session() as session:
+                table_headers_for_rename = await db_get_table_columns_descriptions(session, db_model)
+                header_hash, stored_rows = await db_get_gsheet_state(session, worksheet_title)
+                await db_invalidate_gsheet_state(session, worksheet_title)
+
+            header = [str(table_headers_for_rename.get(name, name)) for name in db_model.__table__.columns.keys()]
+            rewrite = full or header_hash != json_hash(header)
+            if rewrite:
+                # заголовки пишутся поверх старых, строки - пачками по мере чтения из БД
+                await run_in_sheets_thread(write_block, worksheet, 1, [header])
+                state = {}
+                next_row = 2
+            else:
+                diff = SheetDiff(stored_rows)
+
+            async with get_db_session() as session:
+                # Для автоматической выгрузки на авито, ссылки на фото для каждого объявления
+                # должны быть записаны в одной ячейке через разделитель " | ", склеиваются в БД.
+                chunks = db_stream_tenders_of_type(
+                    session,
+                    db_model,
+                    settings.GSHEETS_BATCH_ROWS,
+                    arrays_separator=IMAGES_LINKS_SEPARATOR,
+                )
+                async for chunk in chunks:
+                    rows = list(zip(chunk['tender_id'].astype(str), sheet_values(chunk)))
+                    if not rewrite:
+                        diff.add(rows)
+                        continue
+                    await run_in_sheets_thread(write_block, worksheet, next_row, [values for _, values in rows])
+                    for tender_id, values in rows:
+                        state[tender_id] = (next_row, json_hash(values))
+                        next_row += 1
+
+            if rewrite:
+                await run_in_sheets_thread(clear_tail, worksheet, next_row - 1, len(header))
+                async with get_db_session() as session:
+                    await db_save_gsheet_state(session, worksheet_title, json_hash(header), state, [], [], replace=True)
+                logger.info(f'Rewrote worksheet "{worksheet_title}": {len(state)} rows')
+                return True
 
+            diff.finish()
+            await run_in_sheets_thread(write_rows, worksheet, diff.writes, len(header))
+            await run_in_sheets_thread(delete_rows, worksheet, diff.deleted_rows)
+            async with get_db_session() as session:
+                await db_save_gsheet_state(
+                    session,
+                    worksheet_title,
+                    header_hash,
+                    diff.state,
+                    diff.removed_ids,
+                    diff.deleted_rows,
+                )
+            logger.info(
+                f'Updated worksheet "{worksheet_title}": {len(diff.writes)} rows written, '
+                f'{len(diff.deleted_rows)} rows deleted'
+            )
+            return True
+        except Exception as e:
+            # клиент авторизуется заново при следующей выгрузке
+            reset_spreadsheet()
+            logger.exception(f'Exception while updating worksheet "{worksheet_title}"')
+            return False
@@ -1,23 +1,26 @@
-import asyncio
-
 from typing import Annotated
 from enum import Enum
 from fastapi import (
     APIRouter, 
+    HTTPException,
     Query,
+    Request,
+    Response,
     status, 
 )
 
 from app.api import models
 from app.config import settings
-from app.api.v1.handlers import handler_delete_expired_tenders, update_google_sheet_data
+from app.api.v1.handlers import (
+    handler_delete_expired_tenders,
+    handler_get_tenders_json,
+    update_google_sheet_data,
+)
+from app.src.response_cache import etag_matches, make_etag
+from app.src.tasks import background_tasks
 from app.database.session import get_db_session
 from app.database.models import NonresidentialTenders, ParkingSpacesTenders
-from app.database.handlers.tenders import (
-    db_get_tenders_by_ids, 
-    db_get_tenders_by_address,
-    db_get_tender_by_id,
-)
+from app.database.handlers.tenders import db_get_tenders_ids_by_address
 
 
 router = APIRouter(prefix="/v1", tags=["v1"])
@@ -28,44 +31,67 @@ class ByEnum(str, Enum):
     address = 'address'
 
 
-@router.get("/tender/{tender_id}", status_code=status.HTTP_200_OK)
-async def get_tender_data_by_id(tender_id: str) -> models.NonresidentialDataOut | None:
+def _json_response(request: Request, body: bytes) -> Response:
+    """
+    Ответ с телом JSON и ETag, 304 без тела, если клиент прислал совпадающий If-None-Match.
+    """
+    etag = make_etag(body)
+    if etag_matches(request.headers.get('if-none-match'), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+    return Response(body, media_type='application/json', headers={'ETag': etag})
+
+
+@router.get(
+    "/tender/{tender_id}",
+    status_code=status.HTTP_200_OK,
+    response_model=models.NonresidentialDataOut | None,
+)
+async def get_tender_data_by_id(tender_id: str, request: Request) -> Response:
     """ 
     Возвращает тендер по ID.
     """
-    async with get_db_session() as session:
-        return await db_get_tender_by_id(session, tender_id)
+    bodies = await handler_get_tenders_json([tender_id])
+    return _json_response(request, bodies[tender_id])
 
 
-@router.get("/tenders", status_code=status.HTTP_200_OK)
+@router.get(
+    "/tenders",
+    status_code=status.HTTP_200_OK,
+    response_model=list[models.NonresidentialDataOut] | None,
+)
 async def get_tenders_by_ids(
     params: Annotated[list[str], Query(description="List of tenders ids of addresses")],
     by: ByEnum,
-) -> list[models.NonresidentialDataOut] | None:
+    request: Request,
+) -> Response:
     """ 
     Возвращает тендеры по ID или адресу.
     """
-    async with get_db_session() as session:
-        if by == ByEnum.tender_id.value:
-            return await db_get_tenders_by_ids(
-                session, 
-                params,
-            )
-        return await db_get_tenders_by_address(
-            session, 
-            params,
-        )
+    tenders_ids = params
+    if by == ByEnum.address.value:
+        async with get_db_session() as session:
+            tenders_ids = await db_get_tenders_ids_by_address(session, params)
+    bodies = [body for body in (await handler_get_tenders_json(tenders_ids)).values() if body != b'null']
+    return _json_response(request, b'[' + b','.join(bodies) + b']' if bodies else b'null')
 
 
 @router.delete("/tenders", status_code=status.HTTP_202_ACCEPTED)
 async def delete_expired_tenders():
-    asyncio.create_task(handler_delete_expired_tenders())
+    """ 
+    Ставит удаление истекших тендеров в фоновые задачи, 503, если группа задач заполнена.
+    """
+    if await background_tasks.try_spawn('jobs', handler_delete_expired_tenders()) is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail='Too many background jobs, try again later',
+            headers={'Retry-After': '60'},
+        )
 
 
 @router.patch("/update-google-sheet", status_code=status.HTTP_200_OK)
-async def get_tenders(worksheet: str):
+async def get_tenders(worksheet: str, full: bool = False):
     """ 
-    Возвращает тендер по ID.
+    Синхронизирует лист Google таблицы с тендерами, при `full` перезаписывает его целиком.
     """
     db_models = {
         settings.NONRESIDENTIAL_WORKSHEET_TITLE: {
@@ -75,5 +101,5 @@ async def get_tenders(worksheet: str):
             'db_model': ParkingSpacesTenders, 
         },
     }
-    return await update_google_sheet_data(db_models[worksheet]['db_model'], worksheet)
+    return await update_google_sheet_data(db_models[worksheet]['db_model'], worksheet, full)
 
@@ -1,11 +1,21 @@
+import os
+import time
+
 from datetime import datetime
 from contextlib import asynccontextmanager
-from fastapi import FastAPI
+from fastapi import FastAPI, Request, Response
 
 from app.api.v1.routes import router as v1_router
 from app.database.initdb import init_db
 from app.scheduled_tasks.tenders import scheduler
 from app.src.utils import clean_folder
+from app.src.http_clients import http_clients
+from app.src.images import images_links_accumulator
+from app.src.pdf import start_pdf_executor, shutdown_pdf_executor
+from app.src.gsheets import shutdown_gsheets_executor
+from app.src.metrics import API_REQUEST_DURATION, render_metrics
+from app.src.tasks import background_tasks
+from app.config import settings
 
 
 @asynccontextmanager
@@ -14,11 +24,22 @@ async def lifespan(
 ):
     clean_folder('/src/reports')
     clean_folder('/src/jsons')
+    # временные файлы отчетов, оставшиеся от загрузок, прерванных остановкой приложения
+    os.makedirs(settings.REPORTS_TMP_DIR, exist_ok=True)
+    clean_folder(settings.REPORTS_TMP_DIR)
     await init_db()
+    await http_clients.start()
+    await start_pdf_executor()
     scheduler.start()
     for job in scheduler.get_jobs():
         job.modify(next_run_time=datetime.now())
     yield
+    scheduler.shutdown(wait=False)
+    await background_tasks.drain(settings.BACKGROUND_DRAIN_TIMEOUT)
+    await images_links_accumulator.flush()
+    await http_clients.close()
+    shutdown_pdf_executor()
+    shutdown_gsheets_executor()
 
 
 app = FastAPI(
@@ -27,3 +48,22 @@ app = FastAPI(
 )
 app.include_router(v1_router, prefix="/api")
 
+
+@app.middleware('http')
+async def observe_request_duration(request: Request, call_next):
+    start = time.perf_counter()
+    response = await call_next(request)
+    route = request.scope.get('route')
+    API_REQUEST_DURATION.labels(
+        request.method,
+        route.path if route else 'unmatched',
+        response.status_code,
+    ).observe(time.perf_counter() - start)
+    return response
+
+
+@app.get('/metrics', include_in_schema=False)
+async def metrics() -> Response:
+    data, content_type = render_metrics()
+    return Response(data, media_type=content_type)
+
@@ -20,6 +20,10 @@ class Settings(BaseSettings):
 
     YADISK_OAUTH_TOKEN: str
 
+    # адреса внешних API (переопределяются для запуска с локальными заглушками)
+    INVESTMOSCOW_API_URL: str = 'https://api.investmoscow.ru'
+    YADISK_API_URL: str = 'https://cloud-api.yandex.net'
+
     PARKING_SPACES_FOLDERNAME: str = 'parking_spaces'
     NONRESIDENTIAL_FOLDERNAME: str = 'nonresidential'
 
@@ -27,6 +31,8 @@ class Settings(BaseSettings):
     GSHEETURL: str
     NONRESIDENTIAL_WORKSHEET_TITLE: str
     PARKING_SPACES_WORKSHEET_TITLE: str
+    # строк в одном запросе записи на лист при инкрементальной синхронизации
+    GSHEETS_BATCH_ROWS: int = 1000
 
     # defaults
     DB_URL: str
@@ -40,6 +46,77 @@ class Settings(BaseSettings):
 
     PAGENUMBER: int = 1
     PAGESIZE: int = 20
+    # пауза между страницами выдачи машино-мест, секунды
+    PARKING_SPACES_PAGE_DELAY: float = 60 * 5
+
+    # общие пулы соединений aiohttp
+    HTTP_CONNECTIONS_LIMIT: int = 100
+    HTTP_CONNECTIONS_LIMIT_PER_HOST: int = 20
+    HTTP_DNS_CACHE_TTL: int = 600
+    HTTP_KEEPALIVE_TIMEOUT: float = 60
+
+    # загрузка изображений на Яндекс Диск
+    YADISK_UPLOAD_CONCURRENCY: int = 10
+    YADISK_UPLOAD_RETRIES: int = 2
+    YADISK_POLL_INITIAL_DELAY: float = 1
+    YADISK_POLL_MAX_DELAY: float = 30
+    YADISK_POLL_TIMEOUT: float = 300
+    # размер страницы при просмотре папки и число одновременно обрабатываемых папок
+    YADISK_LIST_LIMIT: int = 100
+    YADISK_FOLDERS_CONCURRENCY: int = 5
+
+    # запись ссылок на изображения: по числу тендеров или по таймеру
+    IMAGES_LINKS_FLUSH_SIZE: int = 100
+    IMAGES_LINKS_FLUSH_INTERVAL: float = 15
+
+    # максимальное число одновременных запросов деталей тендеров
+    TENDER_FETCH_CONCURRENCY: int = 5
+    # ограничение запросов в секунду к api.investmoscow.ru (0 - без ограничения)
+    INVESTMOSCOW_RATE_LIMIT: float = 5.0
+
+    # инкрементальный парсинг: пропускать тендеры, не изменившиеся с прошлого обхода
+    CRAWL_INCREMENTAL: bool = True
+
+    # конвейер парсинга: размер очередей между стадиями и параллелизм стадий
+    PIPELINE_QUEUE_SIZE: int = 50
+    # очередь загруженных отчетов держит их в памяти до разбора: в памяти не больше
+    # (REPORTS_QUEUE_SIZE + REPORT_DOWNLOAD_CONCURRENCY + PDF_PARSE_CONCURRENCY) * REPORT_MEMORY_THRESHOLD байт
+    REPORTS_QUEUE_SIZE: int = 4
+    REPORT_DOWNLOAD_CONCURRENCY: int = 3
+    PDF_PARSE_CONCURRENCY: int = 2
+    DB_WRITE_BATCH_SIZE: int = 50
+    DB_WRITE_FLUSH_INTERVAL: float = 10
+
+    # запись тендеров: размер многострочного INSERT и порог перехода на COPY
+    DB_UPSERT_CHUNK_SIZE: int = 500
+    DB_COPY_THRESHOLD: int = 2000
+
+    # загрузка отчетов: размер блока, порог хранения в памяти и каталог временных файлов
+    REPORT_CHUNK_SIZE: int = 256 * 1024
+    REPORT_MEMORY_THRESHOLD: int = 16 * 1024 * 1024
+    # каталог очищается при запуске приложения от файлов прерванных загрузок
+    REPORTS_TMP_DIR: str = '/src/reports/tmp'
+
+    # кэш результатов разбора отчетов
+    REPORT_CACHE_MAX_AGE_DAYS: int = 30
+    REPORT_CACHE_MAX_ENTRIES: int = 50000
+
+    # подсказки страниц по шаблонам отчетов: время жизни без находок и число хранимых шаблонов
+    PDF_PAGE_HINTS_MAX_AGE_DAYS: int = 90
+    PDF_PAGE_HINTS_MAX_FINGERPRINTS: int = 1000
+
+    # кэш ответов API поиска тендеров: число тендеров и время жизни записи, секунды
+    RESPONSE_CACHE_MAX_ENTRIES: int = 20000
+    RESPONSE_CACHE_TTL: float = 60 * 60
+
+    # фоновые задачи: предел незавершенных задач в группе и время ожидания их завершения при остановке
+    BACKGROUND_JOBS_MAX_PENDING: int = 10
+    BACKGROUND_STORE_MAX_PENDING: int = 20
+    BACKGROUND_IMAGES_MAX_PENDING: int = 50
+    BACKGROUND_DRAIN_TIMEOUT: float = 30
+
+    # число процессов для разбора PDF отчетов
+    PDF_WORKERS: int = 2
 
     SEARCH_FIELDS: list[str] = [
         'Тип входа',
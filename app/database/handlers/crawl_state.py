@@ -0,0 +1,98 @@
+from .. import models as db_models
+
+from datetime import datetime
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.dialects.postgresql import insert
+
+
+async def db_get_unfinished_run(
+    session: AsyncSession,
+    tender_model,
+) -> db_models.CrawlRuns | None:
+    res = await session.scalars(
+        select(
+            db_models.CrawlRuns,
+        ).where(
+            db_models.CrawlRuns.table_name == tender_model.__tablename__,
+            db_models.CrawlRuns.finished_at.is_(None),
+        ).order_by(
+            db_models.CrawlRuns.started_at.desc()
+        )
+    )
+    return res.first()
+
+
+async def db_add_run(
+    session: AsyncSession,
+    tender_model,
+    run_id: str,
+) -> None:
+    session.add(db_models.CrawlRuns(
+        run_id=run_id,
+        table_name=tender_model.__tablename__,
+        started_at=datetime.now(),
+    ))
+
+
+async def db_set_run_last_page(
+    session: AsyncSession,
+    run_id: str,
+    pagenumber: int,
+) -> None:
+    await session.execute(
+        update(db_models.CrawlRuns)
+        .where(db_models.CrawlRuns.run_id == run_id)
+        .values(last_page=func.greatest(func.coalesce(db_models.CrawlRuns.last_page, 0), pagenumber))
+    )
+
+
+async def db_finish_run(
+    session: AsyncSession,
+    run_id: str,
+) -> None:
+    await session.execute(
+        update(db_models.CrawlRuns)
+        .where(db_models.CrawlRuns.run_id == run_id)
+        .values(finished_at=datetime.now())
+    )
+    await session.execute(
+        delete(db_models.CrawlTenderStages)
+        .where(db_models.CrawlTenderStages.run_id == run_id)
+    )
+
+
+async def db_get_tenders_stages(
+    session: AsyncSession,
+    run_id: str,
+) -> dict[str, str]:
+    res = await session.execute(
+        select(
+            db_models.CrawlTenderStages.tender_id,
+            db_models.CrawlTenderStages.stage,
+        ).where(
+            db_models.CrawlTenderStages.run_id == run_id
+        )
+    )
+    return {tender_id: stage for tender_id, stage in res.all()}
+
+
+async def db_set_tenders_stage(
+    session: AsyncSession,
+    run_id: str,
+    tenders_ids: list[str],
+    stage: str,
+) -> None:
+    if not tenders_ids:
+        return
+    now = datetime.now()
+    stmt = insert(db_models.CrawlTenderStages).values([
+        {'run_id': run_id, 'tender_id': tender_id, 'stage': stage, 'updated_at': now}
+        for tender_id in set(tenders_ids)
+    ])
+    await session.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[db_models.CrawlTenderStages.run_id, db_models.CrawlTenderStages.tender_id],
+            set_={'stage': stmt.excluded.stage, 'updated_at': stmt.excluded.updated_at}
+        )
+    )
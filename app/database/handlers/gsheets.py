@@ -0,0 +1,106 @@
+from datetime import datetime
+
+from .. import models as db_models
+from app.config import settings
+
+from sqlalchemy import ARRAY, Integer, delete, func, literal, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.dialects.postgresql import insert
+
+
+async def db_get_gsheet_state(
+    session: AsyncSession,
+    worksheet: str,
+) -> tuple[str | None, dict[str, tuple[int, str]]]:
+    """
+    Возвращает хэш заголовков листа и записанные на лист строки: {tender_id: (номер строки, хэш)}.
+    """
+    header_hash = await session.scalar(
+        select(
+            db_models.GsheetSyncs.header_hash,
+        ).where(
+            db_models.GsheetSyncs.worksheet == worksheet
+        )
+    )
+    res = await session.execute(
+        select(
+            db_models.GsheetRows.tender_id,
+            db_models.GsheetRows.row_number,
+            db_models.GsheetRows.row_hash,
+        ).where(
+            db_models.GsheetRows.worksheet == worksheet
+        )
+    )
+    return header_hash, {tender_id: (row_number, row_hash) for tender_id, row_number, row_hash in res.all()}
+
+
+async def db_invalidate_gsheet_state(session: AsyncSession, worksheet: str) -> None:
+    """
+    Помечает сохраненное состояние листа недействительным перед записью на лист.
+    Без хэша заголовков следующая синхронизация перезапишет лист целиком, так что
+    выгрузка, прерванная на середине, не оставит состояние, не совпадающее с листом.
+    Хэш сохраняется заново в `db_save_gsheet_state` после успешной выгрузки.
+    """
+    await session.execute(
+        delete(db_models.GsheetSyncs).where(db_models.GsheetSyncs.worksheet == worksheet)
+    )
+
+
+async def db_save_gsheet_state(
+    session: AsyncSession,
+    worksheet: str,
+    header_hash: str,
+    rows: dict[str, tuple[int, str]],
+    removed_ids: list[str],
+    deleted_rows: list[int],
+    replace: bool = False,
+) -> None:
+    """
+    Сохраняет результат синхронизации листа: удаляет строки убранных тендеров, записывает
+    номера и хэши измененных строк и сдвигает вверх строки, оказавшиеся ниже удаленных.
+    При `replace` состояние листа перезаписывается целиком.
+    """
+    if replace:
+        await session.execute(
+            delete(db_models.GsheetRows).where(db_models.GsheetRows.worksheet == worksheet)
+        )
+    elif removed_ids:
+        await session.execute(
+            delete(db_models.GsheetRows).where(
+                db_models.GsheetRows.worksheet == worksheet,
+                db_models.GsheetRows.tender_id.in_(removed_ids),
+            )
+        )
+
+    values = [
+        {'worksheet': worksheet, 'tender_id': tender_id, 'row_number': row_number, 'row_hash': row_hash}
+        for tender_id, (row_number, row_hash) in rows.items()
+    ]
+    # пачками, чтобы не упереться в ограничение asyncpg на число параметров запроса
+    for start in range(0, len(values), settings.DB_UPSERT_CHUNK_SIZE):
+        stmt = insert(db_models.GsheetRows).values(values[start:start + settings.DB_UPSERT_CHUNK_SIZE])
+        await session.execute(
+            stmt.on_conflict_do_update(
+                index_elements=[db_models.GsheetRows.worksheet, db_models.GsheetRows.tender_id],
+                set_={'row_number': stmt.excluded.row_number, 'row_hash': stmt.excluded.row_hash},
+            )
+        )
+
+    if deleted_rows:
+        deleted = func.unnest(literal(deleted_rows, ARRAY(Integer))).table_valued('row_number').render_derived(name='deleted')
+        shift = select(func.count()).select_from(deleted).where(
+            deleted.c.row_number < db_models.GsheetRows.row_number
+        ).scalar_subquery()
+        await session.execute(
+            update(db_models.GsheetRows)
+            .where(db_models.GsheetRows.worksheet == worksheet)
+            .values(row_number=db_models.GsheetRows.row_number - shift)
+        )
+
+    stmt = insert(db_models.GsheetSyncs).values(worksheet=worksheet, header_hash=header_hash, synced_at=datetime.now())
+    await session.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[db_models.GsheetSyncs.worksheet],
+            set_={'header_hash': stmt.excluded.header_hash, 'synced_at': stmt.excluded.synced_at},
+        )
+    )
@@ -1,26 +1,95 @@
+from .. import models as db_models
 from ..session import get_db_session
+from app.src.response_cache import response_cache
 
-from sqlalchemy import update
+from sqlalchemy import String, ARRAY, delete, select, update, values, column, tuple_
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.dialects.postgresql import insert
 
 
 async def db_add_images_links(tender_model, images_links: dict[str, list[str]]) -> None:
+    """
+    Записывает ссылки на изображения всех тендеров одним запросом UPDATE ... FROM (VALUES ...).
+    """
+    if not images_links:
+        return
+    new_links = values(
+        column('tender_id', String),
+        column('images_links', ARRAY(String)),
+        name='new_links',
+    ).data(list(images_links.items()))
+
     async with get_db_session() as session:
-        for tender_id, links in images_links.items():
-            await _db_add_tender_images_links(session, tender_model, tender_id, links)
+        await session.execute(
+            update(tender_model)
+            .where(tender_model.tender_id == new_links.c.tender_id)
+            .values(images_links=new_links.c.images_links)
+        )
         await session.commit()
+    response_cache.invalidate(tender_model.__tablename__, list(images_links))
+
 
+async def db_get_images_manifest(
+    session: AsyncSession,
+    basefolder: str,
+    tenders_ids: list[str],
+) -> dict[str, dict[str, str | None]]:
+    """
+    Возвращает загруженные на Диск изображения тендеров: {tender_id: {имя файла: исходная ссылка}}.
+    """
+    res = await session.scalars(
+        select(
+            db_models.DiskImages,
+        ).where(
+            db_models.DiskImages.basefolder == basefolder,
+            db_models.DiskImages.tender_id.in_(tenders_ids),
+        )
+    )
+    manifest = {}
+    for image in res.all():
+        manifest.setdefault(image.tender_id, {})[image.name] = image.url
+    return manifest
 
-async def _db_add_tender_images_links(
-    session: AsyncSession, 
-    tender_model,
-    tender_id: str,
-    images_links: list[str],
+
+async def db_add_images_manifest(
+    session: AsyncSession,
+    basefolder: str,
+    images: list[dict],
 ) -> None:
+    """
+    Сохраняет изображения в манифест: [{'tender_id': ..., 'name': ..., 'url': ...}].
+    """
+    if not images:
+        return
+    stmt = insert(db_models.DiskImages).values([
+        {'basefolder': basefolder, **image} for image in images
+    ])
     await session.execute(
-        update(tender_model)
-        .where(tender_model.tender_id == tender_id)
-        .values(images_links=images_links)
+        stmt.on_conflict_do_update(
+            index_elements=[
+                db_models.DiskImages.basefolder,
+                db_models.DiskImages.tender_id,
+                db_models.DiskImages.name,
+            ],
+            set_={'url': stmt.excluded.url}
+        )
     )
 
 
+async def db_delete_images_manifest(
+    session: AsyncSession,
+    basefolder: str,
+    tenders_ids: list[str],
+    names: list[tuple[str, str]] | None = None,
+) -> None:
+    """
+    Удаляет из манифеста все изображения тендеров или только пары (tender_id, имя файла) из `names`.
+    """
+    stmt = delete(db_models.DiskImages).where(db_models.DiskImages.basefolder == basefolder)
+    if names is None:
+        stmt = stmt.where(db_models.DiskImages.tender_id.in_(tenders_ids))
+    else:
+        if not names:
+            return
+        stmt = stmt.where(tuple_(db_models.DiskImages.tender_id, db_models.DiskImages.name).in_(names))
+    await session.execute(stmt)
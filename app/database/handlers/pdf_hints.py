@@ -0,0 +1,71 @@
+from .. import models as db_models
+
+from datetime import datetime, timedelta
+from sqlalchemy import select, delete, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.dialects.postgresql import insert
+
+
+async def db_get_page_hints(
+    session: AsyncSession,
+    fingerprint: str,
+) -> list[int]:
+    """
+    Возвращает страницы, на которых находились поля в отчетах шаблона, начиная с самых частых.
+    """
+    res = await session.execute(
+        select(db_models.PdfPageHints.page_index)
+        .where(db_models.PdfPageHints.fingerprint == fingerprint)
+        .order_by(db_models.PdfPageHints.hits.desc(), db_models.PdfPageHints.page_index)
+    )
+    return list(res.scalars().all())
+
+
+async def db_add_page_hints(
+    session: AsyncSession,
+    fingerprint: str,
+    pages: list[int],
+) -> None:
+    if not pages:
+        return
+    now = datetime.now()
+    stmt = insert(db_models.PdfPageHints).values([
+        {'fingerprint': fingerprint, 'page_index': page_index, 'hits': 1, 'updated_at': now}
+        for page_index in set(pages)
+    ])
+    await session.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[db_models.PdfPageHints.fingerprint, db_models.PdfPageHints.page_index],
+            set_={'hits': db_models.PdfPageHints.hits + 1, 'updated_at': stmt.excluded.updated_at}
+        )
+    )
+
+
+async def db_evict_page_hints(
+    session: AsyncSession,
+    max_age: timedelta,
+    max_fingerprints: int,
+) -> int:
+    """
+    Удаляет подсказки шаблонов, которые не обновлялись дольше `max_age`,
+    и подсказки самых давних шаблонов сверх `max_fingerprints`. Возвращает число удаленных записей.
+    """
+    res = await session.execute(
+        delete(db_models.PdfPageHints)
+        .where(db_models.PdfPageHints.updated_at < datetime.now() - max_age)
+        .returning(db_models.PdfPageHints.fingerprint)
+    )
+    evicted = len(res.all())
+
+    keep = (
+        select(db_models.PdfPageHints.fingerprint)
+        .group_by(db_models.PdfPageHints.fingerprint)
+        .order_by(func.max(db_models.PdfPageHints.updated_at).desc())
+        .limit(max_fingerprints)
+    )
+    res = await session.execute(
+        delete(db_models.PdfPageHints)
+        .where(db_models.PdfPageHints.fingerprint.not_in(keep))
+        .returning(db_models.PdfPageHints.fingerprint)
+    )
+    return evicted + len(res.all())
@@ -0,0 +1,90 @@
+from .. import models as db_models
+
+from datetime import datetime, timedelta
+from sqlalchemy import delete, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.dialects.postgresql import insert
+
+
+async def db_get_cached_report(
+    session: AsyncSession,
+    download_link: str,
+) -> db_models.ReportCache | None:
+    res = await session.scalars(
+        select(
+            db_models.ReportCache,
+        ).where(
+            db_models.ReportCache.download_link == download_link
+        )
+    )
+    return res.first()
+
+
+async def db_touch_cached_report(
+    session: AsyncSession,
+    download_link: str,
+) -> None:
+    await session.execute(
+        update(db_models.ReportCache)
+        .where(db_models.ReportCache.download_link == download_link)
+        .values(accessed_at=datetime.now())
+    )
+
+
+async def db_save_cached_report(
+    session: AsyncSession,
+    download_link: str,
+    content_hash: str,
+    search_fields_hash: str,
+    fields: dict,
+    etag: str | None = None,
+    last_modified: str | None = None,
+) -> None:
+    now = datetime.now()
+    values = dict(
+        etag=etag,
+        last_modified=last_modified,
+        content_hash=content_hash,
+        search_fields_hash=search_fields_hash,
+        fields=fields,
+        created_at=now,
+        accessed_at=now,
+    )
+    await session.execute(
+        insert(db_models.ReportCache).values(
+            download_link=download_link,
+            **values,
+        ).on_conflict_do_update(
+            index_elements=[db_models.ReportCache.download_link],
+            set_=values
+        )
+    )
+
+
+async def db_evict_report_cache(
+    session: AsyncSession,
+    max_age: timedelta,
+    max_entries: int,
+) -> int:
+    """
+    Удаляет записи, которые не использовались дольше `max_age`,
+    и самые давние записи сверх `max_entries`. Возвращает число удаленных записей.
+    """
+    res = await session.execute(
+        delete(db_models.ReportCache)
+        .where(db_models.ReportCache.accessed_at < datetime.now() - max_age)
+        .returning(db_models.ReportCache.download_link)
+    )
+    evicted = len(res.all())
+
+    keep = (
+        select(db_models.ReportCache.download_link)
+        .order_by(db_models.ReportCache.accessed_at.desc())
+        .limit(max_entries)
+    )
+    res = await session.execute(
+        delete(db_models.ReportCache)
+        .where(db_models.ReportCache.download_link.not_in(keep))
+        .returning(db_models.ReportCache.download_link)
+    )
+    return evicted + len(res.all())
@@ -1,35 +1,112 @@
+import time
 import pandas as pd
 
+from collections.abc import AsyncGenerator
+
 from .. import models as db_models
 from ..session import get_db_session
 from app.api import models
+from app.config import settings
+from app.logger import logger
+from app.src.metrics import DB_UPSERT_ROWS, DB_UPSERT_DURATION
+from app.src.response_cache import response_cache
 from datetime import datetime
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import delete, select, text
+from sqlalchemy import ARRAY, Integer, delete, func, literal, select, text, table, literal_column
+from sqlalchemy import column as column_
 from sqlalchemy.dialects.postgresql import insert
 
 
-async def _add_tender_data_to_db(
-    session: AsyncSession, 
+def _upsert_stmt(tender_model, target):
+    """
+    INSERT ... ON CONFLICT DO UPDATE, перезаписывающий все колонки, кроме ключа.
+    Возвращает признак вставки новой строки (xmax = 0) для каждой записи.
+    """
+    set_ = {
+        column.name: target.excluded[column.name]
+        for column in tender_model.__table__.columns
+        if column.name != 'tender_id'
+    }
+    return target.on_conflict_do_update(
+        index_elements=[tender_model.tender_id],
+        set_=set_,
+    ).returning(literal_column('xmax = 0'))
+
+
+async def _upsert_rows(
+    session: AsyncSession,
     tender_model,
-    tender: models.NonresidentialDataDB
-) -> None:
-    await session.execute(
-        insert(tender_model).values(
-            **tender.model_dump(),
-        ).on_conflict_do_update(
-            index_elements=[tender_model.tender_id],
-            index_where=tender_model.tender_id == tender.tender_id,
-            set_={**tender.model_dump()}
-        )
+    rows: list[dict],
+) -> list[bool]:
+    res = await session.execute(_upsert_stmt(tender_model, insert(tender_model).values(rows)))
+    return [inserted for inserted, in res.all()]
+
+
+async def _copy_upsert_rows(
+    session: AsyncSession,
+    tender_model,
+    rows: list[dict],
+) -> list[bool]:
+    """
+    Загружает строки через COPY во временную таблицу и переносит их в `tender_model` одним запросом.
+    """
+    table_name = tender_model.__tablename__
+    staging_name = f'{table_name}_staging'
+    columns = list(rows[0].keys())
+
+    await session.execute(text(
+        f'CREATE TEMP TABLE {staging_name} (LIKE {table_name} INCLUDING DEFAULTS) ON COMMIT DROP'
+    ))
+    connection = await session.connection()
+    raw_connection = await connection.get_raw_connection()
+    await raw_connection.driver_connection.copy_records_to_table(
+        staging_name,
+        records=[tuple(row[column] for column in columns) for row in rows],
+        columns=columns,
     )
 
+    staging = table(staging_name, *(column_(name) for name in columns))
+    stmt = insert(tender_model).from_select(columns, select(*staging.columns))
+    res = await session.execute(_upsert_stmt(tender_model, stmt))
+    return [inserted for inserted, in res.all()]
+
 
-async def db_add_tenders(tender_model, tenders: dict[str, models.NonresidentialDataDB]) -> None:
+async def db_add_tenders(tender_model, tenders: dict[str, models.NonresidentialDataDB]) -> dict[str, int]:
+    """
+    Добавляет или обновляет тендеры пачкой. Небольшие пачки отправляются многострочным
+    INSERT ... ON CONFLICT DO UPDATE, крупные (от DB_COPY_THRESHOLD строк) - через COPY
+    во временную таблицу. Возвращает число вставленных и обновленных строк.
+    """
+    rows = [tender.model_dump() for tender in tenders.values()]
+    if not rows:
+        return {'inserted': 0, 'updated': 0}
+
+    inserted = []
+    method = 'copy' if len(rows) >= settings.DB_COPY_THRESHOLD else 'insert'
+    started = time.perf_counter()
     async with get_db_session() as session:
-        for tender in tenders.values():
-            await _add_tender_data_to_db(session, tender_model, tender)
+        if method == 'copy':
+            inserted = await _copy_upsert_rows(session, tender_model, rows)
+        else:
+            for start in range(0, len(rows), settings.DB_UPSERT_CHUNK_SIZE):
+                inserted += await _upsert_rows(session, tender_model, rows[start:start + settings.DB_UPSERT_CHUNK_SIZE])
         await session.commit()
+    response_cache.invalidate(tender_model.__tablename__, [row['tender_id'] for row in rows])
+    DB_UPSERT_ROWS.labels(tender_model.__tablename__, method).observe(len(rows))
+    DB_UPSERT_DURATION.labels(tender_model.__tablename__, method).observe(time.perf_counter() - started)
+
+    result = {'inserted': sum(inserted), 'updated': len(inserted) - sum(inserted)}
+    logger.info(f'Upserted {tender_model.__tablename__}: {result}')
+    return result
+
+
+def _address_in(tender_model, addresses: list[str]):
+    """
+    Поиск по адресу без учета регистра и лишних пробелов, использует индекс по нормализованному адресу.
+    """
+    return db_models.normalized_address(tender_model.address).in_(
+        [db_models.normalized_address(literal(address)) for address in addresses]
+    )
 
 
 async def db_get_tender_by_id(
@@ -69,13 +146,27 @@ async def db_get_tenders_by_address(
     tenders = select(
         db_models.NonresidentialTenders,
     ).where(
-        db_models.NonresidentialTenders.address.in_(address_ids)
+        _address_in(db_models.NonresidentialTenders, address_ids)
     )
     tenders = (await session.scalars(tenders)).all()
     if tenders:
         return [models.NonresidentialDataOut.model_validate(tender) for tender in tenders]
 
 
+async def db_get_tenders_ids_by_address(
+    session: AsyncSession, 
+    addresses: list[str],
+) -> list[str]:
+    tenders_ids = await session.scalars(
+        select(
+            db_models.NonresidentialTenders.tender_id,
+        ).where(
+            _address_in(db_models.NonresidentialTenders, addresses)
+        )
+    )
+    return list(tenders_ids.all())
+
+
 async def db_delete_expired_tenders(
     session: AsyncSession, 
     tender_model,
@@ -83,7 +174,9 @@ async def db_delete_expired_tenders(
     res = await session.execute(
         delete(tender_model).where(tender_model.applications_enddate <= datetime.now()).returning(tender_model.tender_id)
     )
-    return [tender_id[0] for tender_id in res]
+    tenders_ids = [tender_id[0] for tender_id in res]
+    response_cache.invalidate_on_commit(session, tender_model.__tablename__, tenders_ids)
+    return tenders_ids
 
 
 async def db_get_table_columns_descriptions(
@@ -101,16 +194,85 @@ async def db_get_table_columns_descriptions(
     return table_columns_descriptions
 
 
-def pandas_query(session, db_model):
-  conn = session.connection()
-  query = select(db_model)
-  return pd.read_sql_query(query, conn)
+async def db_stream_tenders_of_type(
+    session: AsyncSession,
+    db_model,
+    chunk_size: int,
+    arrays_separator: str | None = None,
+) -> AsyncGenerator[pd.DataFrame, None]:
+    """
+    Читает таблицу тендеров серверным курсором пачками по `chunk_size` строк,
+    не загружая ее в память целиком. Если задан `arrays_separator`, столбцы-массивы
+    склеиваются в строку через него на стороне БД (array_to_string).
+    """
+    columns = [
+        func.array_to_string(column, arrays_separator).label(column.name)
+        if arrays_separator is not None and isinstance(column.type, ARRAY) else column
+        for column in db_model.__table__.columns
+    ]
+    result = await session.stream(
+        select(*columns)
+        .order_by(db_model.tender_id)
+        .execution_options(yield_per=chunk_size)
+    )
+    columns = list(result.keys())
+    # целые с пропусками иначе станут float, и вид значения будет зависеть от соседних строк пачки
+    integer_columns = {
+        column.name: 'Int64' for column in db_model.__table__.columns if isinstance(column.type, Integer)
+    }
+    async for rows in result.partitions():
+        yield pd.DataFrame.from_records(rows, columns=columns, coerce_float=True).astype(integer_columns)
 
 
-async def db_get_all_tenders_of_type_as_pandas_df(
-    session: AsyncSession, 
-    db_model,
-):
-    df = await session.run_sync(pandas_query, db_model=db_model)
-    return df
+async def db_get_tenders_hashes(
+    session: AsyncSession,
+    tender_model,
+    tenders_ids: list[str],
+) -> dict[str, db_models.TenderHashes]:
+    """
+    Возвращает сохраненные хэши тендеров, которые есть в таблице `tender_model`.
+    """
+    hashes = await session.scalars(
+        select(
+            db_models.TenderHashes,
+        ).join(
+            tender_model,
+            tender_model.tender_id == db_models.TenderHashes.tender_id,
+        ).where(
+            db_models.TenderHashes.table_name == tender_model.__tablename__,
+            db_models.TenderHashes.tender_id.in_(tenders_ids),
+        )
+    )
+    return {tender_hash.tender_id: tender_hash for tender_hash in hashes.all()}
+
+
+async def db_save_tenders_hashes(
+    tender_model,
+    hashes: dict[str, dict[str, str]],
+) -> None:
+    """
+    Сохраняет хэши тендеров: {tender_id: {'listing_hash': ..., 'content_hash': ...}}.
+    Не переданные хэши не перезаписываются.
+
+    Тендеры с одинаковым набором хэшей записываются одним запросом на пачку
+    из DB_UPSERT_CHUNK_SIZE строк.
+    """
+    rows_by_columns = {}
+    for tender_id, tender_hashes in hashes.items():
+        rows_by_columns.setdefault(tuple(sorted(tender_hashes)), []).append({
+            'table_name': tender_model.__tablename__,
+            'tender_id': tender_id,
+            **tender_hashes,
+        })
 
+    async with get_db_session() as session:
+        for columns, rows in rows_by_columns.items():
+            for start in range(0, len(rows), settings.DB_UPSERT_CHUNK_SIZE):
+                stmt = insert(db_models.TenderHashes).values(rows[start:start + settings.DB_UPSERT_CHUNK_SIZE])
+                await session.execute(
+                    stmt.on_conflict_do_update(
+                        index_elements=[db_models.TenderHashes.table_name, db_models.TenderHashes.tender_id],
+                        set_={column: stmt.excluded[column] for column in columns},
+                    )
+                )
+        await session.commit()
@@ -1,15 +1,23 @@
+import os
 import asyncio
 
-from sqlalchemy.ext.asyncio import create_async_engine
+from alembic import command
+from alembic.config import Config
 
-from ..config import settings
-from ..database.models import Base
+
+ALEMBIC_CONFIG = os.path.join(os.path.dirname(__file__), 'alembic.ini')
+
+
+def _upgrade() -> None:
+    command.upgrade(Config(ALEMBIC_CONFIG), 'head')
 
 
 async def init_db() -> None:
-    engine = create_async_engine(settings.DB_URL)
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
+    """
+    Применяет миграции схемы БД (app/database/migrations) до последней.
+    Alembic выполняет миграции в собственном цикле событий, поэтому запускается в отдельном потоке.
+    """
+    await asyncio.to_thread(_upgrade)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,152 @@
+"""initial schema
+
+Revision ID: 0001
+Revises: 
+Create Date: 2026-10-18 16:01:29.389083
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = '0001'
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # до появления миграций схема создавалась через create_all при старте,
+    # в такой базе создаются только недостающие таблицы
+    existing_tables = set() if op.get_context().as_sql else set(sa.inspect(op.get_bind()).get_table_names())
+    if 'crawl_runs' not in existing_tables:
+        op.create_table('crawl_runs',
+        sa.Column('run_id', sa.String(), nullable=False, comment='ID обхода'),
+        sa.Column('table_name', sa.String(), nullable=False, comment='Таблица тендеров'),
+        sa.Column('last_page', sa.Integer(), nullable=True, comment='Последняя полностью обработанная страница'),
+        sa.Column('started_at', sa.DateTime(), nullable=False, comment='Начало обхода'),
+        sa.Column('finished_at', sa.DateTime(), nullable=True, comment='Окончание обхода'),
+        sa.PrimaryKeyConstraint('run_id')
+        )
+    if 'crawl_tender_stages' not in existing_tables:
+        op.create_table('crawl_tender_stages',
+        sa.Column('run_id', sa.String(), nullable=False, comment='ID обхода'),
+        sa.Column('tender_id', sa.String(), nullable=False, comment='ID тендера'),
+        sa.Column('stage', sa.String(), nullable=False, comment='Пройденная стадия обработки'),
+        sa.Column('updated_at', sa.DateTime(), nullable=False, comment='Время перехода на стадию'),
+        sa.PrimaryKeyConstraint('run_id', 'tender_id')
+        )
+    if 'disk_images' not in existing_tables:
+        op.create_table('disk_images',
+        sa.Column('basefolder', sa.String(), nullable=False, comment='Папка типа тендеров на Яндекс Диске'),
+        sa.Column('tender_id', sa.String(), nullable=False, comment='ID тендера'),
+        sa.Column('name', sa.String(), nullable=False, comment='Имя файла изображения'),
+        sa.Column('url', sa.String(), nullable=True, comment='Исходная ссылка на изображение'),
+        sa.PrimaryKeyConstraint('basefolder', 'tender_id', 'name')
+        )
+    if 'gsheet_rows' not in existing_tables:
+        op.create_table('gsheet_rows',
+        sa.Column('worksheet', sa.String(), nullable=False, comment='Название листа Google таблицы'),
+        sa.Column('tender_id', sa.String(), nullable=False, comment='ID тендера'),
+        sa.Column('row_number', sa.Integer(), nullable=False, comment='Номер строки на листе (с 1, 1 - заголовки)'),
+        sa.Column('row_hash', sa.String(), nullable=False, comment='Хэш значений строки, записанных на лист'),
+        sa.PrimaryKeyConstraint('worksheet', 'tender_id')
+        )
+    if 'gsheet_syncs' not in existing_tables:
+        op.create_table('gsheet_syncs',
+        sa.Column('worksheet', sa.String(), nullable=False, comment='Название листа Google таблицы'),
+        sa.Column('header_hash', sa.String(), nullable=False, comment='Хэш заголовков столбцов листа'),
+        sa.Column('synced_at', sa.DateTime(), nullable=False, comment='Время последней синхронизации'),
+        sa.PrimaryKeyConstraint('worksheet')
+        )
+    if 'nonresidential_tenders' not in existing_tables:
+        op.create_table('nonresidential_tenders',
+        sa.Column('tender_id', sa.String(), nullable=False, comment='ID тендера'),
+        sa.Column('investmoscow_url', sa.String(), nullable=True, comment='Сылка на investmoscow'),
+        sa.Column('address', sa.String(), nullable=False, comment='Адрес'),
+        sa.Column('region_name', sa.String(), nullable=True, comment='Округ'),
+        sa.Column('district_name', sa.String(), nullable=True, comment='Район'),
+        sa.Column('subway_stations', sa.String(), nullable=True, comment='Метро'),
+        sa.Column('object_area', sa.Float(), nullable=True, comment='Площадь'),
+        sa.Column('deposit', sa.Float(), nullable=True, comment='Задаток'),
+        sa.Column('start_price', sa.Float(), nullable=True, comment='Начальная цена'),
+        sa.Column('m1_start_price', sa.Float(), nullable=True),
+        sa.Column('min_price', sa.Float(), nullable=True, comment='Минимальная цена'),
+        sa.Column('m1_min_price', sa.Float(), nullable=True),
+        sa.Column('procedure_form', sa.String(), nullable=True, comment='Форма'),
+        sa.Column('auction_step', sa.Float(), nullable=True, comment='Шаг аукциона'),
+        sa.Column('price_decrease_step', sa.Float(), nullable=True, comment='Шаг понижения цены'),
+        sa.Column('applications_enddate', sa.DateTime(), nullable=True, comment='Дата окончания приема заявок'),
+        sa.Column('tendering', sa.DateTime(), nullable=True, comment='Проведение торгов'),
+        sa.Column('entrance_type', sa.String(), nullable=True, comment='Тип входа'),
+        sa.Column('windows', sa.String(), nullable=True, comment='Окна'),
+        sa.Column('ceilings', sa.String(), nullable=True, comment='Потолки'),
+        sa.Column('floor', sa.String(), nullable=True, comment='Этаж'),
+        sa.Column('lat', sa.Float(), nullable=True, comment='Широта'),
+        sa.Column('lon', sa.Float(), nullable=True, comment='Долгота'),
+        sa.Column('images_links', sa.ARRAY(sa.String()), nullable=True, comment='Ссылки на изображения (для авито)'),
+        sa.PrimaryKeyConstraint('tender_id')
+        )
+    if 'parking_spaces_tenders' not in existing_tables:
+        op.create_table('parking_spaces_tenders',
+        sa.Column('tender_id', sa.String(), nullable=False, comment='ID тендера'),
+        sa.Column('investmoscow_url', sa.String(), nullable=True, comment='Сылка на investmoscow'),
+        sa.Column('address', sa.String(), nullable=False, comment='Адрес'),
+        sa.Column('region_name', sa.String(), nullable=True, comment='Округ'),
+        sa.Column('district_name', sa.String(), nullable=True, comment='Район'),
+        sa.Column('subway_stations', sa.String(), nullable=True, comment='Метро'),
+        sa.Column('procedure_form', sa.String(), nullable=True, comment='Форма'),
+        sa.Column('start_price', sa.Float(), nullable=True, comment='Начальная цена'),
+        sa.Column('deposit', sa.Float(), nullable=True, comment='Задаток'),
+        sa.Column('applications_enddate', sa.DateTime(), nullable=True, comment='Дата окончания приема заявок'),
+        sa.Column('floor', sa.String(), nullable=True, comment='Этаж'),
+        sa.Column('parking_type', sa.String(), nullable=True, comment='Тип парковки'),
+        sa.Column('parking_place', sa.String(), nullable=True, comment='Место парковки'),
+        sa.Column('object_area', sa.Float(), nullable=True, comment='Площадь'),
+        sa.Column('count', sa.Integer(), nullable=True, comment='Количество'),
+        sa.Column('images_links', sa.ARRAY(sa.String()), nullable=True, comment='Ссылки на изображения (для авито)'),
+        sa.PrimaryKeyConstraint('tender_id')
+        )
+    if 'pdf_page_hints' not in existing_tables:
+        op.create_table('pdf_page_hints',
+        sa.Column('fingerprint', sa.String(), nullable=False, comment='Отпечаток шаблона отчета'),
+        sa.Column('page_index', sa.Integer(), nullable=False, comment='Номер страницы (с 0)'),
+        sa.Column('hits', sa.Integer(), nullable=False, comment='Сколько раз на странице найдены поля'),
+        sa.PrimaryKeyConstraint('fingerprint', 'page_index')
+        )
+    if 'report_cache' not in existing_tables:
+        op.create_table('report_cache',
+        sa.Column('download_link', sa.String(), nullable=False, comment='Ссылка на отчет об оценке'),
+        sa.Column('etag', sa.String(), nullable=True, comment='ETag ответа'),
+        sa.Column('last_modified', sa.String(), nullable=True, comment='Last-Modified ответа'),
+        sa.Column('content_hash', sa.String(), nullable=False, comment='SHA-256 содержимого отчета'),
+        sa.Column('search_fields_hash', sa.String(), nullable=False, comment='Хэш списка искомых полей'),
+        sa.Column('fields', postgresql.JSONB(astext_type=sa.Text()), nullable=False, comment='Найденные в отчете поля'),
+        sa.Column('created_at', sa.DateTime(), nullable=False, comment='Дата разбора отчета'),
+        sa.Column('accessed_at', sa.DateTime(), nullable=False, comment='Дата последнего использования'),
+        sa.PrimaryKeyConstraint('download_link')
+        )
+    if 'tender_hashes' not in existing_tables:
+        op.create_table('tender_hashes',
+        sa.Column('table_name', sa.String(), nullable=False, comment='Таблица тендера'),
+        sa.Column('tender_id', sa.String(), nullable=False, comment='ID тендера'),
+        sa.Column('listing_hash', sa.String(), nullable=True, comment='Хэш данных тендера из поисковой выдачи'),
+        sa.Column('content_hash', sa.String(), nullable=True, comment='Хэш подробной информации о тендере'),
+        sa.PrimaryKeyConstraint('table_name', 'tender_id')
+        )
+
+
+def downgrade() -> None:
+    op.drop_table('tender_hashes')
+    op.drop_table('report_cache')
+    op.drop_table('pdf_page_hints')
+    op.drop_table('parking_spaces_tenders')
+    op.drop_table('nonresidential_tenders')
+    op.drop_table('gsheet_syncs')
+    op.drop_table('gsheet_rows')
+    op.drop_table('disk_images')
+    op.drop_table('crawl_tender_stages')
+    op.drop_table('crawl_runs')
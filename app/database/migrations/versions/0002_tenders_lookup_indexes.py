@@ -0,0 +1,64 @@
+"""tenders lookup indexes
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 16:40:12.511934
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0002'
+down_revision: Union[str, None] = '0001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+TENDERS_TABLES = ('nonresidential_tenders', 'parking_spaces_tenders')
+
+# то же выражение, что models.normalized_address
+NORMALIZED_ADDRESS = sa.text(r"lower(regexp_replace(btrim(address), '\s+', ' ', 'g'))")
+
+
+def upgrade() -> None:
+    # индексы строятся без блокировки записи в таблицы (CONCURRENTLY),
+    # это возможно только вне транзакции
+    with op.get_context().autocommit_block():
+        for table in TENDERS_TABLES:
+            op.create_index(
+                f'ix_{table}_applications_enddate',
+                table,
+                ['applications_enddate'],
+                postgresql_concurrently=True,
+                if_not_exists=True,
+            )
+            op.create_index(
+                f'ix_{table}_region_district',
+                table,
+                ['region_name', 'district_name'],
+                postgresql_concurrently=True,
+                if_not_exists=True,
+            )
+            op.create_index(
+                f'ix_{table}_address_normalized',
+                table,
+                [NORMALIZED_ADDRESS],
+                postgresql_concurrently=True,
+                if_not_exists=True,
+            )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for table in TENDERS_TABLES:
+            for index in ('address_normalized', 'region_district', 'applications_enddate'):
+                op.drop_index(
+                    f'ix_{table}_{index}',
+                    table_name=table,
+                    postgresql_concurrently=True,
+                    if_exists=True,
+                )
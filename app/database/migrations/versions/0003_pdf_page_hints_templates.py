@@ -0,0 +1,32 @@
+"""pdf page hints by report template
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 18:05:41.207316
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0003'
+down_revision: Union[str, None] = '0002'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # прежний отпечаток включал текст первой страницы и был уникален для каждого отчета,
+    # такие подсказки не совпадут ни с одним новым отпечатком шаблона
+    op.execute('DELETE FROM pdf_page_hints')
+    op.add_column(
+        'pdf_page_hints',
+        sa.Column('updated_at', sa.DateTime(), nullable=False, comment='Дата последней находки'),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column('pdf_page_hints', 'updated_at')
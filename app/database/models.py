@@ -6,17 +6,38 @@ from sqlalchemy import (
     Integer,
     DateTime,
     ARRAY,
-    orm
+    Index,
+    func,
+    orm,
+    text,
 )
+from sqlalchemy.dialects.postgresql import JSONB
 
 
 class Base(AsyncAttrs, orm.DeclarativeBase):
     pass
 
 
+def normalized_address(address):
+    """
+    Адрес без учета регистра и лишних пробелов. По этому выражению ищутся тендеры
+    по адресу и построен индекс, поэтому шаблон и флаги передаются литералами:
+    с параметрами запроса выражение не совпадет с индексным.
+    """
+    return func.lower(func.regexp_replace(
+        func.btrim(address),
+        text(r"'\s+'"),
+        text("' '"),
+        text("'g'"),
+    ))
+
+
 class NonresidentialTenders(Base):
 
     __tablename__ = "nonresidential_tenders"
+    __table_args__ = (
+        Index('ix_nonresidential_tenders_region_district', 'region_name', 'district_name'),
+    )
 
     tender_id: orm.Mapped[str] = orm.mapped_column(String, primary_key=True, comment="ID тендера")
     investmoscow_url: orm.Mapped[str] = orm.mapped_column(String, nullable=True, comment="Сылка на investmoscow")
@@ -36,7 +57,7 @@ class NonresidentialTenders(Base):
     auction_step: orm.Mapped[float] = orm.mapped_column(Float, nullable=True, comment="Шаг аукциона")
     price_decrease_step: orm.Mapped[float] = orm.mapped_column(Float, nullable=True, comment="Шаг понижения цены")
 
-    applications_enddate: orm.Mapped[datetime] = orm.mapped_column(DateTime, nullable=True, comment="Дата окончания приема заявок")
+    applications_enddate: orm.Mapped[datetime] = orm.mapped_column(DateTime, nullable=True, index=True, comment="Дата окончания приема заявок")
     tendering: orm.Mapped[datetime] = orm.mapped_column(DateTime, nullable=True, comment="Проведение торгов")
 
     entrance_type: orm.Mapped[str] = orm.mapped_column(String, nullable=True, comment="Тип входа")
@@ -53,6 +74,9 @@ class NonresidentialTenders(Base):
 class ParkingSpacesTenders(Base):
 
     __tablename__ = "parking_spaces_tenders"
+    __table_args__ = (
+        Index('ix_parking_spaces_tenders_region_district', 'region_name', 'district_name'),
+    )
 
     tender_id: orm.Mapped[str] = orm.mapped_column(String, primary_key=True, comment="ID тендера")
 
@@ -64,7 +88,7 @@ class ParkingSpacesTenders(Base):
     procedure_form: orm.Mapped[str] = orm.mapped_column(String, nullable=True, comment="Форма")
     start_price: orm.Mapped[float] = orm.mapped_column(Float, nullable=True, comment="Начальная цена")
     deposit: orm.Mapped[float] = orm.mapped_column(Float, nullable=True, comment="Задаток")
-    applications_enddate: orm.Mapped[datetime] = orm.mapped_column(DateTime, nullable=True, comment="Дата окончания приема заявок")
+    applications_enddate: orm.Mapped[datetime] = orm.mapped_column(DateTime, nullable=True, index=True, comment="Дата окончания приема заявок")
     floor: orm.Mapped[str] = orm.mapped_column(String, nullable=True, comment="Этаж")
     parking_type: orm.Mapped[str] = orm.mapped_column(String, nullable=True, comment="Тип парковки")
     parking_place: orm.Mapped[str] = orm.mapped_column(String, nullable=True, comment="Место парковки")
@@ -73,3 +97,90 @@ class ParkingSpacesTenders(Base):
 
     images_links: orm.Mapped[list[str]] = orm.mapped_column(ARRAY(String), nullable=True, comment="Ссылки на изображения (для авито)")
 
+
+Index('ix_nonresidential_tenders_address_normalized', normalized_address(NonresidentialTenders.address))
+Index('ix_parking_spaces_tenders_address_normalized', normalized_address(ParkingSpacesTenders.address))
+
+
+class PdfPageHints(Base):
+
+    __tablename__ = "pdf_page_hints"
+
+    fingerprint: orm.Mapped[str] = orm.mapped_column(String, primary_key=True, comment="Отпечаток шаблона отчета")
+    page_index: orm.Mapped[int] = orm.mapped_column(Integer, primary_key=True, comment="Номер страницы (с 0)")
+    hits: orm.Mapped[int] = orm.mapped_column(Integer, nullable=False, default=0, comment="Сколько раз на странице найдены поля")
+    updated_at: orm.Mapped[datetime] = orm.mapped_column(DateTime, nullable=False, comment="Дата последней находки")
+
+
+class ReportCache(Base):
+
+    __tablename__ = "report_cache"
+
+    download_link: orm.Mapped[str] = orm.mapped_column(String, primary_key=True, comment="Ссылка на отчет об оценке")
+    etag: orm.Mapped[str] = orm.mapped_column(String, nullable=True, comment="ETag ответа")
+    last_modified: orm.Mapped[str] = orm.mapped_column(String, nullable=True, comment="Last-Modified ответа")
+    content_hash: orm.Mapped[str] = orm.mapped_column(String, nullable=False, comment="SHA-256 содержимого отчета")
+    search_fields_hash: orm.Mapped[str] = orm.mapped_column(String, nullable=False, comment="Хэш списка искомых полей")
+    fields: orm.Mapped[dict] = orm.mapped_column(JSONB, nullable=False, comment="Найденные в отчете поля")
+    created_at: orm.Mapped[datetime] = orm.mapped_column(DateTime, nullable=False, comment="Дата разбора отчета")
+    accessed_at: orm.Mapped[datetime] = orm.mapped_column(DateTime, nullable=False, comment="Дата последнего использования")
+
+
+class TenderHashes(Base):
+
+    __tablename__ = "tender_hashes"
+
+    table_name: orm.Mapped[str] = orm.mapped_column(String, primary_key=True, comment="Таблица тендера")
+    tender_id: orm.Mapped[str] = orm.mapped_column(String, primary_key=True, comment="ID тендера")
+    listing_hash: orm.Mapped[str] = orm.mapped_column(String, nullable=True, comment="Хэш данных тендера из поисковой выдачи")
+    content_hash: orm.Mapped[str] = orm.mapped_column(String, nullable=True, comment="Хэш подробной информации о тендере")
+
+
+class CrawlRuns(Base):
+
+    __tablename__ = "crawl_runs"
+
+    run_id: orm.Mapped[str] = orm.mapped_column(String, primary_key=True, comment="ID обхода")
+    table_name: orm.Mapped[str] = orm.mapped_column(String, nullable=False, comment="Таблица тендеров")
+    last_page: orm.Mapped[int] = orm.mapped_column(Integer, nullable=True, comment="Последняя полностью обработанная страница")
+    started_at: orm.Mapped[datetime] = orm.mapped_column(DateTime, nullable=False, comment="Начало обхода")
+    finished_at: orm.Mapped[datetime] = orm.mapped_column(DateTime, nullable=True, comment="Окончание обхода")
+
+
+class CrawlTenderStages(Base):
+
+    __tablename__ = "crawl_tender_stages"
+
+    run_id: orm.Mapped[str] = orm.mapped_column(String, primary_key=True, comment="ID обхода")
+    tender_id: orm.Mapped[str] = orm.mapped_column(String, primary_key=True, comment="ID тендера")
+    stage: orm.Mapped[str] = orm.mapped_column(String, nullable=False, comment="Пройденная стадия обработки")
+    updated_at: orm.Mapped[datetime] = orm.mapped_column(DateTime, nullable=False, comment="Время перехода на стадию")
+
+
+class DiskImages(Base):
+
+    __tablename__ = "disk_images"
+
+    basefolder: orm.Mapped[str] = orm.mapped_column(String, primary_key=True, comment="Папка типа тендеров на Яндекс Диске")
+    tender_id: orm.Mapped[str] = orm.mapped_column(String, primary_key=True, comment="ID тендера")
+    name: orm.Mapped[str] = orm.mapped_column(String, primary_key=True, comment="Имя файла изображения")
+    url: orm.Mapped[str] = orm.mapped_column(String, nullable=True, comment="Исходная ссылка на изображение")
+
+
+class GsheetSyncs(Base):
+
+    __tablename__ = "gsheet_syncs"
+
+    worksheet: orm.Mapped[str] = orm.mapped_column(String, primary_key=True, comment="Название листа Google таблицы")
+    header_hash: orm.Mapped[str] = orm.mapped_column(String, nullable=False, comment="Хэш заголовков столбцов листа")
+    synced_at: orm.Mapped[datetime] = orm.mapped_column(DateTime, nullable=False, comment="Время последней синхронизации")
+
+
+class GsheetRows(Base):
+
+    __tablename__ = "gsheet_rows"
+
+    worksheet: orm.Mapped[str] = orm.mapped_column(String, primary_key=True, comment="Название листа Google таблицы")
+    tender_id: orm.Mapped[str] = orm.mapped_column(String, primary_key=True, comment="ID тендера")
+    row_number: orm.Mapped[int] = orm.mapped_column(Integer, nullable=False, comment="Номер строки на листе (с 1, 1 - заголовки)")
+    row_hash: orm.Mapped[str] = orm.mapped_column(String, nullable=False, comment="Хэш значений строки, записанных на лист")
@@ -1,9 +1,9 @@
-import asyncio
-
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 
 from app.logger import logger
 from app.config import settings
+from app.src.metrics import track_job
+from app.src.tasks import background_tasks
 
 from app.src.parse.nonresidential_tenders import parse_nonresidential
 from app.src.parse.parking_spaces_tenders import parse_parking_spaces
@@ -20,18 +20,18 @@ scheduler = AsyncIOScheduler()
 @scheduler.scheduled_job('interval', hours=5)
 async def parse_nonresidential_task():
     logger.info('Starting parse_nonresidential_task')
-    asyncio.create_task(parse_nonresidential(settings.SEARCH_FIELDS ))
+    await background_tasks.spawn('jobs', track_job('parse_nonresidential', parse_nonresidential(settings.SEARCH_FIELDS)))
 
 
 @scheduler.scheduled_job('interval', hours=5)
 async def parse_parking_spaces_task():
     logger.info('Starting parse_parking_spaces_task')
-    asyncio.create_task(parse_parking_spaces())
+    await background_tasks.spawn('jobs', track_job('parse_parking_spaces', parse_parking_spaces()))
 
 
 @scheduler.scheduled_job('interval', hours=12)
 async def delete_expired_tenders_task():
-    asyncio.create_task(handler_delete_expired_tenders())
+    await background_tasks.spawn('jobs', track_job('delete_expired_tenders', handler_delete_expired_tenders()))
 
 
 @scheduler.scheduled_job('interval', hours=6)
@@ -47,11 +47,15 @@ async def update_google_sheet():
         },
     }
 
-    for worksheet in (settings.NONRESIDENTIAL_WORKSHEET_TITLE, settings.NONRESIDENTIAL_WORKSHEET_TITLE ):
-        asyncio.create_task(
-            update_google_sheet_data(
-                models_mapping[worksheet]['db_model'], 
-                worksheet,
+    for worksheet in (settings.PARKING_SPACES_WORKSHEET_TITLE, settings.NONRESIDENTIAL_WORKSHEET_TITLE):
+        await background_tasks.spawn(
+            'jobs',
+            track_job(
+                f'update_google_sheet:{worksheet}',
+                update_google_sheet_data(
+                    models_mapping[worksheet]['db_model'], 
+                    worksheet,
+                ),
             )
         )
 
@@ -0,0 +1,212 @@
+import asyncio
+
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import pygsheets
+
+from app.config import settings
+from app.logger import logger
+from app.src.utils import json_hash
+
+
+# pygsheets блокирующий и не потокобезопасный: все обращения к Google Sheets
+# выполняются в одном отдельном потоке, там же живет авторизованный клиент
+_executor: ThreadPoolExecutor | None = None
+_spreadsheet: pygsheets.Spreadsheet | None = None
+
+# даты выводятся так же, как их выводил set_dataframe, чтобы не менять вид уже выгруженных строк
+SHEET_DATETIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+# разделитель ссылок на фото в одной ячейке, нужен для автоматической выгрузки на авито
+IMAGES_LINKS_SEPARATOR = ' | '
+
+
+async def run_in_sheets_thread(func, *args):
+    """
+    Выполняет блокирующую функцию работы с Google Sheets в потоке выгрузки.
+    """
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='gsheets')
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, func, *args)
+
+
+def shutdown_gsheets_executor() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def open_worksheet(title: str) -> pygsheets.Worksheet:
+    """
+    Возвращает лист таблицы GSHEETURL. Клиент авторизуется и открывает таблицу один раз,
+    при каждом вызове заново запрашиваются только свойства листов (размеры могли измениться).
+    """
+    global _spreadsheet
+    if _spreadsheet is None:
+        logger.info('connecting to GSheets...')
+        client = pygsheets.authorize(service_file=settings.GSHEETS_CREDS_PATH)
+        logger.info('Opening gsheet by url...')
+        _spreadsheet = client.open_by_url(settings.GSHEETURL)
+    return _spreadsheet.worksheets('title', title, force_fetch=True)[0]
+
+
+def reset_spreadsheet() -> None:
+    """
+    Сбрасывает закэшированную таблицу, следующая выгрузка авторизуется заново.
+    """
+    global _spreadsheet
+    _spreadsheet = None
+
+
+def sheet_values(df: pd.DataFrame) -> list[list[str]]:
+    """
+    Приводит пачку тендеров к значениям ячеек по столбцам, без обхода строк:
+    даты форматируются, пропуски любого типа (NaN, NaT, NA) становятся пустыми ячейками,
+    значения, начинающиеся с = или +, экранируются апострофом, чтобы не стать формулами.
+    """
+    columns = {}
+    for name, column in df.items():
+        if pd.api.types.is_datetime64_any_dtype(column):
+            column = column.dt.strftime(SHEET_DATETIME_FORMAT)
+        column = column.astype(object).where(column.notna(), '').astype('unicode')
+        columns[name] = column.mask(column.str.startswith(('=', '+')), "'" + column)
+    return pd.DataFrame(columns, index=df.index).values.tolist()
+
+
+class SheetDiff:
+    """
+    Изменения листа относительно последней синхронизации, строки добавляются пачками.
+
+    Измененные строки перезаписываются на месте, новые занимают строки убранных тендеров,
+    а оставшиеся новые дописываются в конец листа. Строки убранных тендеров, которые
+    не заняли новые, удаляются. Строка 1 - заголовки, строки тендеров идут подряд со 2-й.
+
+    После `finish`: `writes` - строки для записи {номер строки: значения}, `state` - новые
+    номера и хэши записанных строк, `removed_ids` - тендеры, которых больше нет на листе,
+    `deleted_rows` - строки, которые нужно удалить.
+    """
+
+    def __init__(self, stored: dict[str, tuple[int, str]]):
+        self.stored = stored
+        self.writes: dict[int, list[str]] = {}
+        self.state: dict[str, tuple[int, str]] = {}
+        self.removed_ids: list[str] = []
+        self.deleted_rows: list[int] = []
+        self._added = []
+        self._seen = set()
+
+    def add(self, rows) -> None:
+        """
+        Сравнивает пачку строк - пар (tender_id, значения) - с записанными на лист.
+        """
+        for tender_id, values in rows:
+            self._seen.add(tender_id)
+            row_hash = json_hash(values)
+            if tender_id not in self.stored:
+                self._added.append((tender_id, values, row_hash))
+                continue
+            row_number, stored_hash = self.stored[tender_id]
+            if row_hash != stored_hash:
+                self.writes[row_number] = values
+                self.state[tender_id] = (row_number, row_hash)
+
+    def finish(self) -> 'SheetDiff':
+        self.removed_ids = [tender_id for tender_id in self.stored if tender_id not in self._seen]
+        free_rows = sorted(self.stored[tender_id][0] for tender_id in self.removed_ids)
+        next_row = len(self.stored) + 2
+        for index, (tender_id, values, row_hash) in enumerate(self._added):
+            if index < len(free_rows):
+                row_number = free_rows[index]
+            else:
+                row_number = next_row
+                next_row += 1
+            self.writes[row_number] = values
+            self.state[tender_id] = (row_number, row_hash)
+        self.deleted_rows = free_rows[len(self._added):]
+        self._added = []
+        return self
+
+
+def _row_ranges(rows_numbers: list[int]) -> list[tuple[int, int]]:
+    """
+    Объединяет номера строк в диапазоны идущих подряд строк.
+    """
+    ranges = []
+    for row_number in sorted(rows_numbers):
+        if ranges and ranges[-1][1] == row_number - 1:
+            ranges[-1] = (ranges[-1][0], row_number)
+        else:
+            ranges.append((row_number, row_number))
+    return ranges
+
+
+def write_rows(worksheet, writes: dict[int, list[str]], cols_count: int) -> None:
+    """
+    Записывает строки диапазонами через values.batchUpdate, не больше
+    GSHEETS_BATCH_ROWS строк за запрос.
+    """
+    if not writes:
+        return
+    last_row = max(writes)
+    if last_row > worksheet.rows:
+        worksheet.rows = last_row
+
+    batch_ranges, batch_values, batch_rows = [], [], 0
+    for start, end in _row_ranges(list(writes)):
+        while start <= end:
+            chunk_end = min(end, start + settings.GSHEETS_BATCH_ROWS - batch_rows - 1)
+            batch_ranges.append(((start, 1), (chunk_end, cols_count)))
+            batch_values.append([writes[row_number] for row_number in range(start, chunk_end + 1)])
+            batch_rows += chunk_end - start + 1
+            start = chunk_end + 1
+            if batch_rows >= settings.GSHEETS_BATCH_ROWS:
+                worksheet.update_values_batch(batch_ranges, batch_values)
+                batch_ranges, batch_values, batch_rows = [], [], 0
+    if batch_ranges:
+        worksheet.update_values_batch(batch_ranges, batch_values)
+
+
+def delete_rows(worksheet, rows_numbers: list[int]) -> None:
+    """
+    Удаляет строки одним запросом batchUpdate. Строки удаляются снизу вверх,
+    чтобы удаление одной не сдвигало номера следующих.
+    """
+    if not rows_numbers:
+        return
+    requests = [
+        {'deleteDimension': {'range': {
+            'sheetId': worksheet.id,
+            'dimension': 'ROWS',
+            'startIndex': start - 1,
+            'endIndex': end,
+        }}}
+        for start, end in reversed(_row_ranges(rows_numbers))
+    ]
+    worksheet.spreadsheet.custom_request(requests, fields='spreadsheetId')
+    worksheet.jsonSheet['properties']['gridProperties']['rowCount'] -= len(rows_numbers)
+
+
+def write_block(worksheet, start_row: int, values: list[list[str]]) -> None:
+    """
+    Записывает идущие подряд строки начиная со строки `start_row`, при необходимости добавляя строки листа.
+    """
+    if not values:
+        return
+    end_row = start_row + len(values) - 1
+    cols_count = max(map(len, values))
+    if end_row > worksheet.rows or cols_count > worksheet.cols:
+        worksheet.resize(rows=max(worksheet.rows, end_row), cols=max(worksheet.cols, cols_count))
+    worksheet.update_values((start_row, 1), values)
+
+
+def clear_tail(worksheet, rows_count: int, cols_count: int) -> None:
+    """
+    Очищает строки и столбцы листа за пределами записанных данных.
+    """
+    if worksheet.rows > rows_count:
+        worksheet.clear(start=(rows_count + 1, 1), end=(worksheet.rows, worksheet.cols))
+    if worksheet.cols > cols_count:
+        worksheet.clear(start=(1, cols_count + 1), end=(rows_count, worksheet.cols))
@@ -0,0 +1,59 @@
+import aiohttp
+
+from app.config import settings
+from app.src.metrics import http_trace_config
+
+
+class HttpClients:
+    """
+    Долгоживущие сессии aiohttp, общие для всего приложения.
+    Для investmoscow и Яндекс Диска держатся отдельные пулы keep-alive соединений
+    с кэшированием DNS и ограничением числа соединений на хост.
+    """
+
+    def __init__(self):
+        self._investmoscow: aiohttp.ClientSession | None = None
+        self._yadisk: aiohttp.ClientSession | None = None
+
+    @staticmethod
+    def _make_connector() -> aiohttp.TCPConnector:
+        return aiohttp.TCPConnector(
+            ssl=settings.SSL,
+            limit=settings.HTTP_CONNECTIONS_LIMIT,
+            limit_per_host=settings.HTTP_CONNECTIONS_LIMIT_PER_HOST,
+            ttl_dns_cache=settings.HTTP_DNS_CACHE_TTL,
+            keepalive_timeout=settings.HTTP_KEEPALIVE_TIMEOUT,
+        )
+
+    @property
+    def investmoscow(self) -> aiohttp.ClientSession:
+        if self._investmoscow is None or self._investmoscow.closed:
+            self._investmoscow = aiohttp.ClientSession(
+                connector=self._make_connector(),
+                trace_configs=[http_trace_config('investmoscow')],
+            )
+        return self._investmoscow
+
+    @property
+    def yadisk(self) -> aiohttp.ClientSession:
+        if self._yadisk is None or self._yadisk.closed:
+            self._yadisk = aiohttp.ClientSession(
+                connector=self._make_connector(),
+                headers={'accept': 'application/json', 'Authorization': 'OAuth %s' % settings.YADISK_OAUTH_TOKEN},
+                trace_configs=[http_trace_config('yadisk')],
+            )
+        return self._yadisk
+
+    async def start(self):
+        self.investmoscow
+        self.yadisk
+
+    async def close(self):
+        for session in (self._investmoscow, self._yadisk):
+            if session is not None and not session.closed:
+                await session.close()
+        self._investmoscow = None
+        self._yadisk = None
+
+
+http_clients = HttpClients()
@@ -1,12 +1,81 @@
+import asyncio
 import aiohttp
 
 from ..config import settings
+from ..logger import logger
+from .http_clients import http_clients
 from ..api.models import TenderImages, TenderImagesInfo
-from ..database.handlers.images import db_add_images_links
+from ..database.session import get_db_session
+from ..database.handlers.images import (
+    db_add_images_links,
+    db_get_images_manifest,
+    db_add_images_manifest,
+    db_delete_images_manifest,
+)
+
+
+class ImagesLinksAccumulator:
+    """
+    Собирает ссылки на изображения от параллельных задач `process_images`
+    и записывает их в БД одним запросом на каждые IMAGES_LINKS_FLUSH_SIZE тендеров
+    или раз в IMAGES_LINKS_FLUSH_INTERVAL секунд.
+
+    Таймер записи не ставится в группу фоновых задач 'images': задачи этой группы
+    ждут записи своих ссылок, и при заполненной группе таймер не смог бы запуститься.
+    Ссылка на таймер хранится в `_flush_task`, `flush` его отменяет.
+    """
+
+    def __init__(self):
+        self._buffers: dict = {}
+        self._waiters: list[asyncio.Future] = []
+        self._flush_task: asyncio.Task | None = None
+
+    def _buffered(self) -> int:
+        return sum(len(links) for links in self._buffers.values())
+
+    async def add(self, tender_model, images_links: dict[str, list[str]]) -> None:
+        """
+        Добавляет ссылки в очередь записи и ждет, пока они будут записаны в БД.
+        """
+        self._buffers.setdefault(tender_model, {}).update(images_links)
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+
+        if self._buffered() >= settings.IMAGES_LINKS_FLUSH_SIZE:
+            await self.flush()
+        elif self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_later(), name='images_links_flush')
+        await waiter
+
+    async def _flush_later(self) -> None:
+        await asyncio.sleep(settings.IMAGES_LINKS_FLUSH_INTERVAL)
+        await self.flush()
+
+    async def flush(self) -> None:
+        if self._flush_task is not None and self._flush_task is not asyncio.current_task():
+            self._flush_task.cancel()
+        self._flush_task = None
+        buffers, waiters = self._buffers, self._waiters
+        self._buffers, self._waiters = {}, []
+        try:
+            for tender_model, images_links in buffers.items():
+                await db_add_images_links(tender_model, images_links)
+        except Exception as e:
+            logger.exception('Exception while saving images links')
+            for waiter in waiters:
+                if not waiter.done():
+                    waiter.set_exception(e)
+        else:
+            for waiter in waiters:
+                if not waiter.done():
+                    waiter.set_result(None)
+
+
+images_links_accumulator = ImagesLinksAccumulator()
 
 
 async def get_drive_info(session):
-    url = 'https://cloud-api.yandex.net/v1/disk/'
+    url = f'{settings.YADISK_API_URL}/v1/disk/'
     async with session.get(url) as response:
         return response.status, await response.json()
 
@@ -15,39 +84,110 @@ async def get_drive_info(session):
 async def get_item_info(
     session,
     url: str | None = None,
-    path: str | None = None
+    path: str | None = None,
+    fields: str | None = None,
+    limit: int | None = None,
+    offset: int | None = None,
 ):
     params = {}
     if not url:
         params['path'] = path
-        url = 'https://cloud-api.yandex.net/v1/disk/resources'
+        url = f'{settings.YADISK_API_URL}/v1/disk/resources'
+    if fields:
+        params['fields'] = fields
+    if limit is not None:
+        params['limit'] = limit
+    if offset is not None:
+        params['offset'] = offset
     async with session.get(url, params=params) as response:
         return response.status, await response.json()
 
 
 async def publish_item(session, path: str):
     params = {'path': path}
-    url = 'https://cloud-api.yandex.net/v1/disk/resources/publish'
+    url = f'{settings.YADISK_API_URL}/v1/disk/resources/publish'
     async with session.put(url, params=params) as response:
         return response.status, await response.json()
 
 
-async def publish_items(session, path: str):
-    status, response = await get_item_info(session=session, path=path)
-    if status == 200:
-        for image in response['_embedded']['items']:
-            status, response = await publish_item(session=session, path=f'{path}/{image["name"]}')
+async def list_folder_items(session, path: str) -> list[dict] | None:
+    """
+    Возвращает все элементы папки, проходя по страницам `_embedded` (limit/offset).
+    Запрашиваются только нужные поля. Если папки нет или какую-то страницу не удалось
+    получить, возвращает None: неполный список нельзя публиковать вместо сохраненных ссылок.
+    """
+    fields = ','.join((
+        '_embedded.items.name',
+        '_embedded.items.path',
+        '_embedded.items.public_url',
+        '_embedded.total',
+    ))
+    items = []
+    while True:
+        status, response = await get_item_info(
+            session=session,
+            path=path,
+            fields=fields,
+            limit=settings.YADISK_LIST_LIMIT,
+            offset=len(items),
+        )
+        if status != 200:
+            if items:
+                logger.error(f"can't list {path} at offset {len(items)}: {response}")
+            return None
+        embedded = response.get('_embedded') or {}
+        page = embedded.get('items') or []
+        items += page
+        if not page or len(items) >= embedded.get('total', 0):
+            return items
+
+
+async def publish_items(session, path: str) -> tuple[list[str], bool] | None:
+    """
+    Публикует неопубликованные изображения папки и возвращает публичные ссылки
+    на изображения папки и признак того, что опубликованы все изображения.
+    Папка просматривается один раз. Если папку не удалось просмотреть, возвращает None.
+    """
+    items = await list_folder_items(session, path)
+    if items is None:
+        return None
+
+    semaphore = asyncio.Semaphore(settings.YADISK_UPLOAD_CONCURRENCY)
+
+    async def _publish(item) -> str | None:
+        item_path = f'{path}/{item["name"]}'
+        async with semaphore:
+            status, response = await publish_item(session=session, path=item_path)
+            if status != 200:
+                logger.error(f"can't publish {item_path}: {response}")
+                return None
+            status, response = await get_item_info(session=session, path=item_path, fields='public_url')
+        if status != 200 or not response.get('public_url'):
+            logger.error(f"can't get public url of {item_path}: {response}")
+            return None
+        return response['public_url']
+
+    unpublished = [item for item in items if not item.get('public_url')]
+    published_urls = await asyncio.gather(*(_publish(item) for item in unpublished))
+    for item, url in zip(unpublished, published_urls):
+        item['public_url'] = url
+
+    links = [
+        item['public_url'].replace('yadi.sk', 'disk.yandex.ru')
+        for item in items if item.get('public_url')
+    ]
+    return links, len(links) == len(items)
 
 
 async def create_folder(session, path):
-    url = 'https://cloud-api.yandex.net/v1/disk/resources'
+    url = f'{settings.YADISK_API_URL}/v1/disk/resources'
     params = {'path': path}
     async with session.put(url, params=params) as response:
         return response.status, await response.json()
 
 
 async def upload_file_from_web(session, imageurl, path):
-    url = 'https://cloud-api.yandex.net/v1/disk/resources/upload'
+    url = f'{settings.YADISK_API_URL}/v1/disk/resources/upload'
     params = {
         'url': imageurl,
         'path': path
@@ -63,110 +203,253 @@ async def get_operation_status(session, url):
 
 
 async def upload_files(session, basepath, images):
+    """
+    Параллельно (не более YADISK_UPLOAD_CONCURRENCY запросов) ставит изображения в очередь загрузки.
+    Возвращает изображения с адресом операции загрузки, изображения, которые уже есть на Диске,
+    и изображения, которые не удалось поставить в очередь.
+    """
+    semaphore = asyncio.Semaphore(settings.YADISK_UPLOAD_CONCURRENCY)
+
+    def _path(image):
+        return f"{basepath}/{image['tender_id']}/{image['file_base']['name']}"
+
+    async def _upload(image):
+        async with semaphore:
+            try:
+                return await upload_file_from_web(session, image['url'], _path(image))
+            except Exception:
+                logger.exception(f"can't upload image {image['url']}")
+                return None, None
+
+    async def _exists(image) -> bool:
+        async with semaphore:
+            try:
+                status, _ = await get_item_info(session, path=_path(image), fields='name')
+            except Exception:
+                logger.exception(f"can't get info of image {_path(image)}")
+                return False
+            return status == 200
+
+    results = await asyncio.gather(*(_upload(image) for image in images['attached_images']))
+
     status_links = []
+    conflicts = []
     upload_error = []
-    for image in images['attached_images']:
-        status, response = await upload_file_from_web(
-            session,
-            image['url'],
-            f"{basepath}/{image['tender_id']}/{image['file_base']['name']}"
-        )
+    for image, (status, response) in zip(images['attached_images'], results):
         if status == 202:
             image['status_url'] = response['href']
             status_links.append(image)
+        elif status == 409 and response.get('error') == 'DiskResourceAlreadyExistsError':
+            # файл загружен раньше, но не попал в манифест (например, прошлая синхронизация прервалась)
+            conflicts.append(image)
         else:
             upload_error.append(image)
-    return status_links, upload_error
+
+    exists = await asyncio.gather(*(_exists(image) for image in conflicts))
+    existing = [image for image, image_exists in zip(conflicts, exists) if image_exists]
+    upload_error += [image for image, image_exists in zip(conflicts, exists) if not image_exists]
+    return status_links, existing, upload_error
 
 
 async def check_images_upload_status(session, images_status_links):
-    images_w_failed_status = []
-    for images in images_status_links:
-        for image in images['attached_images']: 
-            async with session.get(image['status_url']) as response:
-                resp = await response.json()
-                if resp['status'] == 'failed':
-                    images_w_failed_status.append(image)
-                print('status:', resp['status'], image)
-    return {'attached_images': images_w_failed_status}
-
-
-async def upload_images(folder: str, tenders: list[TenderImagesInfo]):
+    """
+    Опрашивает все незавершенные операции загрузки одновременно с экспоненциально
+    растущей паузой, пока каждая не завершится успешно, с ошибкой или по таймауту.
+    Возвращает изображения, загрузка которых не удалась или не завершилась.
+    """
+    pending = list(images_status_links)
+    failed = []
+    delay = settings.YADISK_POLL_INITIAL_DELAY
+    deadline = asyncio.get_running_loop().time() + settings.YADISK_POLL_TIMEOUT
+    semaphore = asyncio.Semaphore(settings.YADISK_UPLOAD_CONCURRENCY)
+
+    async def _get_status(image):
+        async with semaphore:
+            try:
+                return await get_operation_status(session, image['status_url'])
+            except Exception:
+                logger.exception(f"can't get upload status of {image['url']}")
+                return None
+
+    while pending:
+        statuses = await asyncio.gather(*(_get_status(image) for image in pending))
+        still_pending = []
+        for image, status in zip(pending, statuses):
+            if status == 'failed':
+                failed.append(image)
+            elif status != 'success':
+                still_pending.append(image)
+        pending = still_pending
+        if not pending:
+            break
+        if asyncio.get_running_loop().time() + delay > deadline:
+            logger.error(f'{len(pending)} images upload timed out')
+            failed += pending
+            break
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, settings.YADISK_POLL_MAX_DELAY)
+    return {'attached_images': failed}
+
+
+async def delete_item(session, path: str):
+    url = f'{settings.YADISK_API_URL}/v1/disk/resources'
+    params = {'path': path, 'permanently': 'true'}
+    async with session.delete(url, params=params) as response:
+        return response.status
+
+
+async def _upload_with_retries(session, basepath: str, images: list[dict]) -> list[dict]:
+    """
+    Загружает изображения, повторяя только неудавшиеся. Возвращает успешно загруженные
+    и уже имеющиеся на Диске изображения.
+    """
+    uploaded = []
+    to_upload = {'attached_images': images}
+    for attempt in range(settings.YADISK_UPLOAD_RETRIES + 1):
+        if not to_upload['attached_images']:
+            break
+        status_links, existing, upload_error = await upload_files(session, basepath, to_upload)
+        failed_images = await check_images_upload_status(session, status_links)
+        failed_ids = {id(image) for image in failed_images['attached_images']}
+        uploaded += existing + [image for image in status_links if id(image) not in failed_ids]
+        # повторно загружаем только неудавшиеся изображения
+        to_upload = {'attached_images': failed_images['attached_images'] + upload_error}
+    if to_upload['attached_images']:
+        logger.error(f"{len(to_upload['attached_images'])} images not uploaded to {basepath}")
+    return uploaded
+
+
+async def upload_images(folder: str, tenders: list[TenderImagesInfo]) -> list[str]:
+    """
+    Синхронизирует изображения тендеров с Диском по манифесту уже загруженных файлов:
+    загружает только новые и замененные изображения и удаляет пропавшие.
+    Возвращает ID тендеров, изображения которых синхронизированы полностью.
+    """
     basepath = f'app:/{folder}'
-    DISK_AUTH_HEADERS = {'accept': 'application/json', 'Authorization': 'OAuth %s' % settings.YADISK_OAUTH_TOKEN}
-
-    images_status_links = []
-    async with aiohttp.ClientSession(headers=DISK_AUTH_HEADERS) as session:
-        status, response = await create_folder(session, basepath)
-        if status != 201 and status != 409:
-            print('Cant create folder:', response)
-            return
-        if status == 201:
-            for tender in tenders:
-                path = f'{basepath}/{tender.tender_id}'
-                status, response = await create_folder(session, path=path)
-                if status != 201:
-                    print('Cant create folder:', response)
-                    return
-                status_links, upload_error = await upload_files(session, basepath, tender.model_dump())
-                images_status_links.append({'attached_images': status_links})
-        else:
-            for tender in tenders:
-                path = f'{basepath}/{tender.tender_id}'
-                status, response = await get_item_info(session, path=path)
-                if status == 404:
-                    status, response = await create_folder(session, path=path)
-                    if status != 201:
-                        print('Cant create folder:', response)
-                        return
-                    status_links, upload_error = await upload_files(session, basepath, tender.model_dump())
-                    images_status_links.append({'attached_images': status_links})
-        
-        for _ in range(2):
-            failed_images = await check_images_upload_status(session, images_status_links)
-            if not failed_images:
-                break
-            status_links, upload_error = await upload_files(session, basepath, failed_images)
-            images_status_links = [{'attached_images': status_links}]
-
-
-async def publish_images(session: aiohttp.ClientSession, basefolder: str, tenders_ids: list[str]):
-    for tender_id in tenders_ids:
-        foldername = f'{basefolder}/{tender_id}'
-        await publish_items(session=session, path='app:/' + foldername)
-
-
-async def get_images_share_links(session: aiohttp.ClientSession, basefolder: str, tenders_ids: list[str]) -> dict[str, list[str]]:
-    images_links = {}
-    for tender_id in tenders_ids:
-        foldername = f'{basefolder}/{tender_id}'
-        status, response = await get_item_info(session=session, path='app:/' + foldername)
-        if status == 200:
-            _images = []
-            for image in response['_embedded']['items']:
-                url = image['public_url']
-                if url:
-                    _images.append(url.replace('yadi.sk', 'disk.yandex.ru'))
-            images_links[tender_id] = _images
-    return images_links
-
-
-async def process_images(basefolder: str, tender_model, tenders_images: TenderImages, tenders_ids: list[str]):
-    DISK_AUTH_HEADERS = {'accept': 'application/json', 'Authorization': 'OAuth %s' % settings.YADISK_OAUTH_TOKEN}
-    await upload_images(folder=basefolder, tenders=tenders_images.images)
-
-    async with aiohttp.ClientSession(headers=DISK_AUTH_HEADERS) as session:
-        await publish_images(session, basefolder, tenders_ids)
-        images_links = await get_images_share_links(session, basefolder, tenders_ids)
-        if images_links:
-            await db_add_images_links(tender_model, images_links)
+    session = http_clients.yadisk
+    status, response = await create_folder(session, basepath)
+    if status != 201 and status != 409:
+        logger.error(f'Cant create folder: {response}')
+        return []
+
+    tenders_ids = [str(tender.tender_id) for tender in tenders]
+    async with get_db_session() as db_session:
+        manifest = await db_get_images_manifest(db_session, folder, tenders_ids)
+
+    to_upload = []
+    to_delete = []
+    seeded = []
+    failed = set()
+    for tender in tenders:
+        tender_id = str(tender.tender_id)
+        path = f'{basepath}/{tender_id}'
+        known = manifest.get(tender_id)
+        if known is None:
+            folder_status, response = await create_folder(session, path=path)
+            if folder_status == 409:
+                # папка загружена до появления манифеста: считаем ее содержимое уже загруженным
+                items = await list_folder_items(session, path)
+                if items is None:
+                    failed.add(tender_id)
+                    continue
+                known = {item['name']: None for item in items}
+                seeded += [{'tender_id': tender_id, 'name': name, 'url': None} for name in known]
+            elif folder_status != 201:
+                logger.error(f'Cant create folder: {response}')
+                failed.add(tender_id)
+                continue
+            else:
+                known = {}
+
+        desired = {image.file_base.name: image.url for image in tender.attached_images}
+        stale = [
+            name for name, url in known.items()
+            if name not in desired or (url is not None and url != desired[name])
+        ]
+        to_delete += [(tender_id, name) for name in stale]
+        to_upload += [
+            image for image in tender.model_dump()['attached_images']
+            if image['file_base']['name'] not in known or image['file_base']['name'] in stale
+        ]
+
+    semaphore = asyncio.Semaphore(settings.YADISK_UPLOAD_CONCURRENCY)
+
+    async def _delete(tender_id, name):
+        async with semaphore:
+            return await delete_item(session, f'{basepath}/{tender_id}/{name}')
+
+    statuses = await asyncio.gather(*(_delete(tender_id, name) for tender_id, name in to_delete))
+    deleted = [item for item, status in zip(to_delete, statuses) if status in (202, 204, 404)]
+    # замененное изображение, которое не удалось удалить, не загружаем: существующий файл
+    # под тем же именем иначе был бы записан в манифест как новое изображение
+    not_deleted = set(to_delete) - set(deleted)
+    to_upload = [
+        image for image in to_upload
+        if (str(image['tender_id']), image['file_base']['name']) not in not_deleted
+    ]
+
+    uploaded = await _upload_with_retries(session, basepath, to_upload)
+    uploaded_ids = {id(image) for image in uploaded}
+    failed.update(str(image['tender_id']) for image in to_upload if id(image) not in uploaded_ids)
+    failed.update(tender_id for tender_id, name in not_deleted)
+    seeded = [image for image in seeded if (image['tender_id'], image['name']) not in set(deleted)]
+
+    async with get_db_session() as db_session:
+        await db_delete_images_manifest(db_session, folder, tenders_ids, names=deleted)
+        await db_add_images_manifest(db_session, folder, seeded + [
+            {'tender_id': str(image['tender_id']), 'name': image['file_base']['name'], 'url': image['url']}
+            for image in uploaded
+        ])
+    logger.info(f'Synced images in {basepath}: uploaded {len(uploaded)}, deleted {len(deleted)}')
+    return [tender_id for tender_id in tenders_ids if tender_id not in failed]
+
+
+async def publish_images(session: aiohttp.ClientSession, basefolder: str, tenders_ids: list[str]) -> dict[str, list[str]]:
+    """
+    Публикует изображения тендеров и возвращает ссылки на них: {tender_id: [ссылки]}.
+    Тендеры, изображения которых опубликованы не все, не возвращаются: их сохраненные
+    ссылки не заменяются неполным списком, а тендеры обрабатываются заново при следующем обходе.
+    """
+    semaphore = asyncio.Semaphore(settings.YADISK_FOLDERS_CONCURRENCY)
+
+    async def _publish(tender_id):
+        async with semaphore:
+            return await publish_items(session=session, path=f'app:/{basefolder}/{tender_id}')
+
+    published = await asyncio.gather(*(_publish(tender_id) for tender_id in tenders_ids))
+    links = {}
+    for tender_id, result in zip(tenders_ids, published):
+        if result is None:
+            continue
+        _links, complete = result
+        if not complete:
+            logger.error(f'not all images of tender {tender_id} in {basefolder} are published, keeping stored links')
+            continue
+        links[tender_id] = _links
+    return links
+
+
+async def process_images(basefolder: str, tender_model, tenders_images: TenderImages, tenders_ids: list[str]) -> list[str]:
+    """
+    Загружает и публикует изображения тендеров, записывает ссылки на них в БД.
+    Возвращает ID тендеров, изображения которых загружены и опубликованы без ошибок.
+    """
+    uploaded_ids = await upload_images(folder=basefolder, tenders=tenders_images.images)
+
+    session = http_clients.yadisk
+    images_links = await publish_images(session, basefolder, tenders_ids)
+    if images_links:
+        await images_links_accumulator.add(tender_model, images_links)
+    return [tender_id for tender_id in uploaded_ids if tender_id in images_links]
 
 
 async def del_folder(session: aiohttp.ClientSession, basefolder: str, tenders_ids: list[str]):
-    url = 'https://cloud-api.yandex.net/v1/disk/resources'
+    url = f'{settings.YADISK_API_URL}/v1/disk/resources'
     for tender_id in tenders_ids:
         foldername = f'{basefolder}/{tender_id}'
         params = {'path': foldername, 'permanently': 'true'}
         async with session.delete(url, params=params) as response:
             ...
+    async with get_db_session() as db_session:
+        await db_delete_images_manifest(db_session, basefolder, tenders_ids)
 
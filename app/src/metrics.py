@@ -0,0 +1,191 @@
+import re
+import time
+import asyncio
+import aiohttp
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+)
+
+
+HTTP_CLIENT_REQUESTS = Counter(
+    'http_client_requests_total',
+    'Запросы к внешним API',
+    ['service', 'method', 'endpoint', 'status'],
+)
+HTTP_CLIENT_DURATION = Histogram(
+    'http_client_request_duration_seconds',
+    'Длительность запросов к внешним API',
+    ['service', 'method', 'endpoint'],
+)
+
+PDF_PAGES_SCANNED = Histogram(
+    'pdf_pages_scanned',
+    'Число просмотренных страниц отчета об оценке',
+    buckets=(1, 2, 3, 5, 10, 20, 40, 80, 160),
+)
+PDF_PARSE_DURATION = Histogram(
+    'pdf_parse_duration_seconds',
+    'Длительность поиска полей в отчете об оценке',
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60),
+)
+PDF_REPORTS_WITH_HINTS = Counter(
+    'pdf_reports_with_hints_total',
+    'Отчеты об оценке, для шаблона которых были подсказки страниц',
+)
+
+REPORT_CACHE_REQUESTS = Counter(
+    'report_cache_requests_total',
+    'Обращения к кэшу разобранных отчетов об оценке',
+    ['result'],
+)
+REPORT_CACHE_EVICTED = Counter(
+    'report_cache_evicted_total',
+    'Записи кэша разобранных отчетов, удаленные по возрасту или сверх предела',
+)
+
+DB_UPSERT_ROWS = Histogram(
+    'db_upsert_batch_rows',
+    'Размер пачки тендеров, записываемой в БД',
+    ['table', 'method'],
+    buckets=(1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000),
+)
+DB_UPSERT_DURATION = Histogram(
+    'db_upsert_duration_seconds',
+    'Длительность записи пачки тендеров в БД',
+    ['table', 'method'],
+)
+
+ASYNCIO_TASKS = Gauge(
+    'asyncio_tasks',
+    'Незавершенные задачи в цикле событий',
+)
+
+BACKGROUND_TASKS_PENDING = Gauge(
+    'background_tasks_pending',
+    'Незавершенные фоновые задачи по группам',
+    ['group'],
+)
+BACKGROUND_TASKS_WAITING = Gauge(
+    'background_tasks_waiting',
+    'Задачи, ожидающие места в группе фоновых задач',
+    ['group'],
+)
+BACKGROUND_TASKS_COMPLETED = Counter(
+    'background_tasks_completed_total',
+    'Успешно завершившиеся фоновые задачи',
+    ['group'],
+)
+BACKGROUND_TASKS_FAILED = Counter(
+    'background_tasks_failed_total',
+    'Фоновые задачи, завершившиеся ошибкой',
+    ['group'],
+)
+
+SCHEDULER_JOB_DURATION = Histogram(
+    'scheduler_job_duration_seconds',
+    'Длительность задач планировщика',
+    ['job'],
+    buckets=(1, 10, 60, 300, 900, 1800, 3600, 7200, 14400, 28800),
+)
+SCHEDULER_JOB_RUNNING = Gauge(
+    'scheduler_job_running',
+    'Число выполняющихся экземпляров задачи планировщика',
+    ['job'],
+)
+SCHEDULER_JOB_OVERLAPS = Counter(
+    'scheduler_job_overlaps_total',
+    'Запуски задачи планировщика, пока предыдущий запуск еще выполняется',
+    ['job'],
+)
+
+RESPONSE_CACHE_REQUESTS = Counter(
+    'response_cache_requests_total',
+    'Обращения к кэшу ответов API по тендерам',
+    ['result'],
+)
+RESPONSE_CACHE_REMOVED = Counter(
+    'response_cache_removed_total',
+    'Записи, удаленные из кэша ответов API: сброшенные при изменении тендеров и вытесненные',
+    ['reason'],
+)
+RESPONSE_CACHE_ENTRIES = Gauge(
+    'response_cache_entries',
+    'Число записей в кэше ответов API',
+)
+
+API_REQUEST_DURATION = Histogram(
+    'api_request_duration_seconds',
+    'Длительность обработки запросов к API сервиса',
+    ['method', 'route', 'status'],
+)
+
+# сегменты пути с идентификаторами и именами файлов заменяются,
+# чтобы число значений метки endpoint не росло с числом тендеров
+_ID_SEGMENT = re.compile(r'^(\d+|[0-9a-f]{16,}|[0-9a-f]{8}-[0-9a-f-]{27})$', re.IGNORECASE)
+_FILE_SEGMENT = re.compile(r'\.\w{2,4}$')
+
+_running_jobs: dict[str, int] = {}
+
+
+def endpoint_label(url) -> str:
+    segments = []
+    for segment in url.path.split('/'):
+        if _ID_SEGMENT.match(segment):
+            segment = '{id}'
+        elif _FILE_SEGMENT.search(segment):
+            segment = '{file}'
+        segments.append(segment)
+    return f'{url.host}{"/".join(segments)}'
+
+
+def http_trace_config(service: str) -> aiohttp.TraceConfig:
+    """
+    Замеряет число и длительность запросов сессии aiohttp по адресу и статусу ответа.
+    """
+    async def on_request_start(session, context, params):
+        context.start = time.perf_counter()
+
+    def observe(context, params, status):
+        endpoint = endpoint_label(params.url)
+        HTTP_CLIENT_REQUESTS.labels(service, params.method, endpoint, status).inc()
+        HTTP_CLIENT_DURATION.labels(service, params.method, endpoint).observe(time.perf_counter() - context.start)
+
+    async def on_request_end(session, context, params):
+        observe(context, params, str(params.response.status))
+
+    async def on_request_exception(session, context, params):
+        observe(context, params, type(params.exception).__name__)
+
+    trace_config = aiohttp.TraceConfig()
+    trace_config.on_request_start.append(on_request_start)
+    trace_config.on_request_end.append(on_request_end)
+    trace_config.on_request_exception.append(on_request_exception)
+    return trace_config
+
+
+async def track_job(job: str, coro):
+    """
+    Выполняет корутину задачи планировщика, замеряя ее длительность
+    и число запусков, наложившихся на еще не завершенный предыдущий.
+    """
+    if _running_jobs.get(job):
+        SCHEDULER_JOB_OVERLAPS.labels(job).inc()
+    _running_jobs[job] = _running_jobs.get(job, 0) + 1
+    SCHEDULER_JOB_RUNNING.labels(job).inc()
+    start = time.perf_counter()
+    try:
+        return await coro
+    finally:
+        SCHEDULER_JOB_DURATION.labels(job).observe(time.perf_counter() - start)
+        SCHEDULER_JOB_RUNNING.labels(job).dec()
+        _running_jobs[job] -= 1
+
+
+def render_metrics() -> tuple[bytes, str]:
+    ASYNCIO_TASKS.set(len(asyncio.all_tasks()))
+    return generate_latest(), CONTENT_TYPE_LATEST
@@ -0,0 +1,124 @@
+import uuid
+
+from enum import Enum
+
+from app.config import settings
+from app.logger import logger
+from app.database.session import get_db_session
+from app.database.handlers.crawl_state import (
+    db_add_run,
+    db_finish_run,
+    db_get_unfinished_run,
+    db_get_tenders_stages,
+    db_set_run_last_page,
+    db_set_tenders_stage,
+)
+
+
+class TenderStage(str, Enum):
+    fetched = 'fetched'
+    report_parsed = 'report_parsed'
+    stored = 'stored'
+    images_uploaded = 'images_uploaded'
+
+
+class CrawlCheckpoint:
+    """
+    Сохраняемый в БД прогресс обхода: последняя полностью обработанная страница
+    и стадии обработки тендеров. Позволяет после перезапуска продолжить
+    незавершенный обход, а не начинать его с первой страницы.
+    """
+
+    # таблицы, обход которых идет в этом процессе: запуск по расписанию, пришедшийся
+    # на незавершенный обход, не должен подхватить его как прерванный
+    _active: set[str] = set()
+
+    def __init__(self, tender_model, run_id: str, start_page: int, stages: dict[str, str] | None = None):
+        self.tender_model = tender_model
+        self.run_id = run_id
+        self.start_page = start_page
+        self.stages = stages or {}
+        self._pending_pages: dict[int, int] = {}
+
+    @classmethod
+    async def resume_or_start(cls, tender_model) -> 'CrawlCheckpoint | None':
+        """
+        Продолжает прерванный обход или начинает новый.
+        Возвращает None, если обход этой таблицы уже идет в этом процессе.
+        Занятая обходом таблица освобождается в `release`.
+        """
+        table = tender_model.__tablename__
+        if table in cls._active:
+            logger.warning(f'Crawl of {table} is already running, skipping')
+            return None
+        cls._active.add(table)
+        try:
+            async with get_db_session() as session:
+                run = await db_get_unfinished_run(session, tender_model)
+                if run:
+                    stages = await db_get_tenders_stages(session, run.run_id)
+                    start_page = run.last_page + 1 if run.last_page else settings.PAGENUMBER
+                    logger.info(f'Resuming crawl {run.run_id} of {table} from page {start_page}')
+                    return cls(tender_model, run.run_id, start_page, stages)
+
+                run_id = str(uuid.uuid4())
+                await db_add_run(session, tender_model, run_id)
+        except BaseException:
+            cls._active.discard(table)
+            raise
+        logger.info(f'Started crawl {run_id} of {table}')
+        return cls(tender_model, run_id, settings.PAGENUMBER)
+
+    def release(self) -> None:
+        CrawlCheckpoint._active.discard(self.tender_model.__tablename__)
+
+    def is_completed(self, tender_id: str) -> bool:
+        """
+        Тендер полностью обработан в прерванном запуске этого обхода.
+        """
+        return self.stages.get(tender_id) == TenderStage.images_uploaded.value
+
+    def is_resumed(self, tender_id: str) -> bool:
+        return tender_id in self.stages
+
+    async def set_stage(self, tenders_ids: list[str], stage: TenderStage) -> None:
+        try:
+            async with get_db_session() as session:
+                await db_set_tenders_stage(session, self.run_id, tenders_ids, stage.value)
+        except Exception:
+            logger.exception(f"can't save {stage.value} stage of crawl {self.run_id}")
+
+    async def complete_page(self, pagenumber: int) -> None:
+        try:
+            async with get_db_session() as session:
+                await db_set_run_last_page(session, self.run_id, pagenumber)
+        except Exception:
+            logger.exception(f"can't save page {pagenumber} of crawl {self.run_id}")
+
+    async def page_started(self, pagenumber: int, tenders_count: int) -> None:
+        """
+        Регистрирует страницу, тендеры которой обрабатываются конвейером.
+        Страницы должны регистрироваться по порядку и до того, как их тендеры попадут в очередь.
+        """
+        self._pending_pages[pagenumber] = tenders_count
+        await self._advance()
+
+    async def tender_done(self, pagenumber: int, count: int = 1) -> None:
+        self._pending_pages[pagenumber] -= count
+        await self._advance()
+
+    async def _advance(self) -> None:
+        completed = None
+        while self._pending_pages:
+            pagenumber = next(iter(self._pending_pages))
+            if self._pending_pages[pagenumber] > 0:
+                break
+            del self._pending_pages[pagenumber]
+            completed = pagenumber
+        if completed is not None:
+            await self.complete_page(completed)
+
+    async def finish(self) -> None:
+        async with get_db_session() as session:
+            await db_finish_run(session, self.run_id)
+        logger.info(f'Finished crawl {self.run_id} of {self.tender_model.__tablename__}')
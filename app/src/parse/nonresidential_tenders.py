@@ -1,168 +1,299 @@
 import asyncio
-import aiohttp
+
+from functools import partial
+from dataclasses import dataclass, field
 
 from app.api import models
 
 from app.config import settings
 from app.logger import logger
 
-from app.database.handlers.tenders import db_add_tenders
+from app.database.session import get_db_session
+from app.database.handlers.tenders import (
+    db_add_tenders,
+    db_get_tenders_hashes,
+    db_save_tenders_hashes,
+)
 
-from app.src.pdf import search_fields_in_pdf
-from app.src.utils import delete_files
+from app.src.pdf import search_fields_in_pdf, evict_page_hints
+from app.src.reports import ReportHandle
+from app.src.report_cache import fetch_report_cached, save_report_fields, evict_report_cache
 from app.src.images import process_images
+from app.src.http_clients import http_clients
+from app.src.tasks import background_tasks
+from app.src.utils import json_hash
+from app.src.parse.pipeline import STOP, run_pipeline, run_stage, run_batch_stage
+from app.src.parse.checkpoints import CrawlCheckpoint, TenderStage
 from app.src.tenders import (
-    get_tender,
     get_tenders,
+    fetch_tender,
     get_evaluation_report_link,
 )
 
 from app.database import models as dbmodels
 
 
-async def find_fields(tender_ids: list[str], search_fields: list[str]):
-    result = {}
-    for tender_id in tender_ids:
-        path = f'/src/reports/{tender_id}.pdf'
-        found = await search_fields_in_pdf(path, search_fields)
-        result[tender_id] = (models.TenderDataFromFilesPayload.model_validate(found))
-    return result
+@dataclass
+class NonresidentialItem:
+    """
+    Тендер, проходящий через стадии конвейера парсинга.
+    """
+    tender_id: str
+    pagenumber: int
+    tender: models.NonresidentialDataValidate | None = None
+    images: dict = field(default_factory=dict)
+    report_link: str | None = None
+    report: ReportHandle | None = None
+    file_data: models.TenderDataFromFilesPayload | None = None
+    listing_hash: str | None = None
+    content_hash: str | None = None
+    stored_content_hash: str | None = None
 
 
-async def download_doc_by_link(url: str, path: str, session: aiohttp.ClientSession):
-    async with session.get(url) as response:
-        with open(path, 'wb') as fd:
-            async for chunk in response.content.iter_chunked(2048):
-                fd.write(chunk)
+def _make_nonresidential_db_model(
+    tender: models.NonresidentialDataValidate,
+    file_data: models.TenderDataFromFilesPayload | None,
+) -> models.NonresidentialDataDB:
+    return models.NonresidentialDataDB(
+        tender_id=str(tender.tender_id),
+        investmoscow_url=tender.investmoscow_url,
+        address=tender.header_info.address,
+        subway_stations=tender.header_info.subway[0].subwayStationName if tender.header_info.subway else None,
+        object_area=tender.object_area,
+        floor=tender.floor,
+        applications_enddate=tender.applications_enddate,
+        deposit=tender.deposit,
+        start_price=tender.start_price,
+        m1_start_price=tender.m1_start_price,
+        min_price=tender.min_price,
+        m1_min_price=tender.m1_min_price,
+        procedure_form=tender.form,
+        auction_step=tender.auction_step,
+        price_decrease_step=tender.price_decrease_step,
+        tendering=tender.tendering,
+        lat=tender.map_info.coords.lat,
+        lon=tender.map_info.coords.lon,
+        entrance_type=file_data.entrance_type if file_data else None,
+        windows=file_data.windows if file_data else None,
+        ceilings=file_data.ceilings if file_data else None,
+        region_name=file_data.region_name if file_data else None,
+        district_name=file_data.district_name if file_data else None,
+    )
 
 
-async def download_reports(tender_links: dict[str, str], session: aiohttp.ClientSession):
-    for tender_id, link in tender_links.items():
-        path = f'/src/reports/{tender_id}.pdf'
-        await download_doc_by_link(
-            link, 
-            path,
-            session
-        )
+async def _produce_pages(outbox: asyncio.Queue, checkpoint: CrawlCheckpoint) -> None:
+    """
+    Стадия получения списка тендеров: постранично обходит выдачу, начиная со страницы,
+    сохраненной в контрольной точке, и кладет ID тендеров в очередь.
+    Ожидание на заполненной очереди заменяет паузу между страницами.
+    """
+    pagenumber = checkpoint.start_page
+    while True:
+        try:
+            tenders = await get_tenders(
+                http_clients.investmoscow, 
+                pagenumber, 
+                settings.PAGESIZE, 
+                models.TenderTypes.nonresidential.value
+            )
+        except Exception:
+            logger.exception(f'Exception while getting nonresidential tenders on {pagenumber = }')
+            await asyncio.sleep(60)
+            continue
 
+        entities = tenders.get('entities')
+        if not entities:
+            logger.info('Ended parsing nonresidential tenders.')
+            await outbox.put(STOP)
+            return
 
-# TODO: make checker that tender exists in db
-async def _parse_nonresidential(
-    tenders_ids: list[str], 
-    search_fields: list[str]
-) -> dict:
-    file_data = {}
-    tenders = {}
-    tenders_images = []
-    async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(ssl=settings.SSL)) as session:
-        for tender_id in tenders_ids:
-            data = await get_tender(session, tender_id)
-            tender = models.NonresidentialDataValidate.model_validate(data)
-            tenders[tender_id] = tender
-
-            images = tender.image_info.model_dump()
-            images['tender_id'] = tender.tender_id
-            tenders_images.append(images)
-
-            evaluation_report_link = await get_evaluation_report_link(data)
-            if evaluation_report_link:
-                file_data[tender_id] = evaluation_report_link
-            else:
-                logger.error(f"can't get evaluation report link for tender {tender_id}")
-        await download_reports(file_data, session)
-
-    file_data = await find_fields(tender_ids=list(file_data.keys()), search_fields=search_fields)
-    for tender_id, tender in tenders.items():
-        _file_data = file_data.get(tender_id)
-        tenders[tender_id] = models.NonresidentialDataDB(
-            tender_id=str(tender.tender_id),
-            investmoscow_url=tender.investmoscow_url,
-            address=tender.header_info.address,
-            subway_stations=tender.header_info.subway[0].subwayStationName if tender.header_info.subway else None,
-            object_area=tender.object_area,
-            floor=tender.floor,
-            applications_enddate=tender.applications_enddate,
-            deposit=tender.deposit,
-            start_price=tender.start_price,
-            m1_start_price=tender.m1_start_price,
-            min_price=tender.min_price,
-            m1_min_price=tender.m1_min_price,
-            procedure_form=tender.form,
-            auction_step=tender.auction_step,
-            price_decrease_step=tender.price_decrease_step,
-            tendering=tender.tendering,
-            lat=tender.map_info.coords.lat,
-            lon=tender.map_info.coords.lon,
-            entrance_type=_file_data.entrance_type if _file_data else None,
-            windows=_file_data.windows if _file_data else None,
-            ceilings=_file_data.ceilings if _file_data else None,
-            region_name=_file_data.region_name if _file_data else None,
-            district_name=_file_data.district_name if _file_data else None,
+        logger.info(f'got nonresidential tenders on {pagenumber = } with {settings.PAGESIZE = }')
+        items = []
+        for entity in entities:
+            for tender in entity.get('tenders') or []:
+                if not (_id := tender.get('id')):
+                    logger.error(f'No id in tender {tender}')
+                elif not checkpoint.is_completed(str(_id)):
+                    items.append(NonresidentialItem(
+                        tender_id=str(_id),
+                        pagenumber=pagenumber,
+                        listing_hash=json_hash(tender),
+                    ))
+
+        items = await _filter_unchanged(items, checkpoint)
+        await checkpoint.page_started(pagenumber, len(items))
+        for item in items:
+            await outbox.put(item)
+        pagenumber += 1
+
+
+async def _filter_unchanged(items: list[NonresidentialItem], checkpoint: CrawlCheckpoint) -> list[NonresidentialItem]:
+    """
+    В инкрементальном режиме отбрасывает тендеры, данные которых в поисковой выдаче
+    не изменились с прошлого обхода. Тендеры, обработка которых была прервана
+    перезапуском, не отбрасываются.
+    """
+    if not settings.CRAWL_INCREMENTAL or not items:
+        return items
+    try:
+        async with get_db_session() as session:
+            stored = await db_get_tenders_hashes(
+                session,
+                dbmodels.NonresidentialTenders,
+                [item.tender_id for item in items],
+            )
+    except Exception:
+        logger.exception("can't get stored nonresidential tenders hashes")
+        return items
+
+    changed = []
+    for item in items:
+        if checkpoint.is_resumed(item.tender_id):
+            changed.append(item)
+            continue
+        tender_hashes = stored.get(item.tender_id)
+        if tender_hashes and tender_hashes.listing_hash == item.listing_hash:
+            continue
+        item.stored_content_hash = tender_hashes.content_hash if tender_hashes else None
+        changed.append(item)
+    logger.info(f'{len(items) - len(changed)} of {len(items)} nonresidential tenders unchanged')
+    return changed
+
+
+async def _fetch_details(item: NonresidentialItem, checkpoint: CrawlCheckpoint) -> NonresidentialItem | None:
+    data = await fetch_tender(http_clients.investmoscow, item.tender_id)
+    if data is None:
+        return None
+    item.content_hash = json_hash(data)
+    if settings.CRAWL_INCREMENTAL and item.content_hash == item.stored_content_hash:
+        # изменилась только поисковая выдача, подробные данные те же
+        await db_save_tenders_hashes(
+            dbmodels.NonresidentialTenders,
+            {item.tender_id: {'listing_hash': item.listing_hash}},
         )
-        print(tenders[tender_id])
+        return None
+    item.tender = models.NonresidentialDataValidate.model_validate(data)
+
+    item.images = item.tender.image_info.model_dump()
+    item.images['tender_id'] = item.tender.tender_id
+
+    item.report_link = await get_evaluation_report_link(data)
+    if not item.report_link:
+        logger.error(f"can't get evaluation report link for tender {item.tender_id}")
+    await checkpoint.set_stage([item.tender_id], TenderStage.fetched)
+    return item
+
+
+def _make_download_report(search_fields: list[str]):
+    async def _download_report(item: NonresidentialItem) -> NonresidentialItem:
+        if item.report_link:
+            try:
+                item.report, item.file_data = await fetch_report_cached(
+                    item.report_link, http_clients.investmoscow, search_fields
+                )
+            except Exception:
+                logger.exception(f"can't download evaluation report for tender {item.tender_id}")
+        return item
+    return _download_report
+
+
+def _make_extract_fields(search_fields: list[str], checkpoint: CrawlCheckpoint):
+    async def _extract_fields(item: NonresidentialItem) -> NonresidentialItem:
+        if item.report:
+            try:
+                found = await search_fields_in_pdf(item.report.source, search_fields)
+                item.file_data = models.TenderDataFromFilesPayload.model_validate(found)
+                await save_report_fields(item.report_link, item.report, search_fields, item.file_data)
+                await checkpoint.set_stage([item.tender_id], TenderStage.report_parsed)
+            except Exception:
+                logger.exception(f"can't parse evaluation report for tender {item.tender_id}")
+            finally:
+                item.report.close()
+                item.report = None
+        return item
+    return _extract_fields
+
+
+async def _tenders_done(items: list[NonresidentialItem], checkpoint: CrawlCheckpoint) -> None:
+    for item in items:
+        await checkpoint.tender_done(item.pagenumber)
+
+
+async def _process_images(items: list[NonresidentialItem], checkpoint: CrawlCheckpoint) -> None:
+    try:
+        uploaded_ids = set(await process_images(
+            basefolder=settings.NONRESIDENTIAL_FOLDERNAME,
+            tender_model=dbmodels.NonresidentialTenders,
+            tenders_images=models.TenderImages(images=[item.images for item in items]),
+            tenders_ids=[item.tender_id for item in items],
+        ))
+        # хэши сохраняются только для полностью обработанных тендеров, остальные
+        # будут обработаны заново при следующем обходе
+        processed = [item for item in items if item.tender_id in uploaded_ids and item.file_data is not None]
+        if processed:
+            await db_save_tenders_hashes(
+                dbmodels.NonresidentialTenders,
+                {
+                    item.tender_id: {'listing_hash': item.listing_hash, 'content_hash': item.content_hash}
+                    for item in processed
+                },
+            )
+        await checkpoint.set_stage(list(uploaded_ids), TenderStage.images_uploaded)
+    finally:
+        await _tenders_done(items, checkpoint)
 
-    asyncio.create_task(db_add_tenders(dbmodels.NonresidentialTenders, tenders))
 
-    return {'images': tenders_images}
+async def _store_tenders(items: list[NonresidentialItem], checkpoint: CrawlCheckpoint) -> None:
+    """
+    Записывает пачку тендеров в БД и ставит загрузку их фото.
+    Тендеры считаются обработанными на странице после загрузки фото.
+    """
+    try:
+        tenders = {
+            item.tender_id: _make_nonresidential_db_model(item.tender, item.file_data)
+            for item in items
+        }
+        await db_add_tenders(dbmodels.NonresidentialTenders, tenders)
+        await checkpoint.set_stage(list(tenders.keys()), TenderStage.stored)
+        logger.info(f'Stored {len(tenders)} nonresidential tenders')
+
+        await background_tasks.spawn('images', _process_images(items, checkpoint))
+    except Exception:
+        await _tenders_done(items, checkpoint)
+        raise
 
 
 async def parse_nonresidential(
     search_fields: list[str]
 ):
-    # TODO: save parsing progress on shutdown to avoid reparse on restart
+    """
+    Конвейер парсинга нежилых помещений:
+    список страниц -> детали тендеров -> загрузка отчетов -> поиск полей в PDF -> запись в БД.
+    Стадии работают одновременно и связаны ограниченными очередями.
+    """
     # TODO: implement autoremove tenders from db that term expired
-    pagenumber = settings.PAGENUMBER
-    while True:
-        try:
-            async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(ssl=settings.SSL)) as session:
-                tenders = await get_tenders(
-                    session, 
-                    pagenumber, 
-                    settings.PAGESIZE, 
-                    models.TenderTypes.nonresidential.value
-                )
-            entities = tenders.get('entities')
-            if not entities:
-                logger.info('Ended parsing nonresidential tenders.')
-                return
-            else:
-                logger.info(f'got nonresidential tenders on {pagenumber = } with {settings.PAGESIZE = }')
-                tender = None
-
-                for entity in entities:
-                    try:
-                        tenders = entity.get('tenders')
-                        tenders_ids = []
-                        for tender in tenders:
-                            if _id := tender.get('id'):
-                                tenders_ids.append(str(_id))
-                            else:
-                                logger.error('No id in tender', tender)
-                        tenders_images = await _parse_nonresidential(tenders_ids, search_fields)
-                        tenders_images = models.TenderImages(**tenders_images)
-                        asyncio.create_task(
-                            process_images(
-                                basefolder=settings.NONRESIDENTIAL_FOLDERNAME,
-                                tender_model=dbmodels.NonresidentialTenders,
-                                tenders_images=tenders_images, 
-                                tenders_ids=tenders_ids.copy()
-                            )
-                        )
-                        delete_files(
-                            folder='/src/reports',
-                            filesnames=tenders_ids,
-                            extension='.pdf'
-                        )
-                        delete_files(
-                            folder='/src/jsons',
-                            filesnames=tenders_ids,
-                            extension='.json'
-                        )
-                    except Exception as e:
-                        logger.exception(f'Exception while parsing {tender}')
-                pagenumber += 1
-                await asyncio.sleep(60 * 5)
-        except Exception as e:
-            logger.exception(f'Exception while parsing')
-            await asyncio.sleep(60)
+    checkpoint = await CrawlCheckpoint.resume_or_start(dbmodels.NonresidentialTenders)
+    if checkpoint is None:
+        return
+
+    async def on_drop(item: NonresidentialItem):
+        await checkpoint.tender_done(item.pagenumber)
 
+    ids_queue = asyncio.Queue(maxsize=settings.PIPELINE_QUEUE_SIZE)
+    details_queue = asyncio.Queue(maxsize=settings.PIPELINE_QUEUE_SIZE)
+    reports_queue = asyncio.Queue(maxsize=settings.REPORTS_QUEUE_SIZE)
+    store_queue = asyncio.Queue(maxsize=settings.PIPELINE_QUEUE_SIZE)
+
+    try:
+        await run_pipeline(
+            _produce_pages(ids_queue, checkpoint),
+            run_stage('fetch details', partial(_fetch_details, checkpoint=checkpoint), ids_queue, details_queue, settings.TENDER_FETCH_CONCURRENCY, on_drop),
+            run_stage('download reports', _make_download_report(search_fields), details_queue, reports_queue, settings.REPORT_DOWNLOAD_CONCURRENCY, on_drop),
+            run_stage('extract fields', _make_extract_fields(search_fields, checkpoint), reports_queue, store_queue, settings.PDF_PARSE_CONCURRENCY, on_drop),
+            run_batch_stage('store tenders', partial(_store_tenders, checkpoint=checkpoint), store_queue, settings.DB_WRITE_BATCH_SIZE, settings.DB_WRITE_FLUSH_INTERVAL),
+        )
+        await checkpoint.finish()
+        await evict_report_cache()
+        await evict_page_hints()
+    finally:
+        checkpoint.release()
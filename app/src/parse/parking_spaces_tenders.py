@@ -1,85 +1,198 @@
 import asyncio
-import aiohttp
 
 from app.api import models
 
 from app.config import settings
 from app.logger import logger
 
-from app.database.handlers.tenders import db_add_tenders
+from app.database.session import get_db_session
+from app.database.handlers.tenders import (
+    db_add_tenders,
+    db_get_tenders_hashes,
+    db_save_tenders_hashes,
+)
 
-from app.src.utils import delete_files
+from app.src.utils import delete_files, json_hash
 from app.src.images import process_images
+from app.src.http_clients import http_clients
+from app.src.tasks import background_tasks
+from app.src.parse.checkpoints import CrawlCheckpoint, TenderStage
 from app.src.tenders import (
-    get_tender,
     get_tenders,
+    get_tenders_by_ids,
     find_smallest_area_tender
 )
 
 from app.database import models as dbmodels
 
+
+async def _get_stored_hashes(tenders_ids: list[str]) -> dict[str, dbmodels.TenderHashes]:
+    if not settings.CRAWL_INCREMENTAL:
+        return {}
+    try:
+        async with get_db_session() as session:
+            return await db_get_tenders_hashes(session, dbmodels.ParkingSpacesTenders, tenders_ids)
+    except Exception:
+        logger.exception("can't get stored parking spaces tenders hashes")
+        return {}
+
+
+async def _store_parking_spaces(
+    tenders: dict,
+    hashes: dict[str, dict[str, str]],
+    tenders_images: models.TenderImages,
+    pagenumber: int,
+    checkpoint: CrawlCheckpoint,
+) -> None:
+    """
+    Записывает тендеры в БД и ставит загрузку фото тендеров из `tenders_images`.
+    Тендеры считаются обработанными на странице после загрузки фото. Тендеры, подробные
+    данные которых не изменились, обработаны сразу после записи: их фото те же.
+    """
+    pending = len(tenders)
+    try:
+        await db_add_tenders(dbmodels.ParkingSpacesTenders, tenders)
+        await checkpoint.set_stage(list(tenders.keys()), TenderStage.stored)
+
+        images_ids = {str(images.tender_id) for images in tenders_images.images}
+        unchanged = {tender_id: hashes[tender_id] for tender_id in tenders if tender_id not in images_ids}
+        if unchanged:
+            await db_save_tenders_hashes(dbmodels.ParkingSpacesTenders, unchanged)
+            await checkpoint.set_stage(list(unchanged), TenderStage.images_uploaded)
+            pending -= len(unchanged)
+            await checkpoint.tender_done(pagenumber, len(unchanged))
+        if tenders_images.images:
+            images_hashes = {tender_id: hashes[tender_id] for tender_id in tenders if tender_id in images_ids}
+            await background_tasks.spawn('images', _process_images(tenders_images, images_hashes, pagenumber, checkpoint))
+    except Exception:
+        await checkpoint.tender_done(pagenumber, pending)
+        raise
+
+
+async def _process_images(
+    tenders_images: models.TenderImages,
+    hashes: dict[str, dict[str, str]],
+    pagenumber: int,
+    checkpoint: CrawlCheckpoint,
+) -> None:
+    try:
+        uploaded_ids = await process_images(
+            basefolder=settings.PARKING_SPACES_FOLDERNAME,
+            tender_model=dbmodels.ParkingSpacesTenders,
+            tenders_images=tenders_images, 
+            tenders_ids=list(hashes.keys()), 
+        )
+        # хэши тендеров, фото которых не загрузились, не сохраняются: они будут обработаны заново
+        if uploaded_ids:
+            await db_save_tenders_hashes(
+                dbmodels.ParkingSpacesTenders,
+                {tender_id: hashes[tender_id] for tender_id in uploaded_ids},
+            )
+        await checkpoint.set_stage(uploaded_ids, TenderStage.images_uploaded)
+    finally:
+        await checkpoint.tender_done(pagenumber, len(hashes))
+
+
 async def _parse_parking_spaces(
-    tenders_ids: list[str],
-    object_address: str, 
-    region_name: str,
-    district_name : str,
-    count: int,
-) -> dict:
+    listings: dict[str, dict],
+    pagenumber: int,
+    checkpoint: CrawlCheckpoint,
+    stored_hashes: dict[str, dbmodels.TenderHashes] | None = None,
+) -> None:
+    """
+    Получает подробные данные тендеров страницы одним вызовом `get_tenders_by_ids`
+    и ставит запись измененных в БД одной пачкой.
+    Тендеры, которые не нужно записывать, сразу отмечаются обработанными на странице.
+
+    `listings` - данные тендеров из поисковой выдачи: {tender_id: {'object_address': ...,
+    'region_name': ..., 'district_name': ..., 'count': ..., 'listing_hash': ...}}.
+    """
     tenders = {}
     tenders_images = []
-    async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(ssl=settings.SSL)) as session:
-        for tender_id in tenders_ids:
-            data = await get_tender(session, tender_id)
+    hashes = {}
+    stored_hashes = stored_hashes or {}
+    session = http_clients.investmoscow
+    tenders_ids = list(listings)
+    tenders_data = await get_tenders_by_ids(session, tenders_ids)
+    for tender_id, data in zip(tenders_ids, tenders_data):
+        if data is None:
+            continue
+        listing = listings[tender_id]
+        content_hash = json_hash(data)
+        stored = stored_hashes.get(tender_id)
+        # адрес, округ, район и число мест берутся из поисковой выдачи, поэтому тендер
+        # записывается, даже если подробные данные не изменились; фото тогда не обрабатываются
+        content_changed = not (settings.CRAWL_INCREMENTAL and stored and stored.content_hash == content_hash)
+        try:
             tender = models.ParkingSpacesDataValidate.model_validate(data)
-            tenders[tender_id] = tender
 
             images = tender.image_info.model_dump()
             images['tender_id'] = tender.tender_id
-            tenders_images.append(images)
 
             tenders[tender_id] = models.ParkingSpacesDataOut(
                 tender_id=str(tender.tender_id),
                 investmoscow_url=tender.investmoscow_url,
-                address=object_address,
+                address=listing['object_address'],
                 object_area=tender.object_area,
                 floor=tender.floor,
                 applications_enddate=tender.applications_enddate,
                 deposit=tender.deposit,
                 start_price=tender.start_price,
-                region_name=region_name,
-                district_name=district_name,
+                region_name=listing['region_name'],
+                district_name=listing['district_name'],
                 procedure_form=tender.form,
                 parking_type=tender.parking_type,
                 parking_place=tender.parking_place,
                 subway_stations=tender.header_info.subway[0].subwayStationName if tender.header_info.subway else None,
-                count=count,
+                count=listing['count'],
             )
+        except Exception:
+            logger.exception(f'Exception while parsing parking spaces tender {tender_id}')
+            continue
+        if content_changed:
+            tenders_images.append(images)
+        hashes[tender_id] = {'listing_hash': listing['listing_hash'], 'content_hash': content_hash}
 
-    asyncio.create_task(db_add_tenders(dbmodels.ParkingSpacesTenders, tenders))
-    return {'images': tenders_images}
+    if tenders:
+        await background_tasks.spawn(
+            'store',
+            _store_parking_spaces(tenders, hashes, models.TenderImages(images=tenders_images), pagenumber, checkpoint),
+        )
+    await checkpoint.tender_done(pagenumber, len(tenders_ids) - len(tenders))
 
 
 async def parse_parking_spaces():
-    pagenumber = settings.PAGENUMBER
+    checkpoint = await CrawlCheckpoint.resume_or_start(dbmodels.ParkingSpacesTenders)
+    if checkpoint is None:
+        return
+    try:
+        await _crawl_parking_spaces(checkpoint)
+    finally:
+        checkpoint.release()
+
+
+async def _crawl_parking_spaces(checkpoint: CrawlCheckpoint):
+    pagenumber = checkpoint.start_page
     tenders_ids = []
     while True:
         try:
-            async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(ssl=settings.SSL)) as session:
-                tenders = await get_tenders(
-                    session, 
-                    pagenumber, 
-                    settings.PAGESIZE, 
-                    models.TenderTypes.parking_space.value
-                )
+            tenders = await get_tenders(
+                http_clients.investmoscow, 
+                pagenumber, 
+                settings.PAGESIZE, 
+                models.TenderTypes.parking_space.value
+            )
             entities = tenders.get('entities')
             if not entities:
                 logger.info('Ended parsing parking spaces tenders.')
+                await checkpoint.finish()
                 return
             else:
                 logger.info(f'got parking spaces tenders on {pagenumber = } with {settings.PAGESIZE = }')
-                tender = None
+                page_tenders = {}
                 for entity in entities:
                     object_address = entity['objectAddress']
+                    tender = None
                     try:
                         tenders = entity.get('tenders')
                         if tenders:
@@ -94,26 +207,37 @@ async def parse_parking_spaces():
                             district_name = tender['districtName']
                             _id = str(tender.get('id'))
                             tenders_ids.append(_id)
-                            tenders_images = await _parse_parking_spaces(
-                                [_id],
-                                object_address, 
-                                region_name,
-                                district_name,
-                                count,
-                            )
-                            tenders_images = models.TenderImages(**tenders_images)
-                            asyncio.create_task(
-                                process_images(
-                                    basefolder=settings.PARKING_SPACES_FOLDERNAME,
-                                    tender_model=dbmodels.ParkingSpacesTenders,
-                                    tenders_images=tenders_images, 
-                                    tenders_ids=[_id], 
-                                )
-                            )
-                            # clean_folder('/src/reports')
-                            # clean_folder('/src/jsons')
+                            if checkpoint.is_completed(_id):
+                                continue
+
+                            page_tenders[_id] = {
+                                'object_address': object_address,
+                                'region_name': region_name,
+                                'district_name': district_name,
+                                'count': count,
+                                'listing_hash': json_hash({'tender': tender, 'count': count, 'address': object_address}),
+                            }
                     except Exception as e:
                         logger.exception(f'Exception while parsing {tender}')
+
+                # хэши всех тендеров страницы читаются одним запросом
+                stored_hashes = await _get_stored_hashes(list(page_tenders))
+                page_tenders = {
+                    _id: listing
+                    for _id, listing in page_tenders.items()
+                    if checkpoint.is_resumed(_id)
+                    or _id not in stored_hashes
+                    or stored_hashes[_id].listing_hash != listing['listing_hash']
+                }
+
+                # страница сохраняется в контрольной точке, когда все ее тендеры записаны и их фото загружены
+                await checkpoint.page_started(pagenumber, len(page_tenders))
+                if page_tenders:
+                    try:
+                        await _parse_parking_spaces(page_tenders, pagenumber, checkpoint, stored_hashes)
+                    except Exception:
+                        logger.exception(f'Exception while parsing parking spaces tenders on {pagenumber = }')
+                        await checkpoint.tender_done(pagenumber, len(page_tenders))
                 pagenumber += 1
                 delete_files(
                     folder='/src/reports',
@@ -125,7 +249,7 @@ async def parse_parking_spaces():
                     filesnames=tenders_ids,
                     extension='.json'
                 )
-                await asyncio.sleep(60 * 5)
+                await asyncio.sleep(settings.PARKING_SPACES_PAGE_DELAY)
         except Exception as e:
             logger.exception(f'Exception while parsing')
             await asyncio.sleep(60)
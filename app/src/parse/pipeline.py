@@ -0,0 +1,105 @@
+import asyncio
+
+from typing import Any, Awaitable, Callable, Coroutine
+
+from app.logger import logger
+
+
+# маркер завершения потока элементов в очереди
+STOP = object()
+
+
+async def run_pipeline(*stages: Coroutine) -> None:
+    """
+    Запускает стадии конвейера (или воркеры одной стадии) отдельными задачами и ждет их завершения.
+    Если одна из стадий упала или ожидание отменено, остальные стадии отменяются:
+    иначе они бесконечно ждали бы элементов из очередей, которые больше никто не заполняет.
+    """
+    tasks = [asyncio.create_task(stage) for stage in stages]
+    try:
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+        for task in done:
+            # пробрасывает исключение упавшей стадии
+            task.result()
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def run_stage(
+    name: str,
+    handler: Callable[[Any], Awaitable[Any]],
+    inbox: asyncio.Queue,
+    outbox: asyncio.Queue | None,
+    concurrency: int,
+    on_drop: Callable[[Any], Awaitable[None]] | None = None,
+) -> None:
+    """
+    Стадия конвейера: `concurrency` воркеров забирают элементы из `inbox`,
+    обрабатывают их `handler` и кладут результат в `outbox`.
+    Если `handler` вернул None или упал с исключением, элемент отбрасывается
+    и передается в `on_drop`.
+    Ограниченный размер очередей обеспечивает обратное давление на предыдущие стадии.
+    """
+    async def worker():
+        while True:
+            item = await inbox.get()
+            if item is STOP:
+                # возвращаем маркер, чтобы остановились и соседние воркеры
+                await inbox.put(STOP)
+                return
+            try:
+                result = await handler(item)
+            except Exception:
+                logger.exception(f'Exception in pipeline stage "{name}"')
+                result = None
+            if result is None:
+                if on_drop is not None:
+                    await on_drop(item)
+                continue
+            if outbox is not None:
+                await outbox.put(result)
+
+    await run_pipeline(*(worker() for _ in range(max(concurrency, 1))))
+    if outbox is not None:
+        await outbox.put(STOP)
+    logger.info(f'Pipeline stage "{name}" finished')
+
+
+async def run_batch_stage(
+    name: str,
+    handler: Callable[[list], Awaitable[None]],
+    inbox: asyncio.Queue,
+    batch_size: int,
+    flush_interval: float,
+) -> None:
+    """
+    Завершающая стадия конвейера: копит элементы и передает их в `handler` пачками
+    по `batch_size` или раз в `flush_interval` секунд, если пачка не набралась.
+    """
+    batch = []
+
+    async def flush():
+        nonlocal batch
+        if not batch:
+            return
+        _batch, batch = batch, []
+        try:
+            await handler(_batch)
+        except Exception:
+            logger.exception(f'Exception in pipeline stage "{name}"')
+
+    while True:
+        try:
+            item = await asyncio.wait_for(inbox.get(), timeout=flush_interval)
+        except asyncio.TimeoutError:
+            await flush()
+            continue
+        if item is STOP:
+            await flush()
+            logger.info(f'Pipeline stage "{name}" finished')
+            return
+        batch.append(item)
+        if len(batch) >= batch_size:
+            await flush()
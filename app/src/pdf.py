@@ -1,7 +1,67 @@
+import io
+import time
+import asyncio
+import hashlib
+import multiprocessing
 import pdfplumber
 
+from datetime import timedelta
+from itertools import chain
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pdfminer.pdfpage import PDFPage
+from pdfminer.pdfparser import PDFParser
+from pdfminer.pdfdocument import PDFDocument
+from pdfminer.pdftypes import resolve1
+from pdfminer.psparser import PSLiteral
+from pdfminer.utils import decode_text
 
-async def search_fields_in_table(rows, search_fields):
+from app.config import settings
+from app.logger import logger
+from app.src.metrics import PDF_PAGES_SCANNED, PDF_PARSE_DURATION, PDF_REPORTS_WITH_HINTS
+from app.database.session import get_db_session
+from app.database.handlers.pdf_hints import db_get_page_hints, db_add_page_hints, db_evict_page_hints
+
+
+_executor: ProcessPoolExecutor | None = None
+
+# чаще всего таблица с искомыми полями находится на этих страницах
+HOT_PAGES_START = 12
+HOT_PAGES_END = 20
+# заголовок раздела отчета, в котором находится таблица с искомыми полями
+OBJECT_DESCRIPTION_TITLE = 'Точное описание объекта оценки'
+# содержание ищем только на первых страницах отчета
+TOC_PAGES = 6
+
+def _warm_up() -> None:
+    ...
+
+
+async def start_pdf_executor() -> None:
+    """
+    Запускает пул процессов для разбора PDF и заранее поднимает все воркеры,
+    чтобы первый отчет не ждал старта процесса.
+    """
+    global _executor
+    if _executor is not None:
+        return
+    _executor = ProcessPoolExecutor(
+        max_workers=settings.PDF_WORKERS,
+        mp_context=multiprocessing.get_context('spawn'),
+    )
+    await asyncio.gather(*(
+        asyncio.wrap_future(_executor.submit(_warm_up)) for _ in range(settings.PDF_WORKERS)
+    ))
+
+
+def shutdown_pdf_executor() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def search_fields_in_table(rows, search_fields):
     fields = {}
     search_fields = search_fields.copy()
     for row in reversed(rows):
@@ -13,10 +73,10 @@ async def search_fields_in_table(rows, search_fields):
     return fields, search_fields
 
 
-async def _search_fields_on_page(page, search_fields):
+def _search_fields_on_page(page, search_fields):
     tables = page.extract_tables()
     for table in tables:
-        found_fields, not_found_fields = await search_fields_in_table(table, search_fields)
+        found_fields, not_found_fields = search_fields_in_table(table, search_fields)
         if found_fields:
             return found_fields, not_found_fields
     return None, search_fields
@@ -26,36 +86,274 @@ async def search_fields_on_page(page, search_fields):
     ...
 
 
-async def search_fields_in_pdf(pdf_path, search_fields):
-    # TODO: найти как из содержания документа переходить сразу по ссылке в заголовке:
-    # Точное описание объекта оценки с приведением ссылок на документы, устанавливающие качественные и количественные характеристики объекта оценки
+def _normalize(text: str | None) -> str:
+    return ' '.join(text.split()).lower() if text else ''
+
+
+def _resolve_dest_page(pdf, pages_by_id: dict, dest) -> int | None:
+    """
+    Возвращает индекс страницы, на которую указывает назначение ссылки или закладки.
+    """
+    dest = resolve1(dest)
+    if isinstance(dest, dict):
+        dest = resolve1(dest.get('D'))
+    if isinstance(dest, PSLiteral):
+        dest = dest.name
+    if isinstance(dest, (str, bytes)):
+        dest = resolve1(pdf.doc.get_dest(dest))
+        if isinstance(dest, dict):
+            dest = resolve1(dest.get('D'))
+    if isinstance(dest, list) and dest:
+        return pages_by_id.get(getattr(dest[0], 'objid', None))
+    return None
+
+
+def _outline_pages(pdf, pages_by_id: dict, title: str) -> set[int]:
+    pages = set()
+    try:
+        for _, outline_title, dest, action, _ in pdf.doc.get_outlines():
+            if title not in _normalize(outline_title):
+                continue
+            page_index = _resolve_dest_page(pdf, pages_by_id, dest or action)
+            if page_index is not None:
+                pages.add(page_index)
+    except Exception:
+        # у отчета нет закладок или они повреждены
+        pass
+    return pages
+
+
+def _toc_link_pages(pdf, pages_by_id: dict, title: str) -> set[int]:
+    """
+    Находит в содержании строку с заголовком раздела и переходит по ссылке из нее.
+    """
+    pages = set()
+    for page in pdf.pages[:TOC_PAGES]:
+        try:
+            annots = page.annots
+            if not annots:
+                continue
+            matches = page.search(title, regex=False, case=False)
+            for match in matches:
+                for annot in annots:
+                    if annot['bottom'] < match['top'] or annot['top'] > match['bottom']:
+                        continue
+                    data = annot.get('data') or {}
+                    dest = data.get('Dest') or data.get('A')
+                    page_index = _resolve_dest_page(pdf, pages_by_id, dest) if dest else None
+                    if page_index is not None:
+                        pages.add(page_index)
+        except Exception:
+            continue
+    return pages
+
+
+def _has_keywords(page, search_fields) -> bool:
+    """
+    Дешевая проверка перед extract_tables: встречается ли в тексте страницы название
+    хотя бы одного искомого поля. Текст извлекается из уже разобранной страницы.
+    """
+    try:
+        text = _normalize(page.extract_text())
+    except Exception:
+        return True
+    return any(_normalize(field) in text for field in search_fields)
+
+
+def bidirectional_pages_order(pages_count: int, start: int = HOT_PAGES_START, end: int = HOT_PAGES_END) -> list[int]:
+    """
+    Порядок обхода страниц: сначала диапазон [start, end), затем поочередно
+    страницы перед диапазоном (к началу) и после него (к концу).
+    """
+    start = min(start, pages_count)
+    end = min(end, pages_count)
+    order = list(range(start, end))
+    before, after = start - 1, end
+    while before >= 0 or after < pages_count:
+        if before >= 0:
+            order.append(before)
+            before -= 1
+        if after < pages_count:
+            order.append(after)
+            after += 1
+    return order
+
+
+def locate_pages(pdf) -> list[int]:
+    """
+    Ранжирует страницы по вероятности нахождения на них таблицы с искомыми полями:
+    сначала раздел с описанием объекта, найденный по закладкам и ссылкам из содержания,
+    затем остальные страницы в порядке обхода от наиболее вероятного диапазона.
+    """
+    pages_by_id = {page.page_obj.pageid: index for index, page in enumerate(pdf.pages)}
+    title = _normalize(OBJECT_DESCRIPTION_TITLE)
+    section_pages = _outline_pages(pdf, pages_by_id, title) | _toc_link_pages(pdf, pages_by_id, title)
+
+    candidates = []
+    for section_page in sorted(section_pages):
+        # раздел может занимать несколько страниц
+        for index in range(section_page, min(section_page + 3, len(pdf.pages))):
+            if index not in candidates:
+                candidates.append(index)
+    return candidates + [index for index in bidirectional_pages_order(len(pdf.pages)) if index not in candidates]
+
+
+def _open_file(source: bytes | str):
+    return io.BytesIO(source) if isinstance(source, bytes) else open(source, 'rb')
+
+
+def _open_pdf(source: bytes | str):
+    """
+    Открывает отчет из байтов в памяти или по пути к файлу.
+    """
+    if isinstance(source, bytes):
+        source = io.BytesIO(source)
+    return pdfplumber.open(source)
+
+
+def _metadata_value(info: dict, key: str) -> str:
+    value = resolve1(info.get(key))
+    if isinstance(value, bytes):
+        value = decode_text(value)
+    return ' '.join(str(value).split()) if value else ''
+
+
+def _pdf_fingerprint(source: bytes | str) -> str:
+    """
+    Отпечаток шаблона отчета: программа-производитель, программа-создатель и число страниц.
+    Читаются только метаданные и дерево страниц, содержимое страниц не разбирается.
+    """
+    with _open_file(source) as file:
+        document = PDFDocument(PDFParser(file))
+        info = document.info[0] if document.info else {}
+        pages_count = sum(1 for _ in PDFPage.create_pages(document))
+    key = '|'.join((
+        _metadata_value(info, 'Producer'),
+        _metadata_value(info, 'Creator'),
+        str(pages_count),
+    ))
+    return hashlib.sha1(key.encode()).hexdigest()
+
+
+def _source_name(source: bytes | str) -> str:
+    return f'<report {len(source)} bytes>' if isinstance(source, bytes) else source
+
+
+def _search_fields_in_pdf(source: bytes | str, search_fields, hint_pages: list[int] | None = None):
+    """
+    Возвращает найденные поля, страницы, на которых они найдены, и число просмотренных страниц.
+    Сначала просматриваются страницы из подсказок для шаблона отчета в переданном порядке,
+    затем страницы в порядке `locate_pages`. Таблицы извлекаются только со страниц,
+    в тексте которых есть названия искомых полей; остальные страницы просматриваются в конце,
+    только если какие-то поля не найдены.
+    """
     found_fields = {}
+    found_pages = []
+    scanned = set()
+    deferred = []
 
-    with pdfplumber.open(pdf_path) as pdf:
-        # для ускорения начинаем поиск с этих страниц, так как чаще всего данные находятся в этом диапазоне
-        pages = pdf.pages[12:20]
+    with _open_pdf(source) as pdf:
+        hint_pages = [index for index in hint_pages or [] if index < len(pdf.pages)]
 
-        for page in pages:
-            _found_fields, not_found_fields = await _search_fields_on_page(page, search_fields)
+        def scan(index) -> bool:
+            nonlocal search_fields
+            _found_fields, not_found_fields = _search_fields_on_page(pdf.pages[index], search_fields)
             if _found_fields:
                 found_fields.update(_found_fields)
-            if not not_found_fields:
-                return found_fields
-            else:
-                search_fields = not_found_fields
-
-        # TODO: сделать поиск реверсивно от 12 стр к началу и от 20 к концу
-        for index, page in enumerate(pdf.pages):
-            if index >= 12 and index < 20:
+                found_pages.append(index)
+            search_fields = not_found_fields
+            return not search_fields
+
+        done = False
+        for index in chain(hint_pages, locate_pages(pdf)):
+            if index in scanned:
                 continue
+            scanned.add(index)
+            if not _has_keywords(pdf.pages[index], search_fields):
+                deferred.append(index)
+                continue
+            if done := scan(index):
+                break
 
-            _found_fields, not_found_fields = await _search_fields_on_page(page, search_fields)
-            if _found_fields:
-                found_fields.update(_found_fields)
-            if not not_found_fields:
-                return found_fields
-            else:
-                search_fields = not_found_fields
+        if not done:
+            for index in deferred:
+                if scan(index):
+                    break
+
+    return found_fields, found_pages, len(scanned)
+
+
+async def _run_in_pdf_executor(func, *args):
+    """
+    Выполняет функцию в пуле процессов разбора PDF. Если воркер пула упал
+    (например, его убил OOM killer), пул пересоздается и вызов повторяется один раз.
+    """
+    for attempt in range(2):
+        if _executor is None:
+            await start_pdf_executor()
+        executor = _executor
+        try:
+            return await asyncio.get_running_loop().run_in_executor(executor, func, *args)
+        except BrokenProcessPool:
+            logger.exception('PDF process pool is broken, restarting it')
+            # пул мог уже пересоздать другой вызов, упавший вместе с этим
+            if _executor is executor:
+                shutdown_pdf_executor()
+            if attempt:
+                raise
+
+
+async def _get_page_hints(source: bytes | str) -> tuple[str | None, list[int]]:
+    """
+    Возвращает отпечаток шаблона отчета и страницы из подсказок для этого шаблона.
+    """
+    try:
+        fingerprint = await asyncio.to_thread(_pdf_fingerprint, source)
+    except Exception:
+        logger.exception(f"can't get fingerprint of {_source_name(source)}")
+        return None, []
+    try:
+        async with get_db_session() as session:
+            return fingerprint, await db_get_page_hints(session, fingerprint)
+    except Exception:
+        logger.exception("can't get page hints")
+        return fingerprint, []
 
-    return found_fields
 
+async def evict_page_hints() -> None:
+    async with get_db_session() as session:
+        evicted = await db_evict_page_hints(
+            session,
+            max_age=timedelta(days=settings.PDF_PAGE_HINTS_MAX_AGE_DAYS),
+            max_fingerprints=settings.PDF_PAGE_HINTS_MAX_FINGERPRINTS,
+        )
+    logger.info(f'Evicted {evicted} page hints')
+
+
+async def search_fields_in_pdf(source: bytes | str, search_fields):
+    """
+    Ищет поля в отчете об оценке, переданном байтами или путем к файлу. Разбор PDF выполняется в пуле процессов,
+    чтобы не блокировать цикл событий. Страницы, на которых раньше находились поля
+    в отчетах того же шаблона, просматриваются первыми: в пул передаются только подсказки
+    для отпечатка шаблона этого отчета.
+    """
+    fingerprint, hint_pages = await _get_page_hints(source)
+
+    start = time.perf_counter()
+    found_fields, found_pages, pages_scanned = await _run_in_pdf_executor(
+        _search_fields_in_pdf, source, search_fields, hint_pages
+    )
+    PDF_PARSE_DURATION.observe(time.perf_counter() - start)
+    PDF_PAGES_SCANNED.observe(pages_scanned)
+
+    if fingerprint is not None and found_pages:
+        try:
+            async with get_db_session() as session:
+                await db_add_page_hints(session, fingerprint, found_pages)
+        except Exception:
+            logger.exception(f"can't save page hints for {_source_name(source)}")
+
+    if hint_pages:
+        PDF_REPORTS_WITH_HINTS.inc()
+    logger.info(f'Scanned {pages_scanned} pages of {_source_name(source)}')
+    return found_fields
@@ -0,0 +1,95 @@
+import hashlib
+import aiohttp
+
+from datetime import timedelta
+
+from app.api import models
+from app.config import settings
+from app.logger import logger
+from app.database.session import get_db_session
+from app.database.handlers.report_cache import (
+    db_get_cached_report,
+    db_touch_cached_report,
+    db_save_cached_report,
+    db_evict_report_cache,
+)
+from app.src.metrics import REPORT_CACHE_REQUESTS, REPORT_CACHE_EVICTED
+from app.src.reports import ReportHandle, fetch_report
+
+
+def _search_fields_hash(search_fields: list[str]) -> str:
+    return hashlib.sha1('|'.join(search_fields).encode()).hexdigest()
+
+
+async def fetch_report_cached(
+    url: str,
+    session: aiohttp.ClientSession,
+    search_fields: list[str],
+) -> tuple[ReportHandle | None, models.TenderDataFromFilesPayload | None]:
+    """
+    Возвращает (отчет, None), если отчет нужно разобрать, или (None, поля из кэша),
+    если отчет не изменился: сервер ответил 304 на условный запрос
+    или хэш содержимого совпал с сохраненным.
+    """
+    cached = None
+    try:
+        async with get_db_session() as db_session:
+            cached = await db_get_cached_report(db_session, url)
+    except Exception:
+        logger.exception(f"can't get cached report {url}")
+    if cached and cached.search_fields_hash != _search_fields_hash(search_fields):
+        cached = None
+
+    report = await fetch_report(
+        url,
+        session,
+        etag=cached.etag if cached else None,
+        last_modified=cached.last_modified if cached else None,
+    )
+    if cached and (report is None or report.content_hash == cached.content_hash):
+        if report is None:
+            REPORT_CACHE_REQUESTS.labels('not_modified').inc()
+        else:
+            REPORT_CACHE_REQUESTS.labels('same_content').inc()
+            report.close()
+        try:
+            async with get_db_session() as db_session:
+                await db_touch_cached_report(db_session, url)
+        except Exception:
+            logger.exception(f"can't touch cached report {url}")
+        return None, models.TenderDataFromFilesPayload.model_validate(cached.fields)
+
+    REPORT_CACHE_REQUESTS.labels('miss').inc()
+    return report, None
+
+
+async def save_report_fields(
+    url: str,
+    report: ReportHandle,
+    search_fields: list[str],
+    fields: models.TenderDataFromFilesPayload,
+) -> None:
+    try:
+        async with get_db_session() as db_session:
+            await db_save_cached_report(
+                db_session,
+                download_link=url,
+                content_hash=report.content_hash,
+                search_fields_hash=_search_fields_hash(search_fields),
+                fields=fields.model_dump(by_alias=True),
+                etag=report.etag,
+                last_modified=report.last_modified,
+            )
+    except Exception:
+        logger.exception(f"can't save cached report {url}")
+
+
+async def evict_report_cache() -> None:
+    async with get_db_session() as db_session:
+        evicted = await db_evict_report_cache(
+            db_session,
+            max_age=timedelta(days=settings.REPORT_CACHE_MAX_AGE_DAYS),
+            max_entries=settings.REPORT_CACHE_MAX_ENTRIES,
+        )
+    REPORT_CACHE_EVICTED.inc(evicted)
+    logger.info(f'Evicted {evicted} cached reports')
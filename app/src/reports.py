@@ -0,0 +1,117 @@
+import os
+import asyncio
+import hashlib
+import aiohttp
+import tempfile
+
+from app.config import settings
+
+
+class ReportHandle:
+    """
+    Загруженный отчет: небольшие отчеты хранятся в памяти, крупные - во временном файле,
+    который удаляется при закрытии.
+    """
+
+    def __init__(
+        self,
+        data: bytes | None = None,
+        path: str | None = None,
+        content_hash: str | None = None,
+        etag: str | None = None,
+        last_modified: str | None = None,
+    ):
+        self.data = data
+        self.path = path
+        self.content_hash = content_hash
+        self.etag = etag
+        self.last_modified = last_modified
+
+    @property
+    def source(self) -> bytes | str:
+        """
+        Содержимое для передачи в разбор PDF: байты отчета или путь к временному файлу.
+        """
+        return self.data if self.data is not None else self.path
+
+    @property
+    def size(self) -> int:
+        if self.data is not None:
+            return len(self.data)
+        return os.path.getsize(self.path) if self.path else 0
+
+    def close(self) -> None:
+        self.data = None
+        if self.path:
+            try:
+                os.unlink(self.path)
+            except FileNotFoundError:
+                pass
+            self.path = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _write_to_tempfile(fd: int, chunks: list[bytes]) -> None:
+    for chunk in chunks:
+        os.write(fd, chunk)
+
+
+async def fetch_report(
+    url: str,
+    session: aiohttp.ClientSession,
+    etag: str | None = None,
+    last_modified: str | None = None,
+) -> ReportHandle | None:
+    """
+    Потоково загружает отчет крупными блоками. Пока размер не превышает
+    REPORT_MEMORY_THRESHOLD, отчет копится в памяти, иначе дописывается
+    во временный файл в отдельном потоке, не блокируя цикл событий.
+    Если переданы `etag`/`last_modified`, выполняется условный запрос
+    и при ответе 304 возвращается None.
+    """
+    headers = {}
+    if etag:
+        headers['If-None-Match'] = etag
+    if last_modified:
+        headers['If-Modified-Since'] = last_modified
+
+    chunks = []
+    buffered = 0
+    content_hash = hashlib.sha256()
+    fd = path = None
+    try:
+        async with session.get(url, headers=headers) as response:
+            if response.status == 304:
+                return None
+            response.raise_for_status()
+            async for chunk in response.content.iter_chunked(settings.REPORT_CHUNK_SIZE):
+                content_hash.update(chunk)
+                chunks.append(chunk)
+                buffered += len(chunk)
+                if fd is None and buffered <= settings.REPORT_MEMORY_THRESHOLD:
+                    continue
+                if fd is None:
+                    os.makedirs(settings.REPORTS_TMP_DIR, exist_ok=True)
+                    fd, path = tempfile.mkstemp(suffix='.pdf', dir=settings.REPORTS_TMP_DIR)
+                await asyncio.to_thread(_write_to_tempfile, fd, chunks)
+                chunks = []
+            validators = {
+                'content_hash': content_hash.hexdigest(),
+                'etag': response.headers.get('ETag'),
+                'last_modified': response.headers.get('Last-Modified'),
+            }
+        if fd is None:
+            return ReportHandle(data=b''.join(chunks), **validators)
+        return ReportHandle(path=path, **validators)
+    except BaseException:
+        if path:
+            os.unlink(path)
+        raise
+    finally:
+        if fd is not None:
+            os.close(fd)
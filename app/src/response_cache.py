@@ -0,0 +1,89 @@
+import time
+import hashlib
+
+from collections import OrderedDict
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.src.metrics import RESPONSE_CACHE_ENTRIES, RESPONSE_CACHE_REMOVED, RESPONSE_CACHE_REQUESTS
+
+
+def make_etag(body: bytes) -> str:
+    return f'"{hashlib.sha1(body).hexdigest()}"'
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """
+    Слабое сравнение ETag с заголовком If-None-Match (список через запятую или *).
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    return any(tag.strip().removeprefix('W/') == etag for tag in if_none_match.split(','))
+
+
+class ResponseCache:
+    """
+    LRU-кэш сериализованных в JSON тендеров с ограничением по времени жизни,
+    ключ - (таблица, tender_id). Значение b'null' означает, что тендера нет в БД.
+
+    Записи сбрасываются функциями, изменяющими тендеры, после фиксации транзакции.
+    Чтобы ответ, прочитанный из БД до сброса, не вернул в кэш старые данные,
+    запись принимается, только если с начала чтения (`generation`) не было сбросов.
+    """
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.generation = 0
+        self._entries: OrderedDict[tuple[str, str], tuple[bytes, float]] = OrderedDict()
+
+    def get(self, table: str, tender_id: str) -> bytes | None:
+        key = (table, tender_id)
+        entry = self._entries.get(key)
+        if entry is None or entry[1] < time.monotonic():
+            if entry is not None:
+                del self._entries[key]
+                RESPONSE_CACHE_ENTRIES.set(len(self._entries))
+            RESPONSE_CACHE_REQUESTS.labels('miss').inc()
+            return None
+        self._entries.move_to_end(key)
+        RESPONSE_CACHE_REQUESTS.labels('hit').inc()
+        return entry[0]
+
+    def put(self, table: str, bodies: dict[str, bytes], generation: int) -> None:
+        if generation != self.generation or not self.max_entries:
+            return
+        expires_at = time.monotonic() + self.ttl
+        for tender_id, body in bodies.items():
+            key = (table, tender_id)
+            self._entries[key] = (body, expires_at)
+            self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            RESPONSE_CACHE_REMOVED.labels('evicted').inc()
+        RESPONSE_CACHE_ENTRIES.set(len(self._entries))
+
+    def invalidate(self, table: str, tenders_ids) -> None:
+        self.generation += 1
+        for tender_id in tenders_ids:
+            if self._entries.pop((table, tender_id), None) is not None:
+                RESPONSE_CACHE_REMOVED.labels('invalidated').inc()
+        RESPONSE_CACHE_ENTRIES.set(len(self._entries))
+
+    def invalidate_on_commit(self, session: AsyncSession, table: str, tenders_ids: list[str]) -> None:
+        """
+        Сбрасывает записи после фиксации транзакции сессии, которую коммитит вызывающий код.
+        """
+        event.listen(
+            session.sync_session,
+            'after_commit',
+            lambda _: self.invalidate(table, tenders_ids),
+            once=True,
+        )
+
+
+response_cache = ResponseCache(settings.RESPONSE_CACHE_MAX_ENTRIES, settings.RESPONSE_CACHE_TTL)
@@ -0,0 +1,112 @@
+import asyncio
+
+from app.config import settings
+from app.logger import logger
+from app.src.metrics import (
+    BACKGROUND_TASKS_COMPLETED,
+    BACKGROUND_TASKS_FAILED,
+    BACKGROUND_TASKS_PENDING,
+    BACKGROUND_TASKS_WAITING,
+)
+
+
+class TaskGroup:
+    """
+    Именованная группа фоновых задач. Хранит ссылки на незавершенные задачи,
+    считает ошибки и ограничивает число незавершенных задач: при достижении
+    предела `spawn` ждет освобождения места, притормаживая того, кто ставит задачи,
+    а `try_spawn` сразу отказывает.
+    """
+
+    def __init__(self, name: str, max_pending: int):
+        self.name = name
+        self.max_pending = max_pending
+        self.tasks: set[asyncio.Task] = set()
+        self._slots = asyncio.Semaphore(max_pending)
+
+    async def spawn(self, coro) -> asyncio.Task:
+        BACKGROUND_TASKS_WAITING.labels(self.name).inc()
+        try:
+            await self._slots.acquire()
+        except BaseException:
+            coro.close()
+            raise
+        finally:
+            BACKGROUND_TASKS_WAITING.labels(self.name).dec()
+        return self._start(coro)
+
+    async def try_spawn(self, coro) -> asyncio.Task | None:
+        """
+        Ставит задачу, только если в группе есть место, иначе закрывает корутину и возвращает None.
+        """
+        if self._slots.locked():
+            coro.close()
+            return None
+        # место есть, поэтому acquire завершается без ожидания
+        await self._slots.acquire()
+        return self._start(coro)
+
+    def _start(self, coro) -> asyncio.Task:
+        task = asyncio.create_task(coro, name=f'{self.name}:{coro.__qualname__}')
+        self.tasks.add(task)
+        BACKGROUND_TASKS_PENDING.labels(self.name).set(len(self.tasks))
+        task.add_done_callback(self._on_done)
+        return task
+
+    def _on_done(self, task: asyncio.Task) -> None:
+        self.tasks.discard(task)
+        self._slots.release()
+        BACKGROUND_TASKS_PENDING.labels(self.name).set(len(self.tasks))
+        if task.cancelled():
+            return
+        exc = task.exception()
+        if exc:
+            BACKGROUND_TASKS_FAILED.labels(self.name).inc()
+            logger.error(f'Background task {task.get_name()} failed', exc_info=exc)
+        else:
+            BACKGROUND_TASKS_COMPLETED.labels(self.name).inc()
+
+
+class TaskManager:
+    """
+    Фоновые задачи приложения, разделенные на группы с собственными ограничениями.
+    """
+
+    def __init__(self, limits: dict[str, int]):
+        self.groups = {name: TaskGroup(name, max_pending) for name, max_pending in limits.items()}
+
+    async def spawn(self, group: str, coro) -> asyncio.Task:
+        return await self.groups[group].spawn(coro)
+
+    async def try_spawn(self, group: str, coro) -> asyncio.Task | None:
+        return await self.groups[group].try_spawn(coro)
+
+    def _pending(self) -> set[asyncio.Task]:
+        return set().union(*(group.tasks for group in self.groups.values()))
+
+    async def drain(self, timeout: float) -> None:
+        """
+        Ждет завершения фоновых задач, включая поставленные во время ожидания,
+        и отменяет те, что не успели завершиться за `timeout` секунд.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while tasks := self._pending():
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            await asyncio.wait(tasks, timeout=remaining)
+
+        tasks = self._pending()
+        if tasks:
+            logger.warning(f'Cancelling {len(tasks)} background tasks on shutdown')
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+
+background_tasks = TaskManager({
+    'jobs': settings.BACKGROUND_JOBS_MAX_PENDING,
+    'store': settings.BACKGROUND_STORE_MAX_PENDING,
+    'images': settings.BACKGROUND_IMAGES_MAX_PENDING,
+})
@@ -1,6 +1,16 @@
+import asyncio
 import aiohttp
 import json
 
+from urllib.parse import urlparse
+
+from app.config import settings
+from app.logger import logger
+from app.src.utils import get_rate_limiter
+
+
+INVESTMOSCOW_HOST = urlparse(settings.INVESTMOSCOW_API_URL).netloc
+
 
 async def get_tenders(session: aiohttp.ClientSession, page_number, page_size, objtype_id):
     payload = """
@@ -34,7 +44,7 @@ async def get_tenders(session: aiohttp.ClientSession, page_number, page_size, ob
         'x-requested-with': "XMLHttpRequest"
     }
 
-    url = 'https://api.investmoscow.ru/investmoscow/tender/v2/filtered-tenders/searchTenderObjects'
+    url = f'{settings.INVESTMOSCOW_API_URL}/investmoscow/tender/v2/filtered-tenders/searchTenderObjects'
 
     async with session.post(url, headers=headers, data=payload % (page_number, page_size, objtype_id)) as response:
         data = await response.json()
@@ -61,7 +71,7 @@ async def get_tender(session: aiohttp.ClientSession, tender_id: str):
         'user-agent': "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/116.0.5845.2271 YaBrowser/23.9.0.2271 Yowser/2.5 Safari/537.36",
         'x-requested-with': "XMLHttpRequest"
     }
-    url = "https://api.investmoscow.ru/investmoscow/tender/v1/object-info/getTenderObjectInformation?tenderId=" + tender_id
+    url = f'{settings.INVESTMOSCOW_API_URL}/investmoscow/tender/v1/object-info/getTenderObjectInformation?tenderId=' + tender_id
 
     async with session.get(url, headers=headers) as response:
         data = await response.json()
@@ -72,6 +82,35 @@ async def get_tender(session: aiohttp.ClientSession, tender_id: str):
     return data
 
 
+async def fetch_tender(session: aiohttp.ClientSession, tender_id: str) -> dict | None:
+    """
+    Запрашивает детали тендера с учетом ограничения частоты запросов к хосту.
+    При ошибке загрузки возвращает None.
+    """
+    rate_limiter = get_rate_limiter(INVESTMOSCOW_HOST, settings.INVESTMOSCOW_RATE_LIMIT)
+    await rate_limiter.acquire()
+    try:
+        return await get_tender(session, tender_id)
+    except Exception:
+        logger.exception(f"can't get tender {tender_id}")
+        return None
+
+
+async def get_tenders_by_ids(session: aiohttp.ClientSession, tenders_ids: list[str]) -> list[dict | None]:
+    """
+    Параллельно запрашивает детали тендеров с ограничением числа одновременных
+    запросов и частоты запросов к хосту. Результаты возвращаются в порядке
+    `tenders_ids`, для тендеров с ошибкой загрузки - None.
+    """
+    semaphore = asyncio.Semaphore(settings.TENDER_FETCH_CONCURRENCY)
+
+    async def _get_tender(tender_id: str):
+        async with semaphore:
+            return await fetch_tender(session, tender_id)
+
+    return await asyncio.gather(*(_get_tender(tender_id) for tender_id in tenders_ids))
+
+
 async def get_tender_from_file(tender_id: int):
     with open(f'/src/jsons/{tender_id}.json', 'r', encoding='utf-8') as f:
         tender = json.load(f)
@@ -1,5 +1,9 @@
+import asyncio
+import hashlib
+import json
 import os, shutil
 
+
 def clean_folder(folder):
     for filename in os.listdir(folder):
         file_path = os.path.join(folder, filename)
@@ -19,3 +23,39 @@ def delete_files(folder: str, filesnames: list[str], extension: str | None = Non
             os.unlink(file_path)
         except Exception as e:
             print('Failed to delete %s. Reason: %s' % (file_path, e))
+
+
+class RateLimiter:
+    """
+    Равномерно распределяет запросы к хосту: не чаще `rate` запросов в секунду.
+    """
+
+    def __init__(self, rate: float):
+        self._interval = 1 / rate if rate > 0 else 0
+        self._next_slot = 0.0
+
+    async def acquire(self):
+        if not self._interval:
+            return
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        slot = max(now, self._next_slot)
+        self._next_slot = slot + self._interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+
+_rate_limiters: dict[str, RateLimiter] = {}
+
+
+def get_rate_limiter(host: str, rate: float) -> RateLimiter:
+    if host not in _rate_limiters:
+        _rate_limiters[host] = RateLimiter(rate)
+    return _rate_limiters[host]
+
+
+def json_hash(data) -> str:
+    """
+    Хэш JSON-совместимых данных, не зависящий от порядка ключей.
+    """
+    return hashlib.sha1(json.dumps(data, sort_keys=True, ensure_ascii=False, default=str).encode()).hexdigest()
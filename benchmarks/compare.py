@@ -0,0 +1,78 @@
+"""
+Сравнение двух файлов результатов бенчмарков.
+
+Запуск:
+    python -m benchmarks.compare benchmarks/results/old.json benchmarks/results/new.json --threshold 10
+
+Код возврата 1, если хотя бы одна метрика ухудшилась больше порога (в процентах).
+"""
+import sys
+import json
+import argparse
+
+
+# метрики, для которых больше - лучше; для остальных сравниваемых - меньше лучше
+HIGHER_IS_BETTER = {'tenders_per_second', 'fields_found', 'recall'}
+LOWER_IS_BETTER = {
+    'crawl_seconds', 'wall_seconds', 'mean', 'p50', 'p90', 'p99', 'max',
+    'self', 'children', 'seconds', 'pages_opened', 'extract_tables_calls',
+}
+
+
+def flatten(data: dict, prefix: str = '') -> dict[str, float]:
+    flat = {}
+    for key, value in data.items():
+        path = f'{prefix}.{key}' if prefix else str(key)
+        if isinstance(value, dict):
+            flat.update(flatten(value, path))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[path] = value
+    return flat
+
+
+def compare(old: dict, new: dict, threshold: float) -> tuple[list[tuple], list[str]]:
+    old_flat = flatten({key: old[key] for key in old if key not in ('params', 'environment', 'settings')})
+    new_flat = flatten({key: new[key] for key in new if key not in ('params', 'environment', 'settings')})
+    rows = []
+    regressions = []
+    for path in sorted(old_flat.keys() & new_flat.keys()):
+        metric = path.rsplit('.', 1)[-1]
+        if metric in HIGHER_IS_BETTER:
+            sign = 1
+        elif metric in LOWER_IS_BETTER:
+            sign = -1
+        else:
+            continue
+        before, after = old_flat[path], new_flat[path]
+        change = (after - before) / before * 100 if before else 0.0
+        rows.append((path, before, after, change))
+        if sign * change < -threshold:
+            regressions.append(path)
+    return rows, regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('old')
+    parser.add_argument('new')
+    parser.add_argument('--threshold', type=float, default=10.0, help='допустимое ухудшение, %%')
+    args = parser.parse_args()
+
+    with open(args.old, encoding='utf-8') as f:
+        old = json.load(f)
+    with open(args.new, encoding='utf-8') as f:
+        new = json.load(f)
+
+    rows, regressions = compare(old, new, args.threshold)
+    width = max((len(row[0]) for row in rows), default=10)
+    for path, before, after, change in rows:
+        mark = ' <- regression' if path in regressions else ''
+        print(f'{path:<{width}}  {before:>12.4f}  {after:>12.4f}  {change:>+8.1f}%{mark}')
+
+    if regressions:
+        print(f'{len(regressions)} metrics regressed by more than {args.threshold}%')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+"""
+Выбор базы данных для бенчмарков, которые очищают и заполняют таблицы приложения.
+"""
+import os
+import argparse
+
+from sqlalchemy.engine import make_url
+
+
+def add_database_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        '--database-url',
+        default=None,
+        help='URL отдельной базы для бенчмарка (postgresql+asyncpg://...), заменяет DB_URL',
+    )
+    parser.add_argument(
+        '--i-know-this-truncates',
+        action='store_true',
+        help='разрешить запуск на базе приложения: ее таблицы будут очищены',
+    )
+
+
+def _app_databases() -> set[str]:
+    """
+    Имена баз, с которыми работает приложение: из DB_URL и POSTGRES_DB.
+    """
+    databases = {os.environ.get('POSTGRES_DB')}
+    if os.environ.get('DB_URL'):
+        databases.add(make_url(os.environ['DB_URL']).database)
+    return databases - {None, ''}
+
+
+def configure_database(parser: argparse.ArgumentParser, args) -> None:
+    """
+    Бенчмарк очищает таблицы, поэтому запускается только на явно выбранной базе:
+    на отдельной базе из --database-url, имя которой не совпадает с базой приложения,
+    или на базе приложения с --i-know-this-truncates.
+
+    DB_URL заменяется до импорта модулей приложения: настройки читаются из окружения при импорте app.config.
+    """
+    if args.database_url is None:
+        if not args.i_know_this_truncates:
+            parser.error(
+                'бенчмарк очищает таблицы базы: укажите отдельную базу через --database-url '
+                'или подтвердите запуск на базе приложения флагом --i-know-this-truncates'
+            )
+        return
+
+    database = make_url(args.database_url).database
+    if database in _app_databases() and not args.i_know_this_truncates:
+        parser.error(
+            f'база {database!r} совпадает с базой приложения (DB_URL, POSTGRES_DB): '
+            'укажите отдельную базу или добавьте --i-know-this-truncates'
+        )
+    os.environ['DB_URL'] = args.database_url
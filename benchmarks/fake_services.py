@@ -0,0 +1,312 @@
+"""
+Локальная заглушка investmoscow и Яндекс Диска для нагрузочного тестирования парсера.
+
+Запуск:
+    python -m benchmarks.fake_services --port 8081 --pages 5 --latency 0.05 --error-rate 0.01
+
+Для работы приложения с заглушкой задайте в .env:
+    INVESTMOSCOW_API_URL=http://localhost:8081
+    YADISK_API_URL=http://localhost:8081
+"""
+import time
+import uuid
+import random
+import asyncio
+import argparse
+import hashlib
+
+from dataclasses import dataclass, field
+from functools import lru_cache
+
+from aiohttp import web
+
+from benchmarks.synthetic import (
+    make_listing_entity,
+    make_report_pdf,
+    make_tender_detail,
+    tenders_ids_for_page,
+)
+
+
+@dataclass
+class FakeConfig:
+    base_url: str = 'http://localhost:8081'
+    # число страниц выдачи для каждого типа тендеров
+    pages: int = 3
+    tenders_per_entity: int = 2
+    images_per_tender: int = 3
+    report_pages: int = 60
+    # таблица с полями размещается на случайной странице из диапазона
+    field_page_min: int = 10
+    field_page_max: int = 25
+    # задержка ответа: среднее и разброс, секунды
+    latency: float = 0.0
+    latency_jitter: float = 0.0
+    # доля ответов с ошибкой 500
+    error_rate: float = 0.0
+    # ограничение запросов в секунду на группу маршрутов (0 - без ограничения), сверх - 429
+    rate_limit: float = 0.0
+    # сколько секунд операция загрузки на Диск находится в статусе in-progress
+    upload_duration: float = 0.5
+    # доля операций загрузки, завершающихся статусом failed
+    upload_failure_rate: float = 0.0
+    seed: int = 0
+
+
+@dataclass
+class FakeState:
+    disk: dict[str, dict] = field(default_factory=dict)
+    operations: dict[str, dict] = field(default_factory=dict)
+    requests: dict[str, int] = field(default_factory=dict)
+    rate_windows: dict[str, list[float]] = field(default_factory=dict)
+
+
+def _route_group(request: web.Request) -> str:
+    path = request.path
+    if path.startswith('/v1/disk'):
+        return 'yadisk'
+    if path.startswith('/reports'):
+        return 'reports'
+    if path.startswith('/_'):
+        return 'control'
+    return 'investmoscow'
+
+
+@web.middleware
+async def faults_middleware(request: web.Request, handler):
+    config: FakeConfig = request.app['config']
+    state: FakeState = request.app['state']
+    group = _route_group(request)
+    if group == 'control':
+        return await handler(request)
+
+    resource = request.match_info.route.resource
+    name = f'{request.method} {resource.canonical if resource else request.path}'
+    state.requests[name] = state.requests.get(name, 0) + 1
+
+    if config.rate_limit:
+        now = time.monotonic()
+        window = [t for t in state.rate_windows.get(group, []) if now - t < 1]
+        if len(window) >= config.rate_limit:
+            state.rate_windows[group] = window
+            return web.json_response({'error': 'TooManyRequests'}, status=429)
+        window.append(now)
+        state.rate_windows[group] = window
+
+    if config.latency or config.latency_jitter:
+        await asyncio.sleep(max(0.0, random.gauss(config.latency, config.latency_jitter)))
+    if config.error_rate and random.random() < config.error_rate:
+        return web.json_response({'error': 'InternalServerError'}, status=500)
+    return await handler(request)
+
+
+# investmoscow
+
+async def search_tender_objects(request: web.Request):
+    config: FakeConfig = request.app['config']
+    payload = await request.json()
+    page_number = int(payload.get('pageNumber', 1))
+    page_size = int(payload.get('pageSize', 20))
+    if page_number > config.pages:
+        return web.json_response({'entities': []})
+    entities = [
+        make_listing_entity(tenders_ids, config.seed)
+        for tenders_ids in tenders_ids_for_page(page_number, page_size, config.tenders_per_entity)
+    ]
+    return web.json_response({'entities': entities})
+
+
+async def get_tender_object_information(request: web.Request):
+    config: FakeConfig = request.app['config']
+    tender_id = int(request.query['tenderId'])
+    return web.json_response(make_tender_detail(tender_id, config.base_url, config.images_per_tender, config.seed))
+
+
+@lru_cache(maxsize=256)
+def _report(tender_id: int, pages: int, field_page_min: int, field_page_max: int, seed: int) -> bytes:
+    field_page = random.Random(seed * 7919 + tender_id).randint(field_page_min, field_page_max)
+    return make_report_pdf(pages, min(field_page, pages - 1), seed=seed + tender_id)
+
+
+async def get_report(request: web.Request):
+    config: FakeConfig = request.app['config']
+    tender_id = int(request.match_info['tender_id'])
+    data = _report(tender_id, config.report_pages, config.field_page_min, config.field_page_max, config.seed)
+    etag = '"%s"' % hashlib.sha1(data).hexdigest()
+    if request.headers.get('If-None-Match') == etag:
+        return web.Response(status=304, headers={'ETag': etag})
+    return web.Response(body=data, content_type='application/pdf', headers={'ETag': etag})
+
+
+async def get_image(request: web.Request):
+    return web.Response(body=b'\xff\xd8\xff\xe0' + b'\x00' * 1024, content_type='image/jpeg')
+
+
+# Яндекс Диск
+
+def _disk_path(path: str) -> str:
+    return path.removeprefix('disk:/').removeprefix('app:/').strip('/')
+
+
+def _parent(path: str) -> str:
+    return path.rsplit('/', 1)[0]
+
+
+def _resource(path: str, item: dict) -> dict:
+    return {
+        'name': path.rsplit('/', 1)[-1],
+        'path': path,
+        'type': item['type'],
+        'public_url': item.get('public_url'),
+    }
+
+
+async def disk_info(request: web.Request):
+    return web.json_response({'total_space': 10 ** 12, 'used_space': len(request.app['state'].disk)})
+
+
+async def get_resource(request: web.Request):
+    state: FakeState = request.app['state']
+    path = _disk_path(request.query['path'])
+    item = state.disk.get(path)
+    if item is None:
+        return web.json_response({'error': 'DiskNotFoundError'}, status=404)
+    response = _resource(path, item)
+    if item['type'] == 'dir':
+        limit = int(request.query.get('limit', 20))
+        offset = int(request.query.get('offset', 0))
+        children = sorted(
+            child_path for child_path in state.disk
+            if _parent(child_path) == path
+        )
+        response['_embedded'] = {
+            'items': [_resource(child_path, state.disk[child_path]) for child_path in children[offset:offset + limit]],
+            'limit': limit,
+            'offset': offset,
+            'total': len(children),
+        }
+    return web.json_response(response)
+
+
+async def create_resource(request: web.Request):
+    state: FakeState = request.app['state']
+    path = _disk_path(request.query['path'])
+    if path in state.disk:
+        return web.json_response({'error': 'DiskPathPointsToExistentDirectoryError'}, status=409)
+    if '/' in path and _parent(path) not in state.disk:
+        return web.json_response({'error': 'DiskPathDoesntExistsError'}, status=409)
+    state.disk[path] = {'type': 'dir'}
+    return web.json_response({'href': f'{request.app["config"].base_url}/v1/disk/resources?path={path}'}, status=201)
+
+
+async def delete_resource(request: web.Request):
+    state: FakeState = request.app['state']
+    path = _disk_path(request.query['path'])
+    if path not in state.disk:
+        return web.json_response({'error': 'DiskNotFoundError'}, status=404)
+    for item_path in [p for p in state.disk if p == path or p.startswith(path + '/')]:
+        del state.disk[item_path]
+    return web.Response(status=204)
+
+
+async def publish_resource(request: web.Request):
+    state: FakeState = request.app['state']
+    path = _disk_path(request.query['path'])
+    item = state.disk.get(path)
+    if item is None:
+        return web.json_response({'error': 'DiskNotFoundError'}, status=404)
+    item.setdefault('public_url', f'https://yadi.sk/i/{uuid.uuid4().hex[:14]}')
+    return web.json_response({'href': f'{request.app["config"].base_url}/v1/disk/resources?path={path}'})
+
+
+async def upload_from_web(request: web.Request):
+    config: FakeConfig = request.app['config']
+    state: FakeState = request.app['state']
+    path = _disk_path(request.query['path'])
+    if path in state.disk:
+        return web.json_response({'error': 'DiskResourceAlreadyExistsError'}, status=409)
+    if _parent(path) not in state.disk:
+        return web.json_response({'error': 'DiskPathDoesntExistsError'}, status=409)
+    operation_id = uuid.uuid4().hex
+    state.operations[operation_id] = {
+        'path': path,
+        'ready_at': time.monotonic() + config.upload_duration,
+        'failed': random.random() < config.upload_failure_rate,
+    }
+    return web.json_response(
+        {'href': f'{config.base_url}/v1/disk/operations/{operation_id}', 'method': 'GET'},
+        status=202,
+    )
+
+
+async def get_operation(request: web.Request):
+    state: FakeState = request.app['state']
+    operation = state.operations.get(request.match_info['operation_id'])
+    if operation is None:
+        return web.json_response({'error': 'DiskNotFoundError'}, status=404)
+    if time.monotonic() < operation['ready_at']:
+        return web.json_response({'status': 'in-progress'})
+    if operation['failed']:
+        return web.json_response({'status': 'failed'})
+    state.disk.setdefault(operation['path'], {'type': 'file'})
+    return web.json_response({'status': 'success'})
+
+
+# управление заглушкой
+
+async def get_stats(request: web.Request):
+    state: FakeState = request.app['state']
+    return web.json_response({
+        'requests': state.requests,
+        'disk_items': len(state.disk),
+        'operations': len(state.operations),
+    })
+
+
+async def reset(request: web.Request):
+    request.app['state'] = FakeState()
+    return web.json_response({'reset': True})
+
+
+def make_app(config: FakeConfig | None = None) -> web.Application:
+    app = web.Application(middlewares=[faults_middleware])
+    app['config'] = config or FakeConfig()
+    app['state'] = FakeState()
+    app.add_routes([
+        web.post('/investmoscow/tender/v2/filtered-tenders/searchTenderObjects', search_tender_objects),
+        web.get('/investmoscow/tender/v1/object-info/getTenderObjectInformation', get_tender_object_information),
+        web.get('/reports/{tender_id}.pdf', get_report),
+        web.get('/images/{tender_id}/{name}', get_image),
+        web.get('/v1/disk/', disk_info),
+        web.get('/v1/disk/resources', get_resource),
+        web.put('/v1/disk/resources', create_resource),
+        web.delete('/v1/disk/resources', delete_resource),
+        web.put('/v1/disk/resources/publish', publish_resource),
+        web.post('/v1/disk/resources/upload', upload_from_web),
+        web.get('/v1/disk/operations/{operation_id}', get_operation),
+        web.get('/_stats', get_stats),
+        web.post('/_reset', reset),
+    ])
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='localhost')
+    parser.add_argument('--port', type=int, default=8081)
+    defaults = FakeConfig()
+    for name, value in vars(defaults).items():
+        if name == 'base_url':
+            continue
+        parser.add_argument(f'--{name.replace("_", "-")}', type=type(value), default=value)
+    args = parser.parse_args()
+
+    config = FakeConfig(**{
+        name: getattr(args, name) for name in vars(defaults) if name != 'base_url'
+    })
+    config.base_url = f'http://{args.host}:{args.port}'
+    web.run_app(make_app(config), host=args.host, port=args.port)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,262 @@
+"""
+Микробенчмарк поиска полей в отчетах об оценке (app/src/pdf.py).
+
+Для каждого отчета корпуса и каждой стратегии обхода страниц замеряет время,
+число открытых страниц, число вызовов extract_tables и найденные поля
+в сравнении с ожидаемыми.
+
+Корпус - папка с PDF и файлом expected.json вида {"report.pdf": {"Тип входа": "Отдельный", ...}}.
+Без --corpus используется синтетический корпус, который можно сохранить через --generate.
+
+Запуск:
+    python -m benchmarks.pdf_extraction
+    python -m benchmarks.pdf_extraction --generate benchmarks/corpus
+    python -m benchmarks.pdf_extraction --corpus benchmarks/corpus --strategies current sequential --repeat 3
+"""
+import os
+import json
+import time
+import argparse
+
+from datetime import datetime
+from collections import Counter, defaultdict
+
+import pdfplumber.page
+
+from app.config import settings
+from app.src import pdf as pdf_module
+
+from benchmarks.stats import environment, peak_rss_mb, save_results, summarize
+from benchmarks.synthetic import FIELDS_VALUES, make_report_pdf
+
+
+class PageCounters:
+    """
+    Считает вызовы методов pdfplumber, разбирающих содержимое страницы.
+    """
+    METHODS = ('extract_tables', 'extract_text', 'search')
+
+    def __init__(self):
+        self.calls = Counter()
+        self.pages = set()
+        self._originals = {}
+
+    def install(self) -> None:
+        for name in self.METHODS:
+            original = getattr(pdfplumber.page.Page, name)
+            self._originals[name] = original
+
+            def counted(page, *args, _name=name, _original=original, **kwargs):
+                self.calls[_name] += 1
+                self.pages.add(page.page_number)
+                return _original(page, *args, **kwargs)
+
+            setattr(pdfplumber.page.Page, name, counted)
+
+    def uninstall(self) -> None:
+        for name, original in self._originals.items():
+            setattr(pdfplumber.page.Page, name, original)
+        self._originals = {}
+
+    def reset(self) -> None:
+        self.calls = Counter()
+        self.pages = set()
+
+
+def synthetic_corpus(pages_count: int = 60) -> list[tuple[str, bytes, dict[str, str]]]:
+    """
+    Отчеты с таблицей на разных страницах, с закладками и без, и с неполным набором полей.
+    """
+    corpus = []
+    for field_page in (3, 9, 14, 19, 27, 40, 55):
+        for with_outline in (True, False):
+            name = f'synthetic_p{field_page}_{"outline" if with_outline else "plain"}.pdf'
+            data = make_report_pdf(pages_count, field_page, with_outline=with_outline, seed=field_page)
+            corpus.append((name, data, FIELDS_VALUES))
+    partial = dict(list(FIELDS_VALUES.items())[:3])
+    corpus.append(('synthetic_p16_partial.pdf', make_report_pdf(pages_count, 16, partial, seed=16), partial))
+    corpus.append(('synthetic_no_table.pdf', make_report_pdf(pages_count, pages_count, {}, with_outline=False), {}))
+    return corpus
+
+
+def load_corpus(folder: str) -> list[tuple[str, bytes, dict[str, str]]]:
+    expected_path = os.path.join(folder, 'expected.json')
+    expected = {}
+    if os.path.exists(expected_path):
+        with open(expected_path, encoding='utf-8') as f:
+            expected = json.load(f)
+    corpus = []
+    for name in sorted(os.listdir(folder)):
+        if not name.lower().endswith('.pdf'):
+            continue
+        with open(os.path.join(folder, name), 'rb') as f:
+            corpus.append((name, f.read(), expected.get(name, {})))
+    return corpus
+
+
+def save_corpus(corpus, folder: str) -> None:
+    os.makedirs(folder, exist_ok=True)
+    for name, data, _ in corpus:
+        with open(os.path.join(folder, name), 'wb') as f:
+            f.write(data)
+    with open(os.path.join(folder, 'expected.json'), 'w', encoding='utf-8') as f:
+        json.dump({name: expected for name, _, expected in corpus}, f, ensure_ascii=False, indent=2)
+
+
+def _scan_pages(source: bytes, search_fields: list[str], order) -> dict:
+    found_fields = {}
+    with pdf_module._open_pdf(source) as pdf:
+        for index in order(pdf):
+            _found_fields, not_found_fields = pdf_module._search_fields_on_page(pdf.pages[index], search_fields)
+            if _found_fields:
+                found_fields.update(_found_fields)
+            if not not_found_fields:
+                break
+            search_fields = not_found_fields
+    return found_fields
+
+
+def _sequential(source, search_fields, hints):
+    return _scan_pages(source, search_fields, lambda pdf: range(len(pdf.pages)))
+
+
+def _hot_range(source, search_fields, hints):
+    return _scan_pages(source, search_fields, lambda pdf: pdf_module.bidirectional_pages_order(len(pdf.pages)))
+
+
+def _full_prescan(source, search_fields, hints):
+    """
+    Прежний порядок: текст всех страниц разбирается заранее, таблицы сначала
+    извлекаются с пяти страниц, на которых встречается больше всего названий полей.
+    """
+    def order(pdf):
+        fields = [pdf_module._normalize(field) for field in search_fields]
+        scores = {}
+        for index, page in enumerate(pdf.pages):
+            text = pdf_module._normalize(page.extract_text())
+            score = sum(1 for field in fields if field in text)
+            if score:
+                scores[index] = score
+        pages_order = pdf_module.bidirectional_pages_order(len(pdf.pages))
+        position = {index: pos for pos, index in enumerate(pages_order)}
+        candidates = sorted(scores, key=lambda index: (-scores[index], position[index]))[:5]
+        return candidates + [index for index in pages_order if index not in candidates]
+
+    return _scan_pages(source, search_fields, order)
+
+
+def _current(source, search_fields, hints):
+    found_fields, _, _ = pdf_module._search_fields_in_pdf(source, search_fields)
+    return found_fields
+
+
+def _current_with_hints(source, search_fields, hints):
+    """
+    Как search_fields_in_pdf: подсказки страниц по отпечатку шаблона, накопленные
+    на предыдущих отчетах корпуса (вместо таблицы pdf_page_hints). Отчеты синтетического корпуса
+    с одинаковым числом страниц имеют один отпечаток, так что подсказки переходят между отчетами.
+    """
+    fingerprint = pdf_module._pdf_fingerprint(source)
+    hint_pages = [index for index, _ in hints[fingerprint].most_common()]
+    found_fields, found_pages, _ = pdf_module._search_fields_in_pdf(source, search_fields, hint_pages)
+    hints[fingerprint].update(set(found_pages))
+    return found_fields
+
+
+STRATEGIES = {
+    'sequential': _sequential,
+    'hot_range': _hot_range,
+    'full_prescan': _full_prescan,
+    'current': _current,
+    'current_with_hints': _current_with_hints,
+}
+
+
+def run_strategy(name: str, corpus, search_fields: list[str], counters: PageCounters, repeat: int) -> dict:
+    strategy = STRATEGIES[name]
+    reports = []
+    hints = defaultdict(Counter)
+    for report_name, data, expected in corpus:
+        durations = []
+        for _ in range(repeat):
+            # повторы начинают с тех же подсказок, что и первый проход
+            attempt_hints = defaultdict(Counter, {key: Counter(value) for key, value in hints.items()})
+            counters.reset()
+            start = time.perf_counter()
+            found = strategy(data, search_fields, attempt_hints)
+            durations.append(time.perf_counter() - start)
+        hints = attempt_hints
+        missed = sorted(field for field, value in expected.items() if found.get(field) != value)
+        reports.append({
+            'report': report_name,
+            'seconds': min(durations),
+            'pages_opened': len(counters.pages),
+            'extract_tables_calls': counters.calls['extract_tables'],
+            'extract_text_calls': counters.calls['extract_text'],
+            'fields_expected': len(expected),
+            'fields_found': len(expected) - len(missed),
+            'missed': missed,
+        })
+
+    fields_expected = sum(report['fields_expected'] for report in reports)
+    fields_found = sum(report['fields_found'] for report in reports)
+    return {
+        'seconds': summarize([report['seconds'] for report in reports]),
+        'pages_opened': sum(report['pages_opened'] for report in reports),
+        'extract_tables_calls': sum(report['extract_tables_calls'] for report in reports),
+        'fields_expected': fields_expected,
+        'fields_found': fields_found,
+        'recall': fields_found / fields_expected if fields_expected else 1.0,
+        'reports': reports,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--corpus', default=None, help='папка с отчетами и expected.json')
+    parser.add_argument('--generate', default=None, metavar='FOLDER', help='сохранить синтетический корпус и выйти')
+    parser.add_argument('--pages', type=int, default=60, help='страниц в синтетических отчетах')
+    parser.add_argument('--strategies', nargs='+', choices=list(STRATEGIES), default=list(STRATEGIES))
+    parser.add_argument('--repeat', type=int, default=1, help='повторов на отчет, берется лучшее время')
+    parser.add_argument('--output', default=None, help='файл результатов JSON')
+    args = parser.parse_args()
+
+    if args.generate:
+        save_corpus(synthetic_corpus(args.pages), args.generate)
+        print(f'synthetic corpus saved to {args.generate}')
+        return
+
+    corpus = load_corpus(args.corpus) if args.corpus else synthetic_corpus(args.pages)
+    counters = PageCounters()
+    counters.install()
+    strategies = {}
+    try:
+        for name in args.strategies:
+            strategies[name] = run_strategy(name, corpus, settings.SEARCH_FIELDS, counters, args.repeat)
+            result = strategies[name]
+            print(
+                f"{name:<20} {result['seconds']['total']:>8.2f}s  pages {result['pages_opened']:>5}  "
+                f"extract_tables {result['extract_tables_calls']:>5}  "
+                f"fields {result['fields_found']}/{result['fields_expected']}"
+            )
+    finally:
+        counters.uninstall()
+
+    results = {
+        'benchmark': 'pdf_extraction',
+        'environment': environment(),
+        'params': {
+            'corpus': args.corpus or f'synthetic, {args.pages} pages',
+            'reports': len(corpus),
+            'repeat': args.repeat,
+        },
+        'strategies': strategies,
+        'peak_rss_mb': peak_rss_mb(),
+    }
+    output = args.output or f'benchmarks/results/pdf-{datetime.now():%Y%m%d-%H%M%S}.json'
+    save_results(results, output)
+    print(f'results saved to {output}')
+
+
+if __name__ == '__main__':
+    main()
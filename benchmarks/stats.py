@@ -0,0 +1,146 @@
+"""
+Общие для бенчмарков измерения: перцентили, пиковая память, задержка цикла событий
+и сохранение результатов в JSON.
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import resource
+import platform
+import subprocess
+
+from datetime import datetime
+from collections import defaultdict
+
+
+def percentile(values: list[float], q: float) -> float | None:
+    """
+    Перцентиль по методу ближайшего ранга, q - от 0 до 100.
+    """
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, round(q / 100 * len(ordered) + 0.5) - 1))
+    return ordered[index]
+
+
+def summarize(values: list[float]) -> dict:
+    return {
+        'count': len(values),
+        'total': sum(values),
+        'mean': sum(values) / len(values) if values else None,
+        'p50': percentile(values, 50),
+        'p90': percentile(values, 90),
+        'p99': percentile(values, 99),
+        'max': max(values) if values else None,
+    }
+
+
+def peak_rss_mb() -> dict:
+    """
+    Пиковый RSS процесса и его дочерних процессов (пул разбора PDF), МБ.
+    """
+    # ru_maxrss: килобайты в Linux, байты в macOS
+    scale = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    return {
+        'self': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale,
+        'children': resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / scale,
+    }
+
+
+class StageTimings:
+    """
+    Замеряет длительность вызовов асинхронных функций, подменяя их в модулях,
+    откуда их вызывает код парсинга. `restore` возвращает исходные функции.
+    """
+
+    def __init__(self):
+        self.durations: dict[str, list[float]] = defaultdict(list)
+        self.items: dict[str, int] = defaultdict(int)
+        self._patched = []
+
+    def instrument(self, stage: str, module, name: str, count_items=None) -> None:
+        original = getattr(module, name)
+
+        async def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await original(*args, **kwargs)
+            finally:
+                self.durations[stage].append(time.perf_counter() - start)
+                if count_items:
+                    self.items[stage] += count_items(*args, **kwargs)
+
+        setattr(module, name, timed)
+        self._patched.append((module, name, original))
+
+    def restore(self) -> None:
+        for module, name, original in reversed(self._patched):
+            setattr(module, name, original)
+        self._patched = []
+
+    def reset(self) -> None:
+        self.durations.clear()
+        self.items.clear()
+
+    def summary(self) -> dict:
+        return {stage: summarize(values) for stage, values in self.durations.items()}
+
+
+class LoopLagMonitor:
+    """
+    Фоновая задача, измеряющая, насколько позже запланированного просыпается
+    цикл событий: показывает блокирующий код в корутинах.
+    """
+
+    def __init__(self, interval: float = 0.05):
+        self.interval = interval
+        self.samples: list[float] = []
+        self.task: asyncio.Task | None = None
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(0.0, loop.time() - start - self.interval))
+
+    def start(self) -> None:
+        self.samples = []
+        self.task = asyncio.create_task(self._run())
+
+    async def stop(self) -> dict:
+        self.task.cancel()
+        try:
+            await self.task
+        except asyncio.CancelledError:
+            pass
+        return summarize(self.samples)
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+def environment() -> dict:
+    return {
+        'started_at': datetime.now().isoformat(timespec='seconds'),
+        'commit': _git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+    }
+
+
+def save_results(results: dict, output: str) -> None:
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
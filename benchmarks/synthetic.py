@@ -0,0 +1,291 @@
+"""
+Синтетические данные для локальных заглушек и бенчмарков:
+выдача и карточки тендеров investmoscow и PDF отчеты об оценке.
+"""
+import random
+
+from datetime import datetime, timedelta
+
+
+OBJECT_DESCRIPTION_TITLE = 'Точное описание объекта оценки'
+
+FIELDS_VALUES = {
+    'Тип входа': 'Отдельный',
+    'Наличие окон и их размер': 'Есть, стандартные',
+    'Высота потолков, м': '3,2',
+    'Округ города Москвы': 'ЦАО',
+    'Муниципальный район': 'Тверской',
+}
+
+_CYRILLIC = 'АБВГДЕЁЖЗИЙКЛМНОПРСТУФХЦЧШЩЪЫЬЭЮЯабвгдеёжзийклмнопрстуфхцчшщъыьэюя№'
+_CODES = {char: 128 + index for index, char in enumerate(_CYRILLIC)}
+
+_PAGE_WIDTH, _PAGE_HEIGHT = 595, 842
+_FONT_SIZE = 9
+_CHAR_WIDTH = 500
+
+
+def _encode(text: str) -> str:
+    """
+    Кодирует текст в hex-строку PDF для шрифта с таблицей Differences,
+    в которой кириллица задана именами глифов uniXXXX.
+    """
+    codes = bytearray()
+    for char in text:
+        if char in _CODES:
+            codes.append(_CODES[char])
+        elif 32 <= ord(char) < 127:
+            codes.append(ord(char))
+        else:
+            codes.append(ord('?'))
+    return '<' + codes.hex() + '>'
+
+
+def _text(x: float, y: float, text: str) -> str:
+    return f'BT /F1 {_FONT_SIZE} Tf {x} {y} Td {_encode(text)} Tj ET\n'
+
+
+def _table(x: float, y: float, widths: list[float], rows: list[list[str]], row_height: float = 18) -> str:
+    stream = '0.5 w\n'
+    for row_index, row in enumerate(rows):
+        top = y - row_index * row_height
+        left = x
+        for width, cell in zip(widths, row):
+            stream += f'{left} {top - row_height} {width} {row_height} re S\n'
+            stream += _text(left + 3, top - row_height + 6, cell)
+            left += width
+    return stream
+
+
+def _utf16(text: str) -> str:
+    return '<feff' + text.encode('utf-16-be').hex() + '>'
+
+
+def make_report_pdf(
+    pages_count: int = 40,
+    field_page: int = 14,
+    fields: dict[str, str] | None = None,
+    with_outline: bool = True,
+    decoy_tables: float = 0.3,
+    seed: int = 0,
+) -> bytes:
+    """
+    Собирает отчет об оценке из `pages_count` страниц с таблицей искомых полей
+    на странице `field_page` (с 0). Поля в таблице: название | значение | источник.
+    Доля `decoy_tables` остальных страниц содержит посторонние таблицы, как таблицы
+    анализа рынка в настоящих отчетах.
+    """
+    rnd = random.Random(seed)
+    fields = FIELDS_VALUES if fields is None else fields
+    filler = [
+        'Настоящий отчет составлен в соответствии с федеральными стандартами оценки.',
+        'Оценщик не несет ответственности за достоверность предоставленных документов.',
+        'Рыночная стоимость определена сравнительным и доходным подходами.',
+        'Допущения и ограничительные условия приведены в разделе отчета.',
+    ]
+
+    contents = []
+    for index in range(pages_count):
+        stream = _text(50, 800, f'Отчет об оценке, стр. {index + 1}')
+        if index == 1:
+            stream += _text(50, 770, 'Содержание')
+            stream += _text(50, 750, f'{OBJECT_DESCRIPTION_TITLE} ........ {field_page + 1}')
+        if index == field_page:
+            stream += _text(50, 770, OBJECT_DESCRIPTION_TITLE)
+            rows = [['Показатель', 'Значение', 'Источник']]
+            rows += [[label, value, 'Документы'] for label, value in fields.items()]
+            stream += _table(50, 740, [220, 180, 95], rows)
+        elif index > 1 and rnd.random() < decoy_tables:
+            stream += _text(50, 770, 'Анализ рынка коммерческой недвижимости')
+            rows = [['Объект-аналог', 'Площадь, кв.м', 'Цена, руб.']]
+            rows += [
+                [f'Аналог {row + 1}', f'{rnd.randint(20, 500)},0', f'{rnd.randint(1, 90)} 000 000']
+                for row in range(rnd.randint(4, 12))
+            ]
+            stream += _table(50, 740, [220, 180, 95], rows)
+        else:
+            for line in range(rnd.randint(10, 30)):
+                stream += _text(50, 760 - line * 14, rnd.choice(filler))
+        contents.append(stream.encode('latin-1'))
+
+    # номера объектов: 1 - каталог, 2 - дерево страниц, 3 - шрифт, 4 - описание шрифта,
+    # 5 - закладки, 6 - закладка раздела, далее пары (страница, содержимое)
+    page_ids = [7 + index * 2 for index in range(pages_count)]
+    differences = ' '.join(f'/uni{ord(char):04X}' for char in _CYRILLIC)
+    objects = {
+        1: '<< /Type /Catalog /Pages 2 0 R' + (' /Outlines 5 0 R' if with_outline else '') + ' >>',
+        2: f'<< /Type /Pages /Kids [{" ".join(f"{pid} 0 R" for pid in page_ids)}] /Count {pages_count} >>',
+        3: (
+            '<< /Type /Font /Subtype /Type1 /BaseFont /SyntheticSans /FirstChar 32 /LastChar 255 '
+            f'/Widths [{" ".join([str(_CHAR_WIDTH)] * 224)}] /FontDescriptor 4 0 R '
+            f'/Encoding << /Type /Encoding /BaseEncoding /WinAnsiEncoding /Differences [128 {differences}] >> >>'
+        ),
+        4: (
+            '<< /Type /FontDescriptor /FontName /SyntheticSans /Flags 32 /FontBBox [0 -200 1000 800] '
+            '/ItalicAngle 0 /Ascent 800 /Descent -200 /CapHeight 700 /StemV 80 >>'
+        ),
+        5: '<< /Type /Outlines /First 6 0 R /Last 6 0 R /Count 1 >>',
+        6: (
+            f'<< /Title {_utf16(OBJECT_DESCRIPTION_TITLE)} /Parent 5 0 R '
+            f'/Dest [{page_ids[min(field_page, pages_count - 1)]} 0 R /Fit] >>'
+        ),
+    }
+    streams = {}
+    for page_id, content in zip(page_ids, contents):
+        objects[page_id] = (
+            f'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {_PAGE_WIDTH} {_PAGE_HEIGHT}] '
+            f'/Resources << /Font << /F1 3 0 R >> >> /Contents {page_id + 1} 0 R >>'
+        )
+        streams[page_id + 1] = content
+
+    out = bytearray(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+    offsets = {}
+    for obj_id in range(1, max(page_ids) + 2):
+        offsets[obj_id] = len(out)
+        if obj_id in streams:
+            out += f'{obj_id} 0 obj\n<< /Length {len(streams[obj_id])} >>\nstream\n'.encode()
+            out += streams[obj_id] + b'\nendstream\nendobj\n'
+        else:
+            out += f'{obj_id} 0 obj\n{objects[obj_id]}\nendobj\n'.encode()
+    xref = len(out)
+    out += f'xref\n0 {len(offsets) + 1}\n0000000000 65535 f \n'.encode()
+    for obj_id in sorted(offsets):
+        out += f'{offsets[obj_id]:010d} 00000 n \n'.encode()
+    out += f'trailer\n<< /Size {len(offsets) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n'.encode()
+    return bytes(out)
+
+
+def tenders_ids_for_page(page_number: int, page_size: int, tenders_per_entity: int) -> list[list[int]]:
+    """
+    ID тендеров страницы выдачи, сгруппированные по объектам.
+    """
+    first_entity = (page_number - 1) * page_size
+    return [
+        [100000 + (first_entity + entity) * tenders_per_entity + index for index in range(tenders_per_entity)]
+        for entity in range(page_size)
+    ]
+
+
+def make_listing_entity(tenders_ids: list[int], seed: int = 0) -> dict:
+    rnd = random.Random(seed * 7919 + tenders_ids[0])
+    return {
+        'objectAddress': f'г. Москва, ул. Синтетическая, д. {tenders_ids[0] % 1000}',
+        'count': len(tenders_ids),
+        'tenders': [
+            {
+                'id': tender_id,
+                'objectArea': round(rnd.uniform(10, 500), 1),
+                'regionName': 'ЦАО',
+                'districtName': 'Тверской',
+                'startPrice': rnd.randint(1, 100) * 100000,
+            }
+            for tender_id in tenders_ids
+        ],
+    }
+
+
+def _price(value: float) -> str:
+    return f'{value:,.2f}'.replace(',', ' ').replace('.', ',') + ' руб.'
+
+
+def make_tender_detail(tender_id: int, base_url: str, images_count: int = 3, seed: int = 0) -> dict:
+    """
+    Карточка тендера в формате getTenderObjectInformation.
+    """
+    rnd = random.Random(seed * 7919 + tender_id)
+    deposit = rnd.randint(10, 1000) * 1000
+    enddate = datetime(2030, 1, 1) + timedelta(days=tender_id % 365)
+    return {
+        'tenderId': tender_id,
+        'imageInfo': {
+            'attachedImages': [
+                {
+                    'tenderId': tender_id,
+                    'isMainPhoto': index == 0,
+                    'url': f'{base_url}/images/{tender_id}/{index}.jpg',
+                    'fileBase': {'name': f'{tender_id}_{index}.jpg'},
+                }
+                for index in range(images_count)
+            ],
+        },
+        'headerInfo': {
+            'address': f'г. Москва, ул. Синтетическая, д. {tender_id % 1000}',
+            'subway': [{'subwayStationId': 1, 'subwayStationName': 'Тверская'}],
+            'landArea': f'{rnd.randint(10, 500)},{rnd.randint(0, 9)} кв.м',
+            'tenderTypeName': 'Продажа',
+        },
+        'mapInfo': {
+            'coords': {'lat': 55.75 + rnd.uniform(-0.1, 0.1), 'long': 37.61 + rnd.uniform(-0.1, 0.1)},
+            'price': deposit * 2,
+        },
+        'procedureInfo': [
+            {'label': 'Размер задатка', 'value': _price(deposit)},
+            {'label': 'Форма проведения', 'value': 'Аукцион'},
+            {'label': 'Дата окончания приёма заявок', 'value': enddate.strftime('%d.%m.%Y %H:%M:%S')},
+            {'label': 'Проведение торгов', 'value': (enddate + timedelta(days=5)).strftime('%d.%m.%Y %H:%M')},
+            {'label': 'Шаг аукциона', 'value': _price(deposit * 0.05)},
+            {'label': 'Шаг понижения цены', 'value': _price(deposit * 0.1)},
+            {'label': 'Цена отсечения', 'value': _price(deposit)},
+        ],
+        'objectInfo': [
+            {'label': 'Этаж', 'value': str(rnd.randint(-1, 10))},
+            {'label': 'Тип парковки', 'value': 'Подземная'},
+            {'label': 'Расположение', 'value': f'м/м № {tender_id % 300}'},
+        ],
+        'documentInfo': {
+            'documentGroups': [
+                {
+                    'groupType': 'ObjectDocs',
+                    'files': [
+                        {'name': 'Отчет об оценке.pdf', 'downloadLink': f'{base_url}/reports/{tender_id}.pdf'},
+                    ],
+                },
+            ],
+        },
+    }
+
+
+REGIONS = ('ЦАО', 'САО', 'СВАО', 'ВАО', 'ЮВАО', 'ЮАО', 'ЮЗАО', 'ЗАО', 'СЗАО', 'ЗелАО', 'НАО', 'ТАО')
+DISTRICTS_PER_REGION = 10
+TENDERS_PER_ADDRESS = 20
+
+
+def synthetic_address(address_index: int) -> str:
+    return f'г. Москва, ул. Синтетическая {address_index // 50 + 1}, д. {address_index % 50 + 1}'
+
+
+def synthetic_district(region_index: int, district_index: int) -> str:
+    return f'Район {region_index * DISTRICTS_PER_REGION + district_index + 1}'
+
+
+def make_tender_rows(count: int, seed: int = 0, expired_share: float = 0.005):
+    """
+    Строки таблицы nonresidential_tenders для замеров запросов: по TENDERS_PER_ADDRESS
+    тендеров на адрес, 12 округов по DISTRICTS_PER_REGION районов, доля `expired_share`
+    с истекшим сроком приема заявок.
+    """
+    rnd = random.Random(seed)
+    now = datetime.now()
+    for index in range(count):
+        address_index = index // TENDERS_PER_ADDRESS
+        region_index = address_index % len(REGIONS)
+        object_area = round(rnd.uniform(10, 500), 1)
+        deposit = rnd.randint(10, 1000) * 1000.0
+        if rnd.random() < expired_share:
+            enddate = now - timedelta(days=rnd.uniform(0, 3))
+        else:
+            enddate = now + timedelta(days=rnd.uniform(0, 720))
+        yield {
+            'tender_id': str(10_000_000 + index),
+            'investmoscow_url': f'https://investmoscow.ru/tenders/tender/{10_000_000 + index}',
+            'address': synthetic_address(address_index),
+            'region_name': REGIONS[region_index],
+            'district_name': synthetic_district(region_index, rnd.randrange(DISTRICTS_PER_REGION)),
+            'object_area': object_area,
+            'deposit': deposit,
+            'start_price': deposit * 5,
+            'procedure_form': 'Аукцион',
+            'applications_enddate': enddate,
+            'floor': str(rnd.randint(-1, 12)),
+            'images_links': [f'https://disk.example/{index}/{image}.jpg' for image in range(3)],
+        }
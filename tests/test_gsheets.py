@@ -0,0 +1,98 @@
+from app.src.gsheets import SheetDiff
+from app.src.utils import json_hash
+
+
+def stored_state(rows: list[tuple[str, list[str]]]) -> dict[str, tuple[int, str]]:
+    return {tender_id: (row_number, json_hash(values)) for row_number, (tender_id, values) in enumerate(rows, start=2)}
+
+
+def apply_to_sheet(sheet: list[list[str]], diff: SheetDiff) -> list[list[str]]:
+    """
+    Применяет изменения к листу так же, как выгрузка: запись строк, затем удаление снизу вверх.
+    """
+    sheet = [list(row) for row in sheet]
+    for row_number, values in diff.writes.items():
+        sheet.extend([] for _ in range(row_number - len(sheet)))
+        sheet[row_number - 1] = values
+    for row_number in sorted(diff.deleted_rows, reverse=True):
+        del sheet[row_number - 1]
+    return sheet
+
+
+def shifted_state(stored: dict[str, tuple[int, str]], diff: SheetDiff) -> dict[str, tuple[int, str]]:
+    """
+    Состояние после db_save_gsheet_state: строки ниже удаленных сдвигаются вверх.
+    """
+    state = {tender_id: row for tender_id, row in stored.items() if tender_id not in diff.removed_ids}
+    state.update(diff.state)
+    return {
+        tender_id: (row_number - sum(deleted < row_number for deleted in diff.deleted_rows), row_hash)
+        for tender_id, (row_number, row_hash) in state.items()
+    }
+
+
+def test_sheet_diff_insert_change_delete():
+    old_rows = [(str(tender_id), [str(tender_id), f'old {tender_id}']) for tender_id in range(1, 7)]
+    stored = stored_state(old_rows)
+    sheet = [['tender_id', 'value']] + [values for _, values in old_rows]
+
+    # 2 изменен, 3 и 5 убраны, 7 добавлен; пачки приходят в другом порядке
+    new_rows = {
+        '1': ['1', 'old 1'],
+        '2': ['2', 'new 2'],
+        '4': ['4', 'old 4'],
+        '6': ['6', 'old 6'],
+        '7': ['7', 'new 7'],
+    }
+    diff = SheetDiff(stored)
+    diff.add([('7', new_rows['7']), ('6', new_rows['6'])])
+    diff.add([(tender_id, new_rows[tender_id]) for tender_id in ('4', '2', '1')])
+    diff.finish()
+
+    assert sorted(diff.removed_ids) == ['3', '5']
+    # новый тендер занимает строку первого убранного, строка второго удаляется
+    assert diff.writes == {3: new_rows['2'], 4: new_rows['7']}
+    assert diff.deleted_rows == [6]
+
+    sheet = apply_to_sheet(sheet, diff)
+    state = shifted_state(stored, diff)
+    assert len(sheet) == len(new_rows) + 1
+    assert set(state) == set(new_rows)
+    for tender_id, (row_number, row_hash) in state.items():
+        assert sheet[row_number - 1] == new_rows[tender_id]
+        assert row_hash == json_hash(new_rows[tender_id])
+
+
+def test_sheet_diff_appends_after_last_row():
+    old_rows = [(str(tender_id), [str(tender_id)]) for tender_id in range(1, 4)]
+    stored = stored_state(old_rows)
+    sheet = [['tender_id']] + [values for _, values in old_rows]
+
+    diff = SheetDiff(stored)
+    diff.add(old_rows + [('4', ['4']), ('5', ['5'])])
+    diff.finish()
+
+    assert diff.removed_ids == []
+    assert diff.deleted_rows == []
+    assert diff.writes == {5: ['4'], 6: ['5']}
+    assert apply_to_sheet(sheet, diff) == [['tender_id'], ['1'], ['2'], ['3'], ['4'], ['5']]
+
+
+def test_sheet_diff_deletes_and_shifts_rows():
+    old_rows = [(str(tender_id), [str(tender_id)]) for tender_id in range(1, 6)]
+    stored = stored_state(old_rows)
+    sheet = [['tender_id']] + [values for _, values in old_rows]
+
+    diff = SheetDiff(stored)
+    diff.add([('1', ['1']), ('3', ['3']), ('5', ['5'])])
+    diff.finish()
+
+    assert diff.writes == {}
+    assert diff.deleted_rows == [3, 5]
+    sheet = apply_to_sheet(sheet, diff)
+    assert sheet == [['tender_id'], ['1'], ['3'], ['5']]
+    assert shifted_state(stored, diff) == {
+        '1': (2, json_hash(['1'])),
+        '3': (3, json_hash(['3'])),
+        '5': (4, json_hash(['5'])),
+    }